@@ -0,0 +1,17 @@
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    """
+    Tests use an empty per-process cache instead of the shared Redis one
+    from the settings, which they must never read or flush.
+    """
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"}
+    }
+    from django.core.cache import caches
+    cache = caches["default"]
+    assert isinstance(cache, LocMemCache)
+    cache.clear()
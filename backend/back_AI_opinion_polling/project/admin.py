@@ -10,4 +10,9 @@ admin.site.register(Question)
 admin.site.register(Response)
 admin.site.register(AnalysisResult)
 admin.site.register(ModelLog)
-admin.site.register(Cost)
\ No newline at end of file
+admin.site.register(Cost)
+admin.site.register(ImportJob)
+admin.site.register(PersonaTokenProfile)
+admin.site.register(TokenVocab)
+admin.site.register(PromptBlob)
+admin.site.register(QuestionRunSummary)
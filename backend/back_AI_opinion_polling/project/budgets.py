@@ -0,0 +1,161 @@
+"""
+Spending limits for runs.
+
+Project.budget_limit and User.budget_limit (USD, None = no limit) cap what
+runs may spend. Spend is tracked in Redis, one counter per project and per
+user, holding committed cost plus the reservations of chunks in flight:
+
+    reserve()   before a chunk is dispatched, add its estimated cost to
+                every limited counter, atomically and only if no limit
+                would be exceeded (one Lua script, so concurrent workers
+                cannot both squeeze under the same limit)
+    settle()    after the chunk commits, replace the estimate with the
+                actual cost
+    release()   if the chunk fails, give the reservation back
+
+A missing counter is seeded from the committed totals in the database
+(Project.actual_cost), so Redis can be flushed without losing track. Runs
+without any limit never touch Redis, so a counter only follows spend while
+its scope has a limit. Counters therefore expire once unused for
+COUNTER_TTL, and forget_spend() drops them when a limit is set on a scope
+that had none; either way the next reserve() seeds them afresh. settle()
+never recreates an expired counter. The expiry also returns reservations
+leaked by a worker that died between reserve() and settle().
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from django.conf import settings
+from django.db.models import Sum
+
+from .models import Project
+
+COUNTER_TTL = 60 * 60
+
+# KEYS: counters; ARGV: amount, one limit per counter, ttl
+_RESERVE_SCRIPT = """
+local amount = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[#KEYS + 2])
+for i, key in ipairs(KEYS) do
+    local spent = tonumber(redis.call('GET', key) or '0')
+    if spent + amount > tonumber(ARGV[i + 1]) then
+        return i
+    end
+end
+for _, key in ipairs(KEYS) do
+    redis.call('INCRBYFLOAT', key, amount)
+    redis.call('EXPIRE', key, ttl)
+end
+return 0
+"""
+
+# KEYS: counters; ARGV: delta, ttl. An expired counter is left to be re-seeded.
+_SETTLE_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('INCRBYFLOAT', key, ARGV[1])
+        redis.call('EXPIRE', key, ARGV[2])
+    end
+end
+return 0
+"""
+
+_client = None
+_reserve = None
+_settle = None
+
+
+def get_redis():
+    global _client, _reserve, _settle
+    if _client is None:
+        import redis
+
+        _client = redis.Redis.from_url(settings.BUDGET_REDIS_URL)
+        _reserve = _client.register_script(_RESERVE_SCRIPT)
+        _settle = _client.register_script(_SETTLE_SCRIPT)
+    return _client
+
+
+def project_spend_key(project_id: int) -> str:
+    return f"budget:project:{project_id}:spent"
+
+
+def user_spend_key(user_id: int) -> str:
+    return f"budget:user:{user_id}:spent"
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, scope: str, limit: float):
+        self.scope = scope
+        self.limit = limit
+        super().__init__(f"{scope} budget of ${limit:.2f} reached")
+
+
+@dataclass
+class Reservation:
+    amount: float = 0.0
+    keys: List[str] = field(default_factory=list)
+
+
+def _committed_spend(projects) -> float:
+    return float(projects.aggregate(total=Sum("actual_cost"))["total"] or 0.0)
+
+
+def reserve(project_id: int, amount: float) -> Reservation:
+    """
+    Reserve `amount` USD against the project's and its owner's limits.
+    Raises BudgetExceeded, reserving nothing, if either would be exceeded.
+    """
+    limits = Project.objects.filter(id=project_id).values("user_id", "budget_limit", "user__budget_limit").first()
+    if limits is None:
+        return Reservation()
+    # (scope, counter key, limit, projects whose spend the counter covers)
+    scopes = [
+        ("project", project_spend_key(project_id), limits["budget_limit"],
+         Project.objects.filter(id=project_id)),
+        ("user", user_spend_key(limits["user_id"]), limits["user__budget_limit"],
+         Project.objects.filter(user_id=limits["user_id"])),
+    ]
+    scopes = [scope for scope in scopes if scope[2] is not None]
+    if not scopes:
+        return Reservation()
+
+    client = get_redis()
+    for _, key, _, projects in scopes:
+        if not client.exists(key):
+            client.set(key, _committed_spend(projects), nx=True, ex=COUNTER_TTL)
+
+    keys = [key for _, key, _, _ in scopes]
+    exceeded = _reserve(keys=keys, args=[amount] + [limit for _, _, limit, _ in scopes] + [COUNTER_TTL])
+    if exceeded:
+        scope, _, limit, _ = scopes[int(exceeded) - 1]
+        raise BudgetExceeded(scope, limit)
+    return Reservation(amount=amount, keys=keys)
+
+
+def settle(reservation: Reservation, actual: float) -> None:
+    """Swap a committed chunk's reservation for its actual cost."""
+    if reservation.keys and actual != reservation.amount:
+        get_redis()
+        _settle(keys=reservation.keys, args=[actual - reservation.amount, COUNTER_TTL])
+
+
+def release(reservation: Reservation) -> None:
+    settle(reservation, 0.0)
+
+
+def forget_spend(project_id: Optional[int] = None, user_id: Optional[int] = None) -> None:
+    """
+    Drop the counters of a project and / or user, so the next reserve()
+    seeds them from the database. Call it when a limit is set on a scope
+    that had none, as its counter stopped following spend meanwhile.
+    """
+    keys = []
+    if project_id is not None:
+        keys.append(project_spend_key(project_id))
+    if user_id is not None:
+        keys.append(user_spend_key(user_id))
+    if keys:
+        get_redis().delete(*keys)
+
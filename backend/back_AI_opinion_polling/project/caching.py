@@ -0,0 +1,178 @@
+"""
+Versioned read-through cache of the dashboard endpoints.
+
+Every project has a version number in the cache, and so does every user
+for their project list. Responses are cached under keys that include the
+version and served with an ETag derived from the key, so a write only has
+to bump the version: entries of older versions are never read again and
+expire on their own.
+
+Writers bump the version with bump_project_version():
+
+    signals      saves and deletes of projects, personas, questions and
+                 analysis results (save_metrics_to_db), and
+                 persons_bulk_created (persona imports). Rows deleted along
+                 with a project or question are covered by the bump for
+                 that delete, so a project delete bumps once, not per row.
+    runner       each chunk's transaction, which updates the project totals
+    status       set_project_status(), complete_project_if_done() and the
+                 CSV question import, which change projects with UPDATEs
+
+A request whose If-None-Match carries the current ETag is answered 304 from
+the cached versions alone, and a repeated request gets the cached body, so
+neither touches the database once the ownership lookups below are cached.
+"""
+
+import hashlib
+import time
+from typing import Callable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import AnalysisResult, Project, Question, SiliconePerson
+from .signals import deleted_by_cascade, persons_bulk_created
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+def _project_version_key(project_id: int) -> str:
+    return f"cache_version:project:{project_id}"
+
+
+def _user_version_key(user_id: int) -> str:
+    return f"cache_version:user:{user_id}"
+
+
+def _initial_version() -> int:
+    # A version lost from the cache restarts from the clock, never from a
+    # number that responses were cached under before.
+    return time.time_ns() // 1_000_000
+
+
+def _version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+
+
+def project_version(project_id: int) -> int:
+    return _version(_project_version_key(project_id))
+
+
+def user_version(user_id: int) -> int:
+    return _version(_user_version_key(user_id))
+
+
+def project_owner_id(project_id) -> Optional[int]:
+    """The project's user id, cached for good since it never changes."""
+    key = f"project_owner:{project_id}"
+    owner_id = cache.get(key)
+    if owner_id is None:
+        owner_id = Project.objects.filter(id=project_id).values_list("user_id", flat=True).first()
+        if owner_id is not None:
+            cache.set(key, owner_id, None)
+    return owner_id
+
+
+def question_project_id(question_id) -> Optional[int]:
+    """The question's project id, cached for good since it never changes."""
+    key = f"question_project:{question_id}"
+    project_id = cache.get(key)
+    if project_id is None:
+        project_id = Question.objects.filter(id=question_id).values_list("project_id", flat=True).first()
+        if project_id is not None:
+            cache.set(key, project_id, None)
+    return project_id
+
+
+def bump_project_version(project_id: int, user_id: Optional[int] = None) -> None:
+    """
+    Invalidate the cached responses of a project and its owner's project
+    list. Bumps now and again once the surrounding transaction commits,
+    so a read racing the write cannot cache the old rows under the new
+    version.
+    """
+    if user_id is None:
+        user_id = project_owner_id(project_id)
+    keys = [_project_version_key(project_id)]
+    if user_id is not None:
+        keys.append(_user_version_key(user_id))
+
+    def bump():
+        for key in keys:
+            _bump(key)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def cached_response(request, key: str, build: Callable[[], Response]) -> Response:
+    """
+    Serve `key` with an ETag: 304 if the client already holds it, the cached
+    payload if there is one, else the response of `build()`, which is cached
+    when it is a 200. `key` must include the versions the payload depends on.
+    """
+    etag = '"%s"' % hashlib.md5(key.encode()).hexdigest()
+    client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in client_etags or "*" in client_etags:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data, status=status.HTTP_200_OK)
+        else:
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+    response["ETag"] = etag
+    # the browser may keep the body but has to revalidate every time
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def _project_changed(sender, instance, **kwargs):
+    bump_project_version(instance.id, instance.user_id)
+
+
+@receiver(post_save, sender=SiliconePerson)
+@receiver(post_delete, sender=SiliconePerson)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def _project_row_changed(sender, instance, origin=None, **kwargs):
+    if deleted_by_cascade(sender, origin):
+        return
+    bump_project_version(instance.project_id)
+
+
+@receiver(persons_bulk_created, sender=SiliconePerson)
+def _persons_bulk_created(sender, project_ids, **kwargs):
+    for project_id in project_ids:
+        bump_project_version(project_id)
+
+
+@receiver(post_save, sender=AnalysisResult)
+@receiver(post_delete, sender=AnalysisResult)
+def _analysis_changed(sender, instance, origin=None, **kwargs):
+    if deleted_by_cascade(sender, origin):
+        return
+    project_id = question_project_id(instance.question_id)
+    if project_id is not None:
+        bump_project_version(project_id)
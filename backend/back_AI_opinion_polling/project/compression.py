@@ -0,0 +1,18 @@
+"""
+zstd helpers for cold prompt text. zstandard is imported on first use so
+that reading uncompressed rows never needs it.
+"""
+
+ZSTD_LEVEL = 10
+
+
+def zstd_compress(text: str) -> bytes:
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(text.encode("utf-8"))
+
+
+def zstd_decompress(data) -> str:
+    import zstandard
+
+    return zstandard.ZstdDecompressor().decompress(bytes(data)).decode("utf-8")
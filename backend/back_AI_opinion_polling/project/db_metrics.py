@@ -0,0 +1,42 @@
+"""
+Database connection metrics.
+
+Every process has its own psycopg connection pool (see DATABASE_POOL in the
+settings), so pool_stats() describes the pool of the process that answers:
+its size, idle connections, requests waiting and the time spent waiting.
+connection_counts() asks PostgreSQL for all connections to the database,
+grouped by application name (web, celery_worker, celery_beat) and state,
+which covers every process at once.
+"""
+
+from typing import Dict, List, Optional
+
+from django.db import connection
+
+
+def pool_stats() -> Optional[Dict[str, int]]:
+    """Counters of this process's pool since it started; None without a pool."""
+    pool = getattr(connection, "pool", None)
+    if pool is None:
+        return None
+    return pool.get_stats()
+
+
+def connection_counts() -> List[Dict]:
+    if connection.vendor != "postgresql":
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT application_name, COALESCE(state, ''), COUNT(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() GROUP BY 1, 2 ORDER BY 1, 2"
+        )
+        rows = cursor.fetchall()
+    return [{"application_name": name, "state": state, "count": count} for name, state, count in rows]
+
+
+def max_connections() -> Optional[int]:
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW max_connections")
+        return int(cursor.fetchone()[0])
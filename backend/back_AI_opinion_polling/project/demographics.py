@@ -0,0 +1,131 @@
+"""
+Demographic distributions of a project's silicon persons.
+
+All distributions are counted by the database in a single aggregate over
+the persona rows and cached per project. Every code path that writes
+personas invalidates the cache through the signal receivers below: bulk
+creates send persons_bulk_created, single saves and deletes post_save /
+post_delete.
+"""
+
+from typing import Dict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SiliconePerson
+from .signals import deleted_by_cascade, persons_bulk_created
+
+STATISTICS_FIELDS = [
+    "gender", "race", "ideology", "party", "state", "political_interest",
+    "discuss_politics", "church_goer", "age", "patriotism", "real_vote",
+]
+
+# (label, lowest age, highest age)
+AGE_BANDS = [
+    ("under 18", 1, 17),
+    ("18-24", 18, 24),
+    ("25-34", 25, 34),
+    ("35-44", 35, 44),
+    ("45-54", 45, 54),
+    ("55-64", 55, 64),
+    ("65+", 65, None),
+]
+
+STATISTICS_CACHE_TIMEOUT = 60 * 60
+UNKNOWN = "unknown"
+
+
+def statistics_cache_key(project_id: int) -> str:
+    return f"person_statistics:{project_id}"
+
+
+def age_band() -> Case:
+    whens = []
+    for label, low, high in AGE_BANDS:
+        ages = Q(age__gte=low) if high is None else Q(age__range=(low, high))
+        whens.append(When(ages, then=Value(label)))
+    return Case(*whens, default=Value(UNKNOWN), output_field=CharField())
+
+
+def _field_values(persons) -> Dict[str, list]:
+    """
+    The distinct known values of every text field, read in one UNION query
+    so the buckets of the aggregate below are known up front.
+    """
+    fields = [field for field in STATISTICS_FIELDS if field != "age"]
+    queries = [
+        persons.exclude(**{f"{field}__isnull": True})
+        .exclude(**{field: ""})
+        .values_list(Value(field, output_field=CharField()), field)
+        for field in fields
+    ]
+    values = {field: [] for field in fields}
+    for field, value in queries[0].union(*queries[1:]):
+        values[field].append(value)
+    return values
+
+
+def compute_person_statistics(project_id: int) -> Dict[str, Dict[str, int]]:
+    """
+    Count every field's values in one conditional aggregate over the
+    project's personas. Empty and missing values are reported as
+    "unknown"; ages are bucketed.
+    """
+    persons = SiliconePerson.objects.filter(project_id=project_id)
+
+    buckets = []  # (field, label, filter)
+    for field, values in _field_values(persons).items():
+        for value in sorted(values):
+            buckets.append((field, value, Q(**{field: value})))
+        buckets.append((field, UNKNOWN, Q(**{f"{field}__isnull": True}) | Q(**{field: ""})))
+    for label in [band[0] for band in AGE_BANDS] + [UNKNOWN]:
+        buckets.append(("age", label, Q(age_band=label)))
+
+    counts = persons.annotate(age_band=age_band()).aggregate(
+        **{f"bucket_{i}": Count("id", filter=condition) for i, (_, _, condition) in enumerate(buckets)}
+    )
+
+    data = {field: {} for field in STATISTICS_FIELDS}
+    for i, (field, label, _) in enumerate(buckets):
+        if counts[f"bucket_{i}"]:
+            data[field][label] = counts[f"bucket_{i}"]
+    return data
+
+
+def get_person_statistics(project_id: int) -> Dict[str, Dict[str, int]]:
+    key = statistics_cache_key(project_id)
+    data = cache.get(key)
+    if data is None:
+        data = compute_person_statistics(project_id)
+        cache.set(key, data, STATISTICS_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_person_statistics(project_id: int) -> None:
+    """
+    Drop the cached statistics now and again once the surrounding
+    transaction commits, so a read racing the write cannot re-cache
+    the old counts.
+    """
+    key = statistics_cache_key(project_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(post_save, sender=SiliconePerson)
+@receiver(post_delete, sender=SiliconePerson)
+def _person_changed(sender, instance, origin=None, **kwargs):
+    # the statistics of a deleted project are never asked for again
+    if deleted_by_cascade(sender, origin):
+        return
+    invalidate_person_statistics(instance.project_id)
+
+
+@receiver(persons_bulk_created, sender=SiliconePerson)
+def _persons_bulk_created(sender, project_ids, **kwargs):
+    for project_id in project_ids:
+        invalidate_person_statistics(project_id)
@@ -0,0 +1,225 @@
+"""
+Streaming export of model responses.
+
+Responses are read with QuerySet.iterator() (a server-side cursor on
+PostgreSQL) joined with the persona attributes, flattened one row at a time
+and encoded as CSV, JSON lines or Parquet row groups, so memory stays flat
+however many rows a question has and the first bytes go out immediately.
+"""
+
+import csv
+import json
+from itertools import chain
+from typing import Dict, Iterator, List, Tuple
+
+from .models import Question, Response
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Rows per Parquet row group
+PARQUET_ROW_GROUP_SIZE = 10000
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+PERSON_EXPORT_FIELDS = [
+    "id_str",
+    "name",
+    "race",
+    "discuss_politics",
+    "ideology",
+    "party",
+    "church_goer",
+    "gender",
+    "age",
+    "political_interest",
+    "state",
+    "religion",
+    "education",
+    "financially",
+    "patriotism",
+    "real_vote",
+    "more_info",
+]
+
+RESPONSE_EXPORT_FIELDS = [
+    "response_id",
+    "question_id",
+    "silicone_person_id",
+    "gpt_model",
+    "raw_response",
+    "predicted_choice",
+    "confidence_score",
+]
+
+
+def iter_response_records(question: Question) -> Iterator[Dict]:
+    """
+    Responses of a question with the persona columns, straight from the
+    cursor. Only the values needed are selected; no model instances are built.
+    """
+    queryset = (
+        Response.objects.filter(question=question)
+        .order_by("id")
+        .values(
+            "id",
+            "silicone_person_id",
+            "gpt_model",
+            "raw_response",
+            "confidence_score",
+            "structured_data",
+            *(f"silicone_person__{field}" for field in PERSON_EXPORT_FIELDS),
+        )
+    )
+    return queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def candidate_names(record: Dict) -> List[str]:
+    struct = record.get("structured_data") or {}
+    return list(struct.get("options") or struct.get("candidate_probs") or [])
+
+
+def flatten_record(record: Dict, question_id: int, candidates: List[str]) -> Dict:
+    struct = record.get("structured_data") or {}
+    probs = struct.get("candidate_probs") or {}
+    row = {
+        "response_id": record["id"],
+        "question_id": question_id,
+        "silicone_person_id": record["silicone_person_id"],
+        "gpt_model": record["gpt_model"],
+        "raw_response": record["raw_response"],
+        "predicted_choice": struct.get("predicted_choice"),
+        "confidence_score": record["confidence_score"],
+    }
+    for field in PERSON_EXPORT_FIELDS:
+        value = record[f"silicone_person__{field}"]
+        if field == "more_info" and value is not None:
+            value = json.dumps(value)
+        row[field] = value
+    for candidate in candidates:
+        row[f"prob_{candidate}"] = probs.get(candidate)
+    return row
+
+
+def iter_export_rows(question: Question) -> Tuple[List[str], Iterator[Dict]]:
+    """
+    Column names and a lazy iterator of flat rows. The candidate probability
+    columns are taken from the first response, since every response of a
+    question is scored against the same options.
+    """
+    records = iter(iter_response_records(question))
+    first = next(records, None)
+    if first is None:
+        return RESPONSE_EXPORT_FIELDS + PERSON_EXPORT_FIELDS, iter(())
+    candidates = candidate_names(first)
+    columns = RESPONSE_EXPORT_FIELDS + PERSON_EXPORT_FIELDS + [f"prob_{c}" for c in candidates]
+    rows = (flatten_record(record, question.id, candidates) for record in chain([first], records))
+    return columns, rows
+
+
+class _Echo:
+    """File-like object whose write() hands the data back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(question: Question) -> Iterator[str]:
+    columns, rows = iter_export_rows(question)
+    writer = csv.DictWriter(_Echo(), fieldnames=columns)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(question: Question) -> Iterator[str]:
+    _, rows = iter_export_rows(question)
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+class _ChunkSink:
+    """Write-only file object that buffers bytes until they are drained."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+        self.position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_schema(columns: List[str]):
+    import pyarrow as pa
+
+    types = {
+        "response_id": pa.int64(),
+        "question_id": pa.int64(),
+        "silicone_person_id": pa.int64(),
+        "confidence_score": pa.float64(),
+        "age": pa.int64(),
+    }
+    return pa.schema([
+        (column, pa.float64() if column.startswith("prob_") else types.get(column, pa.string()))
+        for column in columns
+    ])
+
+
+def stream_parquet(question: Question, row_group_size: int = None) -> Iterator[bytes]:
+    """
+    Write the export as Parquet, one row group per `row_group_size` rows
+    (PARQUET_ROW_GROUP_SIZE by default), yielding the encoded bytes after
+    every row group.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    row_group_size = row_group_size or PARQUET_ROW_GROUP_SIZE
+    columns, rows = iter_export_rows(question)
+    schema = parquet_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        batch: List[Dict] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= row_group_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+                yield sink.drain()
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(question: Question, export_format: str):
+    if export_format == "csv":
+        return stream_csv(question)
+    if export_format == "jsonl":
+        return stream_jsonl(question)
+    if export_format == "parquet":
+        return stream_parquet(question)
+    raise ValueError(f"Unsupported export format {export_format!r}")
@@ -0,0 +1,337 @@
+"""
+Batched ingestion of uploaded persona and question files.
+
+Rows are read lazily from the upload, validated and coerced one at a time,
+and written with bulk_create every IMPORT_BATCH_SIZE rows, so memory stays
+bounded and a 50k-row file costs ~50 INSERTs instead of 50k.
+"""
+
+import csv
+import io
+import json
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Set
+
+from django.db import models, transaction
+
+from .models import Project, SiliconePerson, Question, question_body_hash
+
+IMPORT_BATCH_SIZE = 1000
+
+# Only the first errors are returned to the client
+MAX_REPORTED_ERRORS = 100
+
+# CSV column -> SiliconePerson field
+PERSON_CSV_COLUMNS: Dict[str, str] = {
+    "id": "id_str",
+    "name": "name",
+    "race": "race",
+    "discuss_politics": "discuss_politics",
+    "ideology": "ideology",
+    "party": "party",
+    "church_goer": "church_goer",
+    "gender": "gender",
+    "age": "age",
+    "political_interest": "political_interest",
+    "state": "state",
+    "religion": "religion",
+    "education": "education",
+    "financially": "financially",
+    "patriotism": "patriotism",
+    "real_vote": "real_vote",
+    "more_info": "more_info",
+}
+
+
+def iter_csv_rows(uploaded_file) -> Iterator[Dict[str, str]]:
+    """
+    Stream an uploaded CSV as dict rows, decoding UTF-8 incrementally
+    instead of reading the whole file into memory.
+    """
+    text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()
+
+
+def coerce_age(value):
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"age must be a number, got {value!r}")
+
+
+def coerce_more_info(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, dict):
+        return value
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        raise ValueError("more_info must be a JSON object")
+    if not isinstance(parsed, dict):
+        raise ValueError("more_info must be a JSON object")
+    return parsed
+
+
+def person_from_row(row: Dict[str, str], project: Project) -> SiliconePerson:
+    """
+    Build an unsaved SiliconePerson from one CSV row.
+    Raises ValueError describing the first invalid column.
+    """
+    fields = {}
+    for column, field_name in PERSON_CSV_COLUMNS.items():
+        value = row.get(column, None)
+        if field_name == "age":
+            value = coerce_age(value)
+        elif field_name == "more_info":
+            value = coerce_more_info(value)
+        elif value is not None:
+            max_length = SiliconePerson._meta.get_field(field_name).max_length
+            if max_length and len(value) > max_length:
+                raise ValueError(f"{column} is longer than {max_length} characters")
+        fields[field_name] = value
+    return SiliconePerson(project=project, **fields)
+
+
+def question_from_row(row: Dict[str, str], project: Project, model_name: str = None) -> Question:
+    """
+    Build an unsaved Question from one row; "body" is mandatory.
+    """
+    body = (row.get("body") or "").strip()
+    if not body:
+        raise ValueError("Each row must include a 'body' field.")
+    return Question(
+        project=project,
+        body=body,
+        real_answer=row.get("real_answer") or None,
+        gpt_answer=False,
+        is_analysed=False,
+        model_name=model_name,
+    )
+
+
+def question_deduplicator(project: Project) -> Callable[[List[Question]], List[Question]]:
+    """
+    Return drop_duplicates(questions), which keeps the questions whose body
+    is neither in the project yet nor among the questions kept by earlier
+    calls. Each call looks up only the batch's hashes, on the
+    (project, body_hash) constraint's index.
+    """
+    seen: Set[str] = set()
+
+    def drop_duplicates(questions: List[Question]) -> List[Question]:
+        for question in questions:
+            question.body_hash = question_body_hash(question.body)
+        seen.update(Question.objects.filter(
+            project=project, body_hash__in={question.body_hash for question in questions}
+        ).values_list("body_hash", flat=True))
+        kept = []
+        for question in questions:
+            if question.body_hash not in seen:
+                seen.add(question.body_hash)
+                kept.append(question)
+        return kept
+
+    return drop_duplicates
+
+
+def import_rows(
+    rows: Iterable[Dict[str, str]],
+    build_object: Callable[[Dict[str, str]], models.Model],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    skip_rows: int = 0,
+    on_batch: Callable[[int, int, int, List[Dict]], None] = None,
+    drop_duplicates: Callable[[List[models.Model]], List[models.Model]] = None,
+) -> Dict:
+    """
+    Validate rows with `build_object` and bulk-insert the valid ones.
+
+    Every `batch_size` rows read, the batch is filtered by `drop_duplicates`
+    and written in its own transaction together with
+    `on_batch(rows_processed, created, duplicates, new_errors)`, so a
+    progress record committed there always matches the data. Passing the
+    last committed rows_processed as `skip_rows` resumes an interrupted
+    import without inserting anything twice.
+
+    Row numbers in the error report are 1-based data rows (the header is
+    not counted). Returns {"created_count", "duplicate_count",
+    "error_count", "errors"}.
+    """
+    created = 0
+    duplicate_count = 0
+    error_count = 0
+    errors: List[Dict] = []
+    batch: List[models.Model] = []
+    batch_errors: List[Dict] = []
+    row_number = skip_rows
+
+    def flush():
+        nonlocal created, duplicate_count, batch, batch_errors
+        with transaction.atomic():
+            duplicates = 0
+            if batch and drop_duplicates is not None:
+                kept = drop_duplicates(batch)
+                duplicates = len(batch) - len(kept)
+                batch = kept
+            if batch:
+                type(batch[0]).objects.bulk_create(batch)
+            if on_batch is not None:
+                on_batch(row_number, len(batch), duplicates, batch_errors)
+        created += len(batch)
+        duplicate_count += duplicates
+        batch = []
+        batch_errors = []
+
+    for row_number, row in enumerate(islice(rows, skip_rows, None), start=skip_rows + 1):
+        try:
+            batch.append(build_object(row))
+        except ValueError as e:
+            error_count += 1
+            error = {"row": row_number, "error": str(e)}
+            batch_errors.append(error)
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(error)
+        if (row_number - skip_rows) % batch_size == 0:
+            flush()
+
+    if batch or batch_errors or on_batch is not None:
+        flush()
+
+    return {"created_count": created, "duplicate_count": duplicate_count, "error_count": error_count, "errors": errors}
+
+
+def import_persons(
+    rows: Iterable[Dict[str, str]],
+    project: Project,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> Dict:
+    """
+    Validate persona rows and bulk-insert the valid ones in batches.
+    """
+    return import_rows(rows, lambda row: person_from_row(row, project), batch_size=batch_size)
+
+
+def iter_arrow_batches(source, name: str, batch_size: int = IMPORT_BATCH_SIZE):
+    """
+    Yield pyarrow RecordBatches from a Parquet (.parquet) or Arrow IPC
+    (.arrow / .feather) file. A path is memory-mapped so only the batch
+    being converted is resident.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if name.endswith(".parquet"):
+        parquet_file = pq.ParquetFile(source, memory_map=isinstance(source, str))
+        yield from parquet_file.iter_batches(batch_size=batch_size)
+    elif name.endswith((".arrow", ".feather")):
+        if isinstance(source, str):
+            source = pa.memory_map(source)
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for offset in range(0, batch.num_rows, batch_size):
+                yield batch.slice(offset, batch_size)
+    else:
+        raise ValueError("Unsupported file format. Please upload .parquet, .arrow or .feather.")
+
+
+def iter_arrow_person_rows(source, name: str, batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[Dict]:
+    """
+    Convert columnar persona batches to rows for person_from_arrow_row.
+
+    Known columns are cast to strings per column with Arrow compute (age is
+    kept numeric); every other column is packed into the row's "_extra"
+    dict, which ends up in more_info.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    def is_plain(arrow_type):
+        return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_boolean(arrow_type)
+
+    for batch in iter_arrow_batches(source, name, batch_size):
+        names = batch.schema.names
+        columns = {}
+        extra_columns = {}
+        for column_name in names:
+            column = batch.column(column_name)
+            if column_name == "age" and is_plain(column.type):
+                columns[column_name] = column.to_pylist()
+            elif column_name in PERSON_CSV_COLUMNS:
+                columns[column_name] = pc.cast(column, pa.string()).to_pylist()
+            elif is_plain(column.type) or pa.types.is_string(column.type):
+                extra_columns[column_name] = column.to_pylist()
+            else:
+                extra_columns[column_name] = pc.cast(column, pa.string()).to_pylist()
+
+        for i in range(batch.num_rows):
+            row = {column_name: values[i] for column_name, values in columns.items()}
+            row["_extra"] = {
+                column_name: values[i]
+                for column_name, values in extra_columns.items()
+                if values[i] is not None
+            }
+            yield row
+
+
+def person_from_arrow_row(row: Dict, project: Project) -> SiliconePerson:
+    person = person_from_row(row, project)
+    if row.get("_extra"):
+        person.more_info = {**(person.more_info or {}), **row["_extra"]}
+    return person
+
+
+ARROW_EXTENSIONS = (".parquet", ".arrow", ".feather")
+
+
+def import_persons_from_arrow(source, name: str, project: Project, batch_size: int = IMPORT_BATCH_SIZE, **kwargs) -> Dict:
+    """
+    Bulk-load personas from a Parquet / Arrow file, one record batch per
+    INSERT. Extra keyword arguments go to import_rows.
+    """
+    return import_rows(
+        iter_arrow_person_rows(source, name, batch_size),
+        lambda row: person_from_arrow_row(row, project),
+        batch_size=batch_size,
+        **kwargs,
+    )
+
+
+def iter_excel_rows(path) -> Iterator[Dict[str, str]]:
+    """
+    Stream the first sheet of a workbook as dict rows keyed by its header
+    row, using openpyxl's read-only mode so the sheet is never fully loaded.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        keys = [str(h).strip() if h is not None else "" for h in header]
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            yield {k: (str(v) if v is not None else None) for k, v in zip(keys, values)}
+    finally:
+        workbook.close()
+
+
+def iter_file_rows(path: str) -> Iterator[Dict[str, str]]:
+    """
+    Dict rows of a CSV or Excel file stored on disk.
+    """
+    if path.endswith(".xlsx"):
+        yield from iter_excel_rows(path)
+    elif path.endswith(".csv"):
+        with open(path, "rb") as f:
+            yield from iter_csv_rows(f)
+    else:
+        raise ValueError("Unsupported file format. Please upload .csv or .xlsx.")
@@ -0,0 +1,84 @@
+"""
+Compact storage of first-token logprobs.
+
+Response.structured_data used to carry the top-k token -> logprob dict as
+JSON, repeating the same token strings in every row. Tokens are now
+interned in TokenVocab and each response stores one packed blob in
+Response.logprobs_packed:
+
+    uint32 token ids (little-endian) followed by the same number of float32 logprobs
+
+decode_structured_data() puts the dict back, so readers see the same shape
+as before. Rows written before the change keep their JSON and decode as is.
+"""
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from .models import TokenVocab
+
+_ID_DTYPE = np.dtype("<u4")
+_LOGPROB_DTYPE = np.dtype("<f4")
+
+# Token <-> id caches; ids never change once assigned
+_token_ids: Dict[str, int] = {}
+_id_tokens: Dict[int, str] = {}
+
+
+def _remember(pairs: Iterable) -> None:
+    for token, token_id in pairs:
+        _token_ids[token] = token_id
+        _id_tokens[token_id] = token
+
+
+def intern_tokens(tokens: Iterable[str]) -> Dict[str, int]:
+    """
+    Vocabulary ids of the given tokens, creating the missing ones.
+    Costs at most two queries for any number of tokens.
+    """
+    wanted = set(tokens)
+    missing = wanted - _token_ids.keys()
+    if missing:
+        _remember(TokenVocab.objects.filter(token__in=missing).values_list("token", "id"))
+        missing -= _token_ids.keys()
+    if missing:
+        TokenVocab.objects.bulk_create([TokenVocab(token=t) for t in missing], ignore_conflicts=True)
+        _remember(TokenVocab.objects.filter(token__in=missing).values_list("token", "id"))
+    return {t: _token_ids[t] for t in wanted}
+
+
+def pack_logprobs(token_logprobs: Dict[str, float], token_ids: Dict[str, int] = None) -> bytes:
+    """
+    Pack a token -> logprob dict; `token_ids` may come from one
+    intern_tokens() call covering a whole batch of responses.
+    """
+    if token_ids is None:
+        token_ids = intern_tokens(token_logprobs)
+    ids = np.fromiter((token_ids[t] for t in token_logprobs), dtype=_ID_DTYPE, count=len(token_logprobs))
+    logprobs = np.fromiter(token_logprobs.values(), dtype=_LOGPROB_DTYPE, count=len(token_logprobs))
+    return ids.tobytes() + logprobs.tobytes()
+
+
+def unpack_logprobs(blob) -> Dict[str, float]:
+    if not blob:
+        return {}
+    blob = bytes(blob)
+    n = len(blob) // (_ID_DTYPE.itemsize + _LOGPROB_DTYPE.itemsize)
+    ids = np.frombuffer(blob, dtype=_ID_DTYPE, count=n)
+    logprobs = np.frombuffer(blob, dtype=_LOGPROB_DTYPE, count=n, offset=n * _ID_DTYPE.itemsize)
+    missing = {int(i) for i in ids} - _id_tokens.keys()
+    if missing:
+        _remember(TokenVocab.objects.filter(id__in=missing).values_list("token", "id"))
+    return {_id_tokens[int(i)]: float(lp) for i, lp in zip(ids, logprobs)}
+
+
+def decode_structured_data(structured_data: Optional[Dict], logprobs_packed=None) -> Dict:
+    """
+    structured_data in its original shape, with token_logprobs restored
+    from the packed blob when there is one.
+    """
+    data = dict(structured_data or {})
+    if logprobs_packed:
+        data["token_logprobs"] = unpack_logprobs(logprobs_packed)
+    return data
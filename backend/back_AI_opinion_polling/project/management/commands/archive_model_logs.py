@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from project.partitions import (
+    add_months,
+    archive_month,
+    archive_path,
+    ensure_upcoming_partitions,
+    month_start,
+    months_with_logs,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive ModelLog months older than a cutoff to zstd Parquet files and drop them from the "
+        "database. Also makes sure upcoming monthly partitions exist."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-months", type=int, default=6,
+                            help="Archive months that ended at least this many months ago.")
+        parser.add_argument("--dir", dest="directory", default=None,
+                            help="Archive directory (default: settings.MODEL_LOG_ARCHIVE_DIR).")
+        parser.add_argument("--dry-run", action="store_true", help="Only list the months that would be archived.")
+
+    def handle(self, *args, **options):
+        created = ensure_upcoming_partitions()
+        if created:
+            self.stdout.write("Created partitions: " + ", ".join(m.strftime("%Y-%m") for m in created))
+
+        cutoff = add_months(month_start(timezone.now()), -options["older_than_months"])
+        months = months_with_logs(cutoff)
+        if not months:
+            self.stdout.write("Nothing to archive.")
+            return
+
+        for month in months:
+            label = month.strftime("%Y-%m")
+            if options["dry_run"]:
+                self.stdout.write(f"Would archive {label}")
+                continue
+            path = archive_path(month, options["directory"])
+            try:
+                count = archive_month(month, options["directory"])
+            except FileExistsError:
+                self.stderr.write(f"Skipped {label}: {path} already exists; move it away to archive the month again")
+                continue
+            self.stdout.write(f"Archived {count} model logs of {label} to {path}")
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from project.compression import zstd_compress
+from project.models import ModelLog, Prompt, PromptBlob
+
+
+class Command(BaseCommand):
+    help = "zstd-compress prompt blobs older than a cutoff and optionally delete unreferenced ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=30)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--delete-orphans", action="store_true",
+                            help="Delete blobs no Prompt or ModelLog refers to.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+        batch_size = options["batch_size"]
+        compressed = 0
+        saved = 0
+        while True:
+            batch = list(
+                PromptBlob.objects.filter(text__isnull=False, created_at__lte=cutoff)
+                .order_by("hash")[:batch_size]
+            )
+            if not batch:
+                break
+            for blob in batch:
+                blob.compressed = zstd_compress(blob.text)
+                saved += len(blob.text.encode("utf-8")) - len(blob.compressed)
+                blob.text = None
+            PromptBlob.objects.bulk_update(batch, ["compressed", "text"])
+            compressed += len(batch)
+
+        self.stdout.write(f"Compressed {compressed} prompt blobs, saving {saved} bytes.")
+
+        if options["delete_orphans"]:
+            orphans = PromptBlob.objects.filter(
+                ~Exists(Prompt.objects.filter(blob=OuterRef("pk"))),
+                ~Exists(ModelLog.objects.filter(prompt_blob=OuterRef("pk"))),
+            )
+            deleted, _ = orphans.delete()
+            self.stdout.write(f"Deleted {deleted} unreferenced prompt blobs.")
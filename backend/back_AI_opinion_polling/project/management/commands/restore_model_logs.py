@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from project.partitions import archived_months, parse_month, restore_month
+
+
+class Command(BaseCommand):
+    help = "Restore archived ModelLog months (YYYY-MM) from their Parquet files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("months", nargs="*", help="Months to restore, as YYYY-MM.")
+        parser.add_argument("--dir", dest="directory", default=None,
+                            help="Archive directory (default: settings.MODEL_LOG_ARCHIVE_DIR).")
+        parser.add_argument("--list", action="store_true", help="List the archived months.")
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        if options["list"]:
+            for month in archived_months(directory):
+                self.stdout.write(month.strftime("%Y-%m"))
+            return
+        if not options["months"]:
+            raise CommandError("Give at least one month (YYYY-MM) or --list.")
+
+        try:
+            months = [parse_month(value) for value in options["months"]]
+        except ValueError as exc:
+            raise CommandError(f"Months must be given as YYYY-MM: {exc}")
+
+        for month in months:
+            label = month.strftime("%Y-%m")
+            try:
+                count = restore_month(month, directory)
+            except FileNotFoundError:
+                raise CommandError(f"No archive for {label}")
+            self.stdout.write(f"Restored {count} model logs of {label}")
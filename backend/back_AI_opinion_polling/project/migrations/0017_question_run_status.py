@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:48
+
+from django.db import migrations, models
+
+
+def mark_answered_questions_completed(apps, schema_editor):
+    Question = apps.get_model('project', 'Question')
+    Question.objects.filter(gpt_answer=True).update(run_status='completed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0016_question_model_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='run_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('paused', 'Paused'), ('cancelled', 'Cancelled'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(mark_answered_questions_completed, migrations.RunPython.noop),
+    ]
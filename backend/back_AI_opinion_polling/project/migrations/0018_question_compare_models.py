@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0017_question_run_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='compare_models',
+            field=models.JSONField(blank=True, help_text='Extra models to run side by side with model_name', null=True),
+        ),
+    ]
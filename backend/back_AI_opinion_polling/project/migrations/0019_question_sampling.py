@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0018_question_compare_models'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='num_samples',
+            field=models.PositiveIntegerField(default=1, help_text='Completions sampled per persona (n)'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='temperature',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0019_question_sampling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cost',
+            name='achieved_precision',
+            field=models.FloatField(blank=True, help_text='95% CI half-width of the vote share when the run stopped', null=True),
+        ),
+        migrations.AddField(
+            model_name='cost',
+            name='persons_queried',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cost',
+            name='persons_total',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='target_precision',
+            field=models.FloatField(blank=True, help_text='Stop early once the vote share CI half-width reaches this', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0021_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='estimated_cost',
+            field=models.FloatField(blank=True, help_text='Exact cost estimate in USD, filled in asynchronously', null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0022_question_estimated_cost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonaTokenProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('encoding', models.CharField(max_length=50)),
+                ('histogram', models.JSONField(default=dict, help_text='Backstory token count -> number of personas')),
+                ('total_tokens', models.BigIntegerField(default=0)),
+                ('person_count', models.IntegerField(default=0)),
+                ('content_hash', models.CharField(help_text="XOR of the backstories' sha256, independent of order", max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='token_profiles', to='project.project')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('project', 'encoding'), name='unique_project_token_profile')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def delete_duplicate_responses(apps, schema_editor):
+    """Keep the oldest Response of every (question, gpt_model, silicone_person)."""
+    Response = apps.get_model('project', 'Response')
+    duplicates = (
+        Response.objects.filter(gpt_model__isnull=False)
+        .values('question_id', 'gpt_model', 'silicone_person_id')
+        .annotate(keep_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates.iterator():
+        Response.objects.filter(
+            question_id=group['question_id'],
+            gpt_model=group['gpt_model'],
+            silicone_person_id=group['silicone_person_id'],
+        ).exclude(id=group['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0023_persona_token_profile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('gpt_answer', False)), fields=['project', 'run_status'], name='question_unanswered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('gpt_answer', True), ('is_analysed', False)), fields=['id'], name='question_unanalysed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['question', 'id'], name='response_question_id_idx'),
+        ),
+        migrations.RunPython(delete_duplicate_responses, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='response',
+            constraint=models.UniqueConstraint(fields=('question', 'gpt_model', 'silicone_person'), name='unique_response_per_person_model'),
+        ),
+        # the composite indexes above lead with question, so the FK's own index is redundant
+        migrations.AlterField(
+            model_name='response',
+            name='question',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='project.question'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:13
+
+import numpy as np
+from django.db import migrations, models
+
+
+def pack_existing_logprobs(apps, schema_editor):
+    """Move token_logprobs out of structured_data into the packed column."""
+    Response = apps.get_model('project', 'Response')
+    TokenVocab = apps.get_model('project', 'TokenVocab')
+    token_ids = {}
+    batch = []
+
+    def flush():
+        tokens = {t for r in batch for t in r.structured_data['token_logprobs']} - token_ids.keys()
+        if tokens:
+            TokenVocab.objects.bulk_create([TokenVocab(token=t) for t in tokens], ignore_conflicts=True)
+            token_ids.update(TokenVocab.objects.filter(token__in=tokens).values_list('token', 'id'))
+        for r in batch:
+            token_logprobs = r.structured_data.pop('token_logprobs')
+            ids = np.array([token_ids[t] for t in token_logprobs], dtype='<u4')
+            logprobs = np.array(list(token_logprobs.values()), dtype='<f4')
+            r.logprobs_packed = ids.tobytes() + logprobs.tobytes()
+        Response.objects.bulk_update(batch, ['structured_data', 'logprobs_packed'])
+        batch.clear()
+
+    for response in Response.objects.filter(structured_data__has_key='token_logprobs').iterator(chunk_size=1000):
+        if not isinstance(response.structured_data.get('token_logprobs'), dict):
+            continue
+        batch.append(response)
+        if len(batch) >= 1000:
+            flush()
+    if batch:
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0024_replication_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenVocab',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='response',
+            name='logprobs_packed',
+            field=models.BinaryField(blank=True, help_text='First-token logprobs: uint32 TokenVocab ids then float32 logprobs', null=True),
+        ),
+        migrations.RunPython(pack_existing_logprobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:16
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def _move_text_to_blobs(apps, model_name, text_field, fk_field):
+    Model = apps.get_model('project', model_name)
+    PromptBlob = apps.get_model('project', 'PromptBlob')
+    batch = []
+
+    def flush():
+        hashes = {}
+        for row in batch:
+            text = getattr(row, text_field) or ''
+            h = hashlib.sha256(text.encode('utf-8')).hexdigest()
+            hashes[h] = text
+            setattr(row, f'{fk_field}_id', h)
+        PromptBlob.objects.bulk_create(
+            [PromptBlob(hash=h, text=text) for h, text in hashes.items()], ignore_conflicts=True
+        )
+        Model.objects.bulk_update(batch, [fk_field])
+        batch.clear()
+
+    for row in Model.objects.filter(**{f'{fk_field}__isnull': True}).iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+
+
+def _move_blobs_to_text(apps, model_name, text_field, fk_field):
+    Model = apps.get_model('project', model_name)
+    for row in Model.objects.select_related(fk_field).filter(**{f'{fk_field}__isnull': False}).iterator(chunk_size=BATCH_SIZE):
+        setattr(row, text_field, getattr(row, fk_field).text)
+        row.save(update_fields=[text_field])
+
+
+def move_prompt_text_to_blobs(apps, schema_editor):
+    _move_text_to_blobs(apps, 'Prompt', 'body', 'blob')
+    _move_text_to_blobs(apps, 'ModelLog', 'prompt_text', 'prompt_blob')
+
+
+def move_blobs_to_prompt_text(apps, schema_editor):
+    # compressed blobs have no text; run without compressed rows to reverse
+    _move_blobs_to_text(apps, 'Prompt', 'body', 'blob')
+    _move_blobs_to_text(apps, 'ModelLog', 'prompt_text', 'prompt_blob')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0025_packed_logprobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('text', models.TextField(blank=True, null=True)),
+                ('compressed', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='modellog',
+            name='prompt_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='model_logs', to='project.promptblob'),
+        ),
+        migrations.AddField(
+            model_name='prompt',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='prompts', to='project.promptblob'),
+        ),
+        # nullable first, so that reversing the removals below can re-add the columns
+        migrations.AlterField(
+            model_name='modellog',
+            name='prompt_text',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prompt',
+            name='body',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(move_prompt_text_to_blobs, move_blobs_to_prompt_text),
+        migrations.RemoveField(
+            model_name='modellog',
+            name='prompt_text',
+        ),
+        migrations.RemoveField(
+            model_name='prompt',
+            name='body',
+        ),
+    ]
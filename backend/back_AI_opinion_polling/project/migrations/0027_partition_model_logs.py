@@ -0,0 +1,121 @@
+"""
+Partition project_modellog by month of created_at on PostgreSQL.
+
+The table is rebuilt as a RANGE-partitioned table with one partition per
+month that has rows, the current month and PARTITIONS_AHEAD months after
+it, plus a DEFAULT partition. A partitioned table's primary key must
+include the partition key, so the key becomes (id, created_at); id keeps
+its own sequence and stays unique in practice, which is all the ORM needs.
+Other databases are left as they are.
+"""
+
+from datetime import date, datetime, timezone
+
+from django.db import migrations
+
+PARTITIONS_AHEAD = 3
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def partition_model_logs(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    ModelLog = apps.get_model('project', 'ModelLog')
+    table = ModelLog._meta.db_table
+    old = f'{table}_unpartitioned'
+    sequence = f'{table}_part_id_seq'
+    references = {
+        'project_id': (apps.get_model('project', 'Project')._meta.db_table, 'id'),
+        'silicone_person_id': (apps.get_model('project', 'SiliconePerson')._meta.db_table, 'id'),
+        'prompt_blob_id': (apps.get_model('project', 'PromptBlob')._meta.db_table, 'hash'),
+    }
+
+    execute = schema_editor.execute
+    execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}')
+    execute(f'CREATE SEQUENCE {quote(sequence)} AS bigint')
+    execute(f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM {quote(old)}), 0) + 1, false)")
+    execute(
+        f'CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS) '
+        f'PARTITION BY RANGE (created_at)'
+    )
+    execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+    execute(f'ALTER SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id')
+    execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + "_pkey_part")} PRIMARY KEY (id, created_at)')
+    for column, (target, target_column) in references.items():
+        execute(
+            f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(f"{table}_{column}_fk_part")} '
+            f'FOREIGN KEY ({column}) REFERENCES {quote(target)} ({target_column}) DEFERRABLE INITIALLY DEFERRED'
+        )
+        execute(f'CREATE INDEX {quote(f"{table}_{column}_part_idx")} ON {quote(table)} ({column})')
+
+    execute(f'CREATE TABLE {quote(table + "_default")} PARTITION OF {quote(table)} DEFAULT')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(created_at) FROM {quote(old)}')
+        oldest = cursor.fetchone()[0]
+    now = datetime.now(timezone.utc)
+    month = date(oldest.year, oldest.month, 1) if oldest else date(now.year, now.month, 1)
+    last = _add_months(date(now.year, now.month, 1), PARTITIONS_AHEAD)
+    while month <= last:
+        end = _add_months(month, 1)
+        execute(
+            f'CREATE TABLE {quote(f"{table}_y{month.year:04d}m{month.month:02d}")} PARTITION OF {quote(table)} '
+            f'FOR VALUES FROM ({_bound(month)}) TO ({_bound(end)})'
+        )
+        month = end
+
+    execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}')
+    execute(f'DROP TABLE {quote(old)}')
+
+
+def unpartition_model_logs(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    table = apps.get_model('project', 'ModelLog')._meta.db_table
+    old = f'{table}_partitioned'
+
+    execute = schema_editor.execute
+    execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}')
+    execute(f'CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS)')
+    execute(f'ALTER TABLE {quote(table)} ALTER COLUMN id DROP DEFAULT')
+    execute(f'ALTER TABLE {quote(table)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+    execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}')
+    execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {quote(table)}), 0) + 1, false)"
+    )
+    execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY (id)')
+    for column, target, target_column in [
+        ('project_id', 'Project', 'id'),
+        ('silicone_person_id', 'SiliconePerson', 'id'),
+        ('prompt_blob_id', 'PromptBlob', 'hash'),
+    ]:
+        target_table = apps.get_model('project', target)._meta.db_table
+        execute(
+            f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(f"{table}_{column}_fk")} '
+            f'FOREIGN KEY ({column}) REFERENCES {quote(target_table)} ({target_column}) DEFERRABLE INITIALLY DEFERRED'
+        )
+        execute(f'CREATE INDEX {quote(f"{table}_{column}_idx")} ON {quote(table)} ({column})')
+    execute(f'DROP TABLE {quote(old)} CASCADE')
+
+
+class Migration(migrations.Migration):
+    # one transaction, so a failed rebuild leaves the original table in place
+    atomic = True
+
+    dependencies = [
+        ('project', '0026_prompt_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_model_logs, unpartition_model_logs),
+    ]
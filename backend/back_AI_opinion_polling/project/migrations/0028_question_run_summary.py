@@ -0,0 +1,87 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_run_summaries(apps, schema_editor):
+    # ModelLog rows carry no question, so token totals start at zero for
+    # questions run before this migration
+    Question = apps.get_model('project', 'Question')
+    Response = apps.get_model('project', 'Response')
+    Cost = apps.get_model('project', 'Cost')
+    AnalysisResult = apps.get_model('project', 'AnalysisResult')
+    QuestionRunSummary = apps.get_model('project', 'QuestionRunSummary')
+
+    response_counts = dict(
+        Response.objects.values('question_id').annotate(n=models.Count('id')).values_list('question_id', 'n')
+    )
+    spent = dict(
+        Cost.objects.filter(question__isnull=False, persons_queried__isnull=False)
+        .values('question_id').annotate(total=models.Sum('total_cost')).values_list('question_id', 'total')
+    )
+    last_costs = {}
+    first_costs = {}
+    for cost in Cost.objects.filter(question__isnull=False, persons_queried__isnull=False).order_by('created_at'):
+        last_costs[cost.question_id] = cost
+        first_costs.setdefault(cost.question_id, cost)
+    results = {
+        result.question_id: result
+        for result in AnalysisResult.objects.filter(method='gpt_vote_replication')
+    }
+
+    summaries = []
+    for question in Question.objects.all().iterator():
+        cost = last_costs.get(question.id)
+        first_cost = first_costs.get(question.id)
+        result = results.get(question.id)
+        metrics = None
+        if result is not None:
+            metrics = {k: v for k, v in (result.result_data or {}).items() if k != 'collapsed_probs_by_person'}
+        summaries.append(QuestionRunSummary(
+            question_id=question.id,
+            project_id=question.project_id,
+            response_count=response_counts.get(question.id, 0),
+            cost=spent.get(question.id) or 0.0,
+            persons_total=cost.persons_total if cost else None,
+            persons_queried=cost.persons_queried if cost else None,
+            achieved_precision=cost.achieved_precision if cost else None,
+            started_at=first_cost.created_at if first_cost else None,
+            finished_at=question.updated_at if question.run_status == 'completed' else None,
+            analysed_at=result.created_at if result else None,
+            accuracy=(metrics or {}).get('accuracy'),
+            cohens_kappa=(metrics or {}).get('cohens_kappa'),
+            metrics=metrics,
+        ))
+    QuestionRunSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0027_partition_model_logs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionRunSummary',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='run_summary', serialize=False, to='project.question')),
+                ('response_count', models.IntegerField(default=0)),
+                ('tokens_used', models.BigIntegerField(default=0)),
+                ('cost', models.FloatField(default=0.0, help_text='Actual cost of the runs so far in USD')),
+                ('persons_total', models.IntegerField(blank=True, null=True)),
+                ('persons_queried', models.IntegerField(blank=True, null=True)),
+                ('achieved_precision', models.FloatField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('analysed_at', models.DateTimeField(blank=True, null=True)),
+                ('accuracy', models.FloatField(blank=True, null=True)),
+                ('cohens_kappa', models.FloatField(blank=True, null=True)),
+                ('metrics', models.JSONField(blank=True, help_text='Headline metrics of the primary model', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='run_summaries', to='project.project')),
+            ],
+        ),
+        migrations.RunPython(backfill_run_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:25
+
+from django.db import migrations, models
+
+
+def backfill_cost_totals(apps, schema_editor):
+    # Summaries written so far priced runs from the a priori estimate. The
+    # API usage of those runs was never recorded, so their actual cost is
+    # unknown and starts at zero, like the project and Cost actual costs.
+    QuestionRunSummary = apps.get_model('project', 'QuestionRunSummary')
+    Project = apps.get_model('project', 'Project')
+    QuestionRunSummary.objects.update(estimated_cost=models.F('cost'), cost=0.0)
+    totals = QuestionRunSummary.objects.values('project_id').annotate(estimated=models.Sum('estimated_cost'))
+    for row in totals:
+        Project.objects.filter(id=row['project_id']).update(estimated_cost=row['estimated'] or 0.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0028_question_run_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cost',
+            name='actual_cost',
+            field=models.FloatField(blank=True, help_text='Cost from the token usage the API reported, in USD', null=True),
+        ),
+        migrations.AddField(
+            model_name='modellog',
+            name='cached_tokens',
+            field=models.IntegerField(blank=True, help_text='Part of prompt_tokens served from the prompt cache', null=True),
+        ),
+        migrations.AddField(
+            model_name='modellog',
+            name='completion_tokens',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='modellog',
+            name='cost',
+            field=models.FloatField(blank=True, help_text='Cost of the call in USD', null=True),
+        ),
+        migrations.AddField(
+            model_name='modellog',
+            name='prompt_tokens',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='actual_cost',
+            field=models.FloatField(default=0.0, help_text='Cost from the token usage the API reported, in USD'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='cached_tokens',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='completion_tokens',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='estimated_cost',
+            field=models.FloatField(default=0.0, help_text='A priori cost estimate of the persons queried, in USD'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='prompt_tokens',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='questionrunsummary',
+            name='cached_tokens',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='questionrunsummary',
+            name='completion_tokens',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='questionrunsummary',
+            name='estimated_cost',
+            field=models.FloatField(default=0.0, help_text='A priori cost estimate of the persons queried, in USD'),
+        ),
+        migrations.AddField(
+            model_name='questionrunsummary',
+            name='prompt_tokens',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_cost_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0029_token_usage_and_actual_cost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='budget_limit',
+            field=models.FloatField(blank=True, help_text='Runs pause once the project has spent this much, in USD', null=True),
+        ),
+    ]
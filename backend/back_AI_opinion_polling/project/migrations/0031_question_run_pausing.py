@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0030_budget_limit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='run_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('pausing', 'Pausing'), ('paused', 'Paused'), ('cancelled', 'Cancelled'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
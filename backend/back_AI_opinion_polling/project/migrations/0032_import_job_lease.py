@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0031_question_run_pausing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='lease_token',
+            field=models.CharField(blank=True, help_text='Worker holding the job; its lease is renewed with every batch', max_length=32, null=True),
+        ),
+    ]
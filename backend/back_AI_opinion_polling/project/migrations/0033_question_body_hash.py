@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:50
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_body_hashes(apps, schema_editor):
+    # duplicates created before the constraint keep an empty hash
+    Question = apps.get_model('project', 'Question')
+    seen = set()
+    batch = []
+    for question in Question.objects.order_by('id').only('id', 'project_id', 'body').iterator(chunk_size=1000):
+        digest = hashlib.sha256(question.body.strip().encode('utf-8')).hexdigest()
+        if (question.project_id, digest) in seen:
+            continue
+        seen.add((question.project_id, digest))
+        question.body_hash = digest
+        batch.append(question)
+        if len(batch) == 1000:
+            Question.objects.bulk_update(batch, ['body_hash'])
+            batch = []
+    Question.objects.bulk_update(batch, ['body_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0032_import_job_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='duplicate_count',
+            field=models.IntegerField(default=0, help_text='Questions skipped because the body already exists'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='body_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_body_hashes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.UniqueConstraint(fields=('project', 'body_hash'), name='question_unique_body'),
+        ),
+    ]
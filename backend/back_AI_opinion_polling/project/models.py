@@ -1,5 +1,9 @@
+import hashlib
+
 from django.db import models
 from user.models import User
+from .compression import zstd_decompress
+from .signals import persons_bulk_created
 
 
 class Project(models.Model):
@@ -16,6 +20,13 @@ class Project(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # usage totals over every question, rolled up by the runner per chunk
+    prompt_tokens = models.BigIntegerField(default=0)
+    completion_tokens = models.BigIntegerField(default=0)
+    cached_tokens = models.BigIntegerField(default=0)
+    estimated_cost = models.FloatField(default=0.0, help_text="A priori cost estimate of the persons queried, in USD")
+    actual_cost = models.FloatField(default=0.0, help_text="Cost from the token usage the API reported, in USD")
+    budget_limit = models.FloatField(blank=True, null=True, help_text="Runs pause once the project has spent this much, in USD")
 
     class Meta:
         constraints = [
@@ -27,6 +38,18 @@ class Project(models.Model):
 
 
 
+class SiliconePersonManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            persons_bulk_created.send(
+                sender=self.model,
+                project_ids={person.project_id for person in created},
+                persons=created,
+            )
+        return created
+
+
 class SiliconePerson(models.Model):
     id_str = models.CharField(max_length=100, null=True, blank=True)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="silicone_people")
@@ -49,19 +72,98 @@ class SiliconePerson(models.Model):
     dataset_name = models.CharField(max_length=100, blank=True, null=True, default=None)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = SiliconePersonManager()
+
     def __str__(self):
         return self.name or f"Silicone Person #{self.id}"
 
 
 
-class Prompt(models.Model):
+class PromptBlob(models.Model):
+    """
+    Prompt text stored once, keyed by its sha256 and shared by every Prompt
+    and ModelLog row with the same text. Cold blobs may be zstd-compressed
+    (see the compress_prompt_blobs command); `content` reads either form.
+    """
+    hash = models.CharField(max_length=64, primary_key=True)
+    text = models.TextField(blank=True, null=True)
+    compressed = models.BinaryField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def store(cls, text: str) -> "PromptBlob":
+        blob, _ = cls.objects.get_or_create(hash=cls.hash_text(text), defaults={"text": text})
+        return blob
+
+    @classmethod
+    def store_many(cls, texts) -> dict:
+        """
+        Store several texts with one lookup and one insert; returns
+        text -> hash for use as the foreign key value.
+        """
+        hashes = {text: cls.hash_text(text) for text in set(texts)}
+        existing = set(cls.objects.filter(hash__in=hashes.values()).values_list("hash", flat=True))
+        cls.objects.bulk_create(
+            [cls(hash=h, text=text) for text, h in hashes.items() if h not in existing],
+            ignore_conflicts=True,
+        )
+        return hashes
+
+    @property
+    def content(self) -> str:
+        if self.text is not None:
+            return self.text
+        return zstd_decompress(self.compressed)
+
+    def __str__(self):
+        return f"PromptBlob {self.hash[:12]}"
+
+
+class BlobTextMixin:
+    """
+    Exposes the text of a PromptBlob foreign key as a plain attribute, so
+    `obj.<name>` reads and `Model(<name>=...)` writes work as they did when
+    the text was a column. The blob is stored on save().
+    """
+    blob_text_fields = {}  # attribute name -> foreign key name
+
+    def save(self, *args, **kwargs):
+        pending = getattr(self, "_pending_blob_text", {})
+        for attribute, fk_name in self.blob_text_fields.items():
+            if attribute in pending:
+                setattr(self, fk_name, PromptBlob.store(pending.pop(attribute)))
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def blob_text(attribute, fk_name):
+        def getter(self):
+            pending = getattr(self, "_pending_blob_text", {})
+            if attribute in pending:
+                return pending[attribute]
+            blob = getattr(self, fk_name)
+            return blob.content if blob is not None else ""
+
+        def setter(self, value):
+            self.__dict__.setdefault("_pending_blob_text", {})[attribute] = value
+
+        return property(getter, setter)
+
+
+class Prompt(BlobTextMixin, models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="prompts")
-    body = models.TextField()
+    blob = models.ForeignKey(PromptBlob, on_delete=models.PROTECT, related_name="prompts", null=True, blank=True)
     silicone_person = models.ForeignKey(SiliconePerson, on_delete=models.CASCADE, related_name="prompts", null=True, blank=True)
     question = models.ForeignKey('Question', on_delete=models.CASCADE, related_name="prompts", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    blob_text_fields = {"body": "blob"}
+    body = BlobTextMixin.blob_text("body", "blob")
+
     def __str__(self):
         return f"Prompt {self.id} for {self.project.title}"
 
@@ -69,19 +171,66 @@ class Cost(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="costs")
     question = models.ForeignKey('Question', on_delete=models.CASCADE, related_name="costs", null=True, blank=True)
     total_cost = models.FloatField(blank=True, null=True)
+    persons_total = models.IntegerField(blank=True, null=True)
+    persons_queried = models.IntegerField(blank=True, null=True)
+    achieved_precision = models.FloatField(blank=True, null=True, help_text="95% CI half-width of the vote share when the run stopped")
+    actual_cost = models.FloatField(blank=True, null=True, help_text="Cost from the token usage the API reported, in USD")
     created_at = models.DateTimeField(auto_now_add=True)
 
 
 
+def question_body_hash(body: str) -> str:
+    return hashlib.sha256(body.strip().encode("utf-8")).hexdigest()
+
+
 class Question(models.Model):
+    RUN_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        # pause requested; the runner moves it to paused when it stops
+        ('pausing', 'Pausing'),
+        ('paused', 'Paused'),
+        ('cancelled', 'Cancelled'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="questions")
     body = models.TextField(help_text="Content of the question")
+    # unique per project; left empty on duplicates that predate the constraint
+    body_hash = models.CharField(max_length=64, blank=True, null=True, editable=False)
     real_answer = models.TextField(blank=True, null=True)
     gpt_answer = models.BooleanField(default=False)
     is_analysed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     model_name = models.CharField(max_length=100, blank=True, null=True)
+    compare_models = models.JSONField(blank=True, null=True, help_text="Extra models to run side by side with model_name")
+    num_samples = models.PositiveIntegerField(default=1, help_text="Completions sampled per persona (n)")
+    temperature = models.FloatField(default=0.0)
+    target_precision = models.FloatField(blank=True, null=True, help_text="Stop early once the vote share CI half-width reaches this")
+    estimated_cost = models.FloatField(blank=True, null=True, help_text="Exact cost estimate in USD, filled in asynchronously")
+    run_status = models.CharField(max_length=20, choices=RUN_STATUS_CHOICES, default='pending')
+
+    class Meta:
+        indexes = [
+            # questions still to run (ask_gpt, complete_project_if_done)
+            models.Index(
+                fields=['project', 'run_status'], name='question_unanswered_idx', condition=models.Q(gpt_answer=False)
+            ),
+            # answered questions waiting for analysis
+            models.Index(
+                fields=['id'], name='question_unanalysed_idx', condition=models.Q(gpt_answer=True, is_analysed=False)
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'body_hash'], name='question_unique_body'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or self.body_hash is not None:
+            self.body_hash = question_body_hash(self.body)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Question {self.id} ({self.project.title})"
@@ -89,19 +238,45 @@ class Question(models.Model):
 
 
 class Response(models.Model):
-    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="responses")
+    # indexed by the composite indexes below, which all lead with question
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="responses", db_index=False)
     silicone_person = models.ForeignKey(SiliconePerson, on_delete=models.CASCADE, related_name="responses")
     raw_response = models.TextField(help_text="Generated model response")
     structured_data = models.JSONField(blank=True, null=True, help_text="Parsed or scored data")
     confidence_score = models.FloatField(blank=True, null=True)
     gpt_model = models.CharField(max_length=255, blank=True, null=True)
+    logprobs_packed = models.BinaryField(
+        blank=True, null=True, help_text="First-token logprobs: uint32 TokenVocab ids then float32 logprobs"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # one answer per persona and model; also serves the runner's
+            # "already answered" lookups by (question, gpt_model)
+            models.UniqueConstraint(
+                fields=['question', 'gpt_model', 'silicone_person'], name='unique_response_per_person_model'
+            ),
+        ]
+        indexes = [
+            # per-question reads ordered by id: keyset pagination and exports
+            models.Index(fields=['question', 'id'], name='response_question_id_idx'),
+        ]
+
     def __str__(self):
         return f"Response #{self.id} (Person {self.silicone_person.id})(Model {self.gpt_model})"
 
 
 
+class TokenVocab(models.Model):
+    """Interned token strings referenced by Response.logprobs_packed."""
+    token = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.token
+
+
+
 class AnalysisResult(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="analysis_results")
     method = models.CharField(max_length=100, help_text="Analysis method (sentiment, correlation, etc.)", blank=True, null=True)
@@ -114,15 +289,114 @@ class AnalysisResult(models.Model):
 
 
 
-class ModelLog(models.Model):
+class QuestionRunSummary(models.Model):
+    """
+    One row per question with the run's counters and headline metrics, kept
+    current by the runner (per chunk) and the analysis task, so list views
+    read it instead of aggregating Response, Cost and AnalysisResult.
+    See project/run_summaries.py.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name="run_summary")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="run_summaries")
+    response_count = models.IntegerField(default=0)
+    tokens_used = models.BigIntegerField(default=0)
+    prompt_tokens = models.BigIntegerField(default=0)
+    completion_tokens = models.BigIntegerField(default=0)
+    cached_tokens = models.BigIntegerField(default=0)
+    cost = models.FloatField(default=0.0, help_text="Actual cost of the runs so far in USD")
+    estimated_cost = models.FloatField(default=0.0, help_text="A priori cost estimate of the persons queried, in USD")
+    persons_total = models.IntegerField(blank=True, null=True)
+    persons_queried = models.IntegerField(blank=True, null=True)
+    achieved_precision = models.FloatField(blank=True, null=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    analysed_at = models.DateTimeField(blank=True, null=True)
+    accuracy = models.FloatField(blank=True, null=True)
+    cohens_kappa = models.FloatField(blank=True, null=True)
+    metrics = models.JSONField(blank=True, null=True, help_text="Headline metrics of the primary model")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Run summary of question {self.question_id}"
+
+
+
+class ModelLog(BlobTextMixin, models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="model_logs")
     silicone_person = models.ForeignKey(SiliconePerson, on_delete=models.SET_NULL, null=True, blank=True, related_name="logs")
-    prompt_text = models.TextField()
+    prompt_blob = models.ForeignKey(PromptBlob, on_delete=models.PROTECT, related_name="model_logs", null=True, blank=True)
     response_text = models.TextField()
     model_name = models.CharField(max_length=100)
     tokens_used = models.IntegerField(blank=True, null=True)
+    prompt_tokens = models.IntegerField(blank=True, null=True)
+    completion_tokens = models.IntegerField(blank=True, null=True)
+    cached_tokens = models.IntegerField(blank=True, null=True, help_text="Part of prompt_tokens served from the prompt cache")
+    cost = models.FloatField(blank=True, null=True, help_text="Cost of the call in USD")
     temperature = models.FloatField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    blob_text_fields = {"prompt_text": "prompt_blob"}
+    prompt_text = BlobTextMixin.blob_text("prompt_text", "prompt_blob")
+
     def __str__(self):
         return f"ModelLog #{self.id} ({self.model_name})"
+
+
+
+
+class ImportJob(models.Model):
+    KIND_CHOICES = [
+        ('silicone_persons', 'Silicone persons'),
+        ('questions', 'Questions'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="import_jobs")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file = models.FileField(upload_to="imports/")
+    model_name = models.CharField(max_length=100, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_processed = models.IntegerField(default=0, help_text="Rows committed so far; a restarted job skips them")
+    created_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    duplicate_count = models.IntegerField(default=0, help_text="Questions skipped because the body already exists")
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True, null=True)
+    lease_token = models.CharField(
+        max_length=32, blank=True, null=True, help_text="Worker holding the job; its lease is renewed with every batch"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"ImportJob #{self.id} ({self.kind}, {self.status})"
+
+
+
+class PersonaTokenProfile(models.Model):
+    """
+    Backstory token counts of a project's personas under one tokenizer,
+    kept up to date as personas are added or removed, so cost estimates
+    do not need to tokenize the population again.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="token_profiles")
+    encoding = models.CharField(max_length=50)
+    histogram = models.JSONField(default=dict, help_text="Backstory token count -> number of personas")
+    total_tokens = models.BigIntegerField(default=0)
+    person_count = models.IntegerField(default=0)
+    content_hash = models.CharField(max_length=64, help_text="XOR of the backstories' sha256, independent of order")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'encoding'], name='unique_project_token_profile')
+        ]
+
+    def __str__(self):
+        return f"Token profile ({self.encoding}) for project {self.project_id}"
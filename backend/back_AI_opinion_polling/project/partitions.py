@@ -0,0 +1,324 @@
+"""
+Monthly partitions of ModelLog and their Parquet archive.
+
+On PostgreSQL project_modellog is partitioned by RANGE (created_at), one
+partition per calendar month (UTC) named project_modellog_yYYYYmMM, plus a
+DEFAULT partition that catches rows no monthly partition covers yet (see
+migration 0027). Old months are archived by writing their rows to a
+zstd-compressed Parquet file and dropping the partition, which frees the
+space at once and leaves nothing for vacuum. A month is restored by
+creating its partition again and inserting the rows from the file.
+
+Archive files are self-contained: the prompt text is written with each
+row, so compress_prompt_blobs --delete-orphans may remove the blobs and a
+restore stores them again.
+
+Other databases have no partitions; archiving and restoring then simply
+delete and insert the month's rows.
+"""
+
+import os
+import re
+from datetime import date, datetime, timezone as dt_timezone
+from typing import Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import ModelLog, Project, PromptBlob, SiliconePerson
+
+ARCHIVE_BATCH_SIZE = 5000
+
+# Monthly partitions kept ready ahead of the current month
+PARTITIONS_AHEAD = 3
+
+_PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def parse_month(value: str) -> date:
+    """'YYYY-MM' -> first day of that month."""
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def _table() -> str:
+    return ModelLog._meta.db_table
+
+
+def partition_name(month: date) -> str:
+    return f"{_table()}_y{month.year:04d}m{month.month:02d}"
+
+
+def _bound(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def _month_range(month: date):
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    end = datetime.combine(next_month(month), datetime.min.time(), tzinfo=dt_timezone.utc)
+    return start, end
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [_table()]
+        )
+        return cursor.fetchone() is not None
+
+
+def month_partitions() -> Dict[date, str]:
+    """Attached monthly partitions by month; empty when not partitioned."""
+    if not is_partitioned():
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [_table()],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.search(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def ensure_month_partition(month: date) -> bool:
+    """
+    Create the partition for `month` unless it exists. Rows of that month
+    sitting in the DEFAULT partition are moved into it first, since
+    PostgreSQL refuses to attach a range the default partition still holds.
+    Returns True if a partition was created.
+    """
+    month = month_start(month)
+    if not is_partitioned() or month in month_partitions():
+        return False
+    quote = connection.ops.quote_name
+    table, name = quote(_table()), quote(partition_name(month))
+    default = quote(f"{_table()}_default")
+    start, end = _bound(month), _bound(next_month(month))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} WHERE created_at >= {start} AND created_at < {end} "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        )
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({start}) TO ({end})")
+    return True
+
+
+def ensure_upcoming_partitions(months_ahead: int = PARTITIONS_AHEAD) -> List[date]:
+    """Make sure the current month and the next `months_ahead` have partitions."""
+    current = month_start(datetime.now(dt_timezone.utc))
+    months = [add_months(current, i) for i in range(months_ahead + 1)]
+    return [month for month in months if ensure_month_partition(month)]
+
+
+def drop_month_partition(month: date) -> bool:
+    name = month_partitions().get(month_start(month))
+    if name is None:
+        return False
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(_table())} DETACH PARTITION {quote(name)}")
+        cursor.execute(f"DROP TABLE {quote(name)}")
+    return True
+
+
+def archive_directory(directory: Optional[str] = None) -> str:
+    return directory or settings.MODEL_LOG_ARCHIVE_DIR
+
+
+def archive_path(month: date, directory: Optional[str] = None) -> str:
+    return os.path.join(archive_directory(directory), f"model_logs_{month.year:04d}-{month.month:02d}.parquet")
+
+
+def archived_months(directory: Optional[str] = None) -> List[date]:
+    directory = archive_directory(directory)
+    if not os.path.isdir(directory):
+        return []
+    months = []
+    for filename in os.listdir(directory):
+        match = re.fullmatch(r"model_logs_(\d{4})-(\d{2})\.parquet", filename)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def months_with_logs(before: date) -> List[date]:
+    """Months before `before` that still have rows or a partition."""
+    start, _ = _month_range(before)
+    months = {
+        month_start(day)
+        for day in ModelLog.objects.filter(created_at__lt=start).dates("created_at", "month")
+    }
+    months.update(month for month in month_partitions() if month < before)
+    return sorted(months)
+
+
+def archive_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("project_id", pa.int64()),
+        ("silicone_person_id", pa.int64()),
+        ("prompt_text", pa.string()),
+        ("response_text", pa.string()),
+        ("model_name", pa.string()),
+        ("tokens_used", pa.int64()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("cached_tokens", pa.int64()),
+        ("cost", pa.float64()),
+        ("temperature", pa.float64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+def _iter_archive_rows(month: date) -> Iterator[Dict]:
+    start, end = _month_range(month)
+    queryset = (
+        ModelLog.objects.filter(created_at__gte=start, created_at__lt=end)
+        .order_by("id")
+        .values(
+            "id", "project_id", "silicone_person_id", "response_text", "model_name",
+            "tokens_used", "prompt_tokens", "completion_tokens", "cached_tokens", "cost",
+            "temperature", "created_at", "prompt_blob__text", "prompt_blob__compressed",
+        )
+    )
+    for record in queryset.iterator(chunk_size=ARCHIVE_BATCH_SIZE):
+        text = record.pop("prompt_blob__text")
+        compressed = record.pop("prompt_blob__compressed")
+        if text is None and compressed is not None:
+            text = PromptBlob(compressed=compressed).content
+        record["prompt_text"] = text
+        yield record
+
+
+def archive_month(month: date, directory: Optional[str] = None) -> int:
+    """
+    Write the month's ModelLog rows to a zstd Parquet file, then drop its
+    partition (or delete the rows). The file is complete on disk before
+    anything is removed. Returns the number of rows archived.
+
+    Raises FileExistsError if the month already has an archive file, which
+    may hold rows that are no longer in the database; nothing is written
+    or removed then.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    month = month_start(month)
+    path = archive_path(month, directory)
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    schema = archive_schema()
+    count = 0
+    batch: List[Dict] = []
+    partial = f"{path}.partial"
+    with pq.ParquetWriter(partial, schema, compression="zstd") as writer:
+        for record in _iter_archive_rows(month):
+            batch.append(record)
+            if len(batch) >= ARCHIVE_BATCH_SIZE:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            count += len(batch)
+    # a hard link, unlike a rename, fails if another run created the file meanwhile
+    try:
+        os.link(partial, path)
+    finally:
+        os.remove(partial)
+
+    start, end = _month_range(month)
+    with transaction.atomic():
+        drop_month_partition(month)
+        # rows of the month may also sit in the default partition
+        ModelLog.objects.filter(created_at__gte=start, created_at__lt=end).delete()
+    return count
+
+
+def restore_month(month: date, directory: Optional[str] = None) -> int:
+    """
+    Insert an archived month back. Rows of deleted projects are skipped and
+    references to deleted persons cleared, as the cascades would have done.
+    Returns the number of rows restored.
+    """
+    import pyarrow.parquet as pq
+
+    month = month_start(month)
+    path = archive_path(month, directory)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    ensure_month_partition(month)
+
+    quote = connection.ops.quote_name
+    columns = ["id", "project_id", "silicone_person_id", "prompt_blob_id", "response_text",
+               "model_name", "tokens_used", "prompt_tokens", "completion_tokens", "cached_tokens", "cost",
+               "temperature", "created_at"]
+    sql = (
+        f"INSERT INTO {quote(_table())} ({', '.join(quote(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    start, end = _month_range(month)
+    # rows already back from an earlier, interrupted restore
+    restored_ids = set(
+        ModelLog.objects.filter(created_at__gte=start, created_at__lt=end).values_list("id", flat=True)
+    )
+    created_at = ModelLog._meta.get_field("created_at")
+    count = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=ARCHIVE_BATCH_SIZE):
+        rows = [row for row in batch.to_pylist() if row["id"] not in restored_ids]
+        if not rows:
+            continue
+        projects = set(Project.objects.filter(id__in={r["project_id"] for r in rows}).values_list("id", flat=True))
+        persons = set(
+            SiliconePerson.objects.filter(id__in={r["silicone_person_id"] for r in rows})
+            .values_list("id", flat=True)
+        )
+        rows = [row for row in rows if row["project_id"] in projects]
+        with transaction.atomic():
+            hashes = PromptBlob.store_many(row["prompt_text"] for row in rows if row["prompt_text"] is not None)
+            params = [
+                (
+                    row["id"],
+                    row["project_id"],
+                    row["silicone_person_id"] if row["silicone_person_id"] in persons else None,
+                    hashes.get(row["prompt_text"]),
+                    row["response_text"],
+                    row["model_name"],
+                    row["tokens_used"],
+                    row.get("prompt_tokens"),
+                    row.get("completion_tokens"),
+                    row.get("cached_tokens"),
+                    row.get("cost"),
+                    row["temperature"],
+                    created_at.get_db_prep_value(row["created_at"], connection),
+                )
+                for row in rows
+            ]
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+        count += len(params)
+    return count
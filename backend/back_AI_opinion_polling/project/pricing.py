@@ -0,0 +1,87 @@
+"""
+Model prices and token usage.
+
+MODEL_PRICING is the one price table used for estimates (runner, cost
+previews, token-cost endpoint) and for the actual cost of each call.
+Prices are USD per 1M tokens; "cached_input" is the price of prompt tokens
+served from the provider's prompt cache, None where the model has no
+cached rate.
+"""
+
+from dataclasses import dataclass
+
+from loguru import logger
+
+MODEL_PRICING = {
+    "gpt-5.1": {"input": 1.25, "cached_input": 0.125, "output": 10.00},
+    "gpt-5": {"input": 1.25, "cached_input": 0.125, "output": 10.00},
+    "gpt-5-mini": {"input": 0.25, "cached_input": 0.025, "output": 2.00},
+    "gpt-5-nano": {"input": 0.05, "cached_input": 0.005, "output": 0.40},
+    "gpt-5-pro": {"input": 15.00, "cached_input": None, "output": 120.00},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+    "gpt-4.1-nano": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-3.5-turbo": {"input": 0.50, "cached_input": None, "output": 1.50},
+    # Legacy/Other models can be added here
+}
+
+# Used for models missing from the table, so a run is never priced at zero
+FALLBACK_PRICING = {"input": 0.60, "cached_input": None, "output": 2.40}
+
+TOKENS_PER_PRICE_UNIT = 1_000_000
+
+
+@dataclass
+class TokenUsage:
+    """Token counts of one or more API calls, as reported in `usage`."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # part of prompt_tokens served from the prompt cache
+    cached_tokens: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def __add__(self, other: "TokenUsage") -> "TokenUsage":
+        return TokenUsage(
+            self.prompt_tokens + other.prompt_tokens,
+            self.completion_tokens + other.completion_tokens,
+            self.cached_tokens + other.cached_tokens,
+        )
+
+    @classmethod
+    def from_response(cls, usage) -> "TokenUsage":
+        """Read an OpenAI `usage` object; missing details count as zero."""
+        details = getattr(usage, "prompt_tokens_details", None)
+        return cls(
+            prompt_tokens=int(getattr(usage, "prompt_tokens", 0) or 0),
+            completion_tokens=int(getattr(usage, "completion_tokens", 0) or 0),
+            cached_tokens=int(getattr(details, "cached_tokens", 0) or 0),
+        )
+
+
+def get_pricing(model_name: str) -> dict:
+    pricing = MODEL_PRICING.get(model_name)
+    if pricing is None:
+        logger.warning(f"[PRICING] No price for model {model_name}, using the fallback price")
+        return FALLBACK_PRICING
+    return pricing
+
+
+def token_cost(model_name: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """USD cost of the given token counts at the model's prices."""
+    pricing = get_pricing(model_name)
+    cached_price = pricing["cached_input"] if pricing["cached_input"] is not None else pricing["input"]
+    cost = (
+        (prompt_tokens - cached_tokens) * pricing["input"]
+        + cached_tokens * cached_price
+        + completion_tokens * pricing["output"]
+    )
+    return float(cost / TOKENS_PER_PRICE_UNIT)
+
+
+def usage_cost(model_name: str, usage: TokenUsage) -> float:
+    return token_cost(model_name, usage.prompt_tokens, usage.completion_tokens, usage.cached_tokens)
@@ -1,7 +1,11 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence
+import math
+import random
 import numpy as np
 import tiktoken
 
+from project.pricing import token_cost
+
 def lc(t: str) -> str:
     return t.lower()
 
@@ -189,6 +193,13 @@ def get_encoding_for_model(model_name: str):
         return tiktoken.get_encoding("cl100k_base")
 
 
+def get_encoding(encoding_name: str):
+    """
+    Returns the tiktoken encoding object with the given name (e.g. "o200k_base").
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+
 def count_tokens(text: str, model_name: str) -> int:
     """
     Count tokens in a piece of text for a given model using tiktoken.
@@ -200,16 +211,77 @@ def count_tokens(text: str, model_name: str) -> int:
 def estimate_prompt_cost_usd(
     prompt: str,
     model_name: str,
-    input_price_per_1k: float,
     max_output_tokens: int,
-    output_price_per_1k: float,
 ) -> float:
     """
-    Rough cost estimate for ONE prompt:
+    Rough cost estimate for ONE prompt at the model's MODEL_PRICING prices,
+    assuming max_output_tokens are generated and nothing is cached.
+    """
+    return token_cost(model_name, count_tokens(prompt, model_name), max_output_tokens)
+
 
-    cost = (input_tokens / 1000 * input_price) + (max_output_tokens / 1000 * output_price)
+
+
+def stratified_order(items: Sequence, key, seed: int) -> List:
+    """
+    Random order in which every prefix is (close to) proportionally
+    stratified by key(item): items are shuffled within their stratum and
+    then interleaved by their relative position inside it.
+    The same seed always gives the same order, so resumed runs agree.
     """
-    n_in = count_tokens(prompt, model_name)
-    in_cost = (n_in / 1000.0) * input_price_per_1k
-    out_cost = (max_output_tokens / 1000.0) * output_price_per_1k
-    return float(in_cost + out_cost)
+    rng = random.Random(seed)
+    strata: Dict[str, List] = {}
+    for item in items:
+        strata.setdefault(str(key(item) or "unknown"), []).append(item)
+
+    ranked = []
+    for members in strata.values():
+        rng.shuffle(members)
+        n = len(members)
+        for i, item in enumerate(members):
+            ranked.append(((i + rng.random()) / n, item))
+    ranked.sort(key=lambda r: r[0])
+    return [item for _, item in ranked]
+
+
+class RunningVoteShare:
+    """
+    Running estimate of each option's vote share (mean candidate probability
+    over the persons seen so far) with a normal-approximation confidence
+    interval, using a finite population correction for a pool of
+    `population` persons.
+    """
+
+    def __init__(self, population: int, z: float = 1.96):
+        self.population = population
+        self.z = z
+        self.n = 0
+        self.sums: Dict[str, float] = {}
+        self.sq_sums: Dict[str, float] = {}
+
+    def add(self, candidate_probs: Dict[str, float]) -> None:
+        self.n += 1
+        for k, v in candidate_probs.items():
+            self.sums[k] = self.sums.get(k, 0.0) + float(v)
+            self.sq_sums[k] = self.sq_sums.get(k, 0.0) + float(v) * float(v)
+
+    def estimate(self) -> Dict[str, float]:
+        if not self.n:
+            return {}
+        return {k: v / self.n for k, v in self.sums.items()}
+
+    def half_width(self) -> Optional[float]:
+        """
+        Largest CI half-width across options, or None with fewer than 2 persons.
+        """
+        if self.n < 2:
+            return None
+        fpc = 1.0
+        if self.population > 1:
+            fpc = math.sqrt(max(self.population - self.n, 0) / (self.population - 1))
+        widths = []
+        for k, total in self.sums.items():
+            mean = total / self.n
+            var = max(self.sq_sums[k] / self.n - mean * mean, 0.0) * self.n / (self.n - 1)
+            widths.append(self.z * math.sqrt(var / self.n) * fpc)
+        return max(widths) if widths else None
@@ -6,7 +6,11 @@ import pandas as pd
 from scipy.stats import pearsonr
 from sklearn.metrics import cohen_kappa_score, matthews_corrcoef
 
-from project.models import Project, SiliconePerson, Question, Response, AnalysisResult
+from django.db import transaction
+
+from project import run_summaries
+from project.logprobs import decode_structured_data
+from project.models import Project, SiliconePerson, Question, Response, AnalysisResult, Cost
 
 
 
@@ -207,7 +211,7 @@ def compute_metrics_for_project(project_id: int, question_id: int) -> Dict[str,
 
     for r in responses:
         person = r.silicone_person
-        struct = r.structured_data or {}
+        struct = decode_structured_data(r.structured_data, r.logprobs_packed)
 
         collapsed = (
             struct.get("collapsed_probs")
@@ -245,6 +249,7 @@ def compute_metrics_for_project(project_id: int, question_id: int) -> Dict[str,
         row = {
             "response_id": r.id,
             "question_id": r.question.id,
+            "gpt_model": r.gpt_model or "",
             "person_id": person.id,
             "real_vote_raw": real_vote_raw,
             "real_vote": real_label,
@@ -308,12 +313,48 @@ def compute_metrics_for_project(project_id: int, question_id: int) -> Dict[str,
         "pearson_pval": clean_nan_to_none(float(pval_pearson)),
         "cohens_kappa": clean_nan_to_none(float(kappa)),
         "phi_correlation_est": clean_nan_to_none(float(corr_phi)),
+        "primary_model": Question.objects.filter(id=question_id).values_list("model_name", flat=True).first() or "",
         "df": df,
     }
 
     return metrics
 
 
+def summarise_group_metrics(group: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Headline metrics for one group of rows (one question, or one model of a
+    question when several models were compared).
+    """
+    accuracy = float(group["accuracy"].mean())
+    entropy_mean = float(group["entropy"].mean())
+
+    if group["real_vote_pos"].nunique() > 1 and group["pred_pos"].nunique() > 1:
+        pred_corr_pearson, _ = pearsonr(group["real_vote_pos"], group["pred_pos"])
+    else:
+        pred_corr_pearson = float("nan")
+
+    # Kappa and phi
+    if group["real_vote_pos"].nunique() > 1 and group["pred_vote_dichot"].nunique() > 1:
+        kappa = cohen_kappa_score(group["real_vote_pos"], group["pred_vote_dichot"])
+        corr_phi = matthews_corrcoef(group["real_vote_pos"], group["pred_vote_dichot"])
+    else:
+        kappa = float("nan")
+        corr_phi = float("nan")
+
+    # Argyle-style MI (template vs output) on this group
+    mutual_info_template_output = float(group["mutual_inf"].mean())
+
+    return {
+        "n": int(len(group)),
+        "accuracy": clean_nan_to_none(accuracy),
+        "entropy_mean": clean_nan_to_none(entropy_mean),
+        "pearson_corr_real_vs_predprob": clean_nan_to_none(pred_corr_pearson),
+        "cohens_kappa": clean_nan_to_none(kappa),
+        "phi_correlation_est": clean_nan_to_none(corr_phi),
+        "mutual_info_template_output_mean": clean_nan_to_none(mutual_info_template_output),
+    }
+
+
 def save_metrics_to_db(project_id: int, metrics: Dict[str, Any]) -> None:
     """
     Saves per-question aggregates into AnalysisResult.
@@ -324,25 +365,12 @@ def save_metrics_to_db(project_id: int, metrics: Dict[str, Any]) -> None:
     year, positive_label = get_project_config(project_id)
     df: pd.DataFrame = metrics["df"]
 
-    for qid, group in df.groupby("question_id"):
-        accuracy = float(group["accuracy"].mean())
-        entropy_mean = float(group["entropy"].mean())
-
-        if group["real_vote_pos"].nunique() > 1 and group["pred_pos"].nunique() > 1:
-            pred_corr_pearson, _ = pearsonr(group["real_vote_pos"], group["pred_pos"])
-        else:
-            pred_corr_pearson = float("nan")
-
-        # Kappa and phi
-        if group["real_vote_pos"].nunique() > 1 and group["pred_vote_dichot"].nunique() > 1:
-            kappa = cohen_kappa_score(group["real_vote_pos"], group["pred_vote_dichot"])
-            corr_phi = matthews_corrcoef(group["real_vote_pos"], group["pred_vote_dichot"])
-        else:
-            kappa = float("nan")
-            corr_phi = float("nan")
-
-        # Argyle-style MI (template vs output) on this question
-        mutual_info_template_output = float(group["mutual_inf"].mean())
+    for qid, question_group in df.groupby("question_id"):
+        models = sorted(question_group["gpt_model"].unique())
+        primary_model = metrics.get("primary_model") or ""
+        if primary_model not in models:
+            primary_model = question_group["gpt_model"].value_counts().idxmax()
+        group = question_group[question_group["gpt_model"] == primary_model]
 
         # store collapsed probs per person for inspection
         collapsed_by_person = {
@@ -353,22 +381,37 @@ def save_metrics_to_db(project_id: int, metrics: Dict[str, Any]) -> None:
         data = {
             "project_id": int(project_id),
             "question_id": int(qid),
-            "n": int(len(group)),
-            "accuracy": clean_nan_to_none(accuracy),
-            "entropy_mean": clean_nan_to_none(entropy_mean),
-            "pearson_corr_real_vs_predprob": clean_nan_to_none(pred_corr_pearson),
-            "cohens_kappa": clean_nan_to_none(kappa),
-            "phi_correlation_est": clean_nan_to_none(corr_phi),
+            **summarise_group_metrics(group),
             "positive_label": positive_label,
-            "mutual_info_template_output_mean": clean_nan_to_none(mutual_info_template_output),
             "collapsed_probs_by_person": collapsed_by_person,
         }
 
-        AnalysisResult.objects.update_or_create(
-            question_id=qid,
-            method="gpt_vote_replication",
-            defaults={
-                "parameters": {"positive_label": positive_label, "year": year},
-                "result_data": data,
-            },
-        )
+        # Side-by-side comparison when the question was run on several models
+        if len(models) > 1:
+            data["model"] = primary_model
+            data["by_model"] = {
+                model: summarise_group_metrics(model_group)
+                for model, model_group in question_group.groupby("gpt_model")
+            }
+
+        # Where an adaptive run stopped and the precision it reached
+        target_precision = Question.objects.filter(id=qid).values_list("target_precision", flat=True).first()
+        if target_precision:
+            stopping = (
+                Cost.objects.filter(question_id=qid, persons_queried__isnull=False)
+                .order_by("-created_at")
+                .values("persons_queried", "persons_total", "achieved_precision")
+                .first()
+            )
+            data["adaptive"] = {"target_precision": target_precision, **(stopping or {})}
+
+        with transaction.atomic():
+            AnalysisResult.objects.update_or_create(
+                question_id=qid,
+                method="gpt_vote_replication",
+                defaults={
+                    "parameters": {"positive_label": positive_label, "year": year},
+                    "result_data": data,
+                },
+            )
+            run_summaries.record_metrics(int(qid), int(project_id), data)
@@ -4,35 +4,74 @@ Human-sampling pipeline integrated with your Django models:
 1) Read SiliconePerson rows for a Project.
 2) Read a Question for that Project.
 3) Build prompts (backstory + question + options).
-4) Call GPT (Chat Completions) with logprobs to simulate "votes".
-5) Collapse first-token logprobs to candidate-level probabilities (soft).
-6) Save Prompt, Response, and ModelLog rows.
+4) Call GPT (Chat Completions) with logprobs to simulate "votes",
+   concurrently across all models being compared.
+5) Collapse first-token logprobs to candidate-level probabilities (soft);
+   with repeated sampling, average the K choices of one request.
+6) Save Prompt, Response, and ModelLog rows, one transaction per chunk;
+   first-token logprobs are stored packed (see project.logprobs).
 7) Return approximate total cost in USD.
+
+Runs can be paused or cancelled between chunks through Question.run_status.
+A pause of a running question is only requested ("pausing") until the runner
+stops and confirms it ("paused"), so a resumed run never overlaps the old
+one; it skips persons that already have a Response.
 """
 
-from typing import Dict, List, Sequence, Tuple, Union
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple, Union
+import math
 import os
+import random
+import threading
 from django.db import transaction
 from django.db.models import QuerySet
-from openai import OpenAI
+from loguru import logger
 
-from project.models import Project, SiliconePerson, Prompt, Question, Response, ModelLog, Cost
+from project.logprobs import intern_tokens, pack_logprobs
+from project import budgets, caching, run_summaries
+from project.pricing import TokenUsage, token_cost, usage_cost
+from project.models import Project, SiliconePerson, Prompt, PromptBlob, Question, Response, ModelLog, Cost
 from .common import (
     collapse_token_sets_soft,
     estimate_prompt_cost_usd,
     count_tokens,
+    get_encoding_for_model,
     get_default_token_sets,
-    extract_probs_from_top_logprobs
+    extract_probs_from_top_logprobs,
+    stratified_order,
+    RunningVoteShare,
 )
 
-MODEL_NAME = os.getenv("GPT_MODEL")
+if TYPE_CHECKING:
+    # openai is imported where a client is created, so importing this
+    # module (as the views do) does not load it
+    from openai import OpenAI
 
-INPUT_PRICE_PER_1K = 0.0006
-OUTPUT_PRICE_PER_1K = 0.0024
+MODEL_NAME = os.getenv("GPT_MODEL")
 
 MAX_OUTPUT_TOKENS = 3
 TOP_LOGPROBS = 20
 
+RUN_CHUNK_SIZE = 25
+
+# Adaptive (early-stopping) runs: strata used for the visiting order and
+# the minimum number of persons before the precision target is checked
+ADAPTIVE_STRATIFY_FIELD = "party"
+ADAPTIVE_MIN_PERSONS = 30
+
+# Persons tokenized for the cost preview shown when a question is created
+COST_PREVIEW_SAMPLE_SIZE = 200
+
+# Concurrent in-flight requests allowed per model when dispatching a run
+DEFAULT_MODEL_CONCURRENCY = 4
+MODEL_MAX_CONCURRENCY: Dict[str, int] = {
+    "gpt-5-pro": 1,
+    "gpt-5": 2,
+    "gpt-5.1": 2,
+}
+
 
 
 def build_backstory(person: SiliconePerson) -> str:
@@ -112,27 +151,31 @@ def build_prompt(backstory: str, question_text: str, options: List[str]) -> str:
 
 
 
-def create_client() -> OpenAI:
+def create_client() -> "OpenAI":
     """
     Create an OpenAI client. Requires OPENAI_API_KEY in env.
     """
+    from openai import OpenAI
+
     return OpenAI(api_key=os.environ["OPENAI_API_KEY"])
 
 
-def call_model_with_logprobs(
-    client: OpenAI,
+def request_completions(
+    client: "OpenAI",
     model_name: str,
     prompt: str,
     max_output_tokens: int = MAX_OUTPUT_TOKENS,
     top_logprobs: int = TOP_LOGPROBS,
     temperature: float = 0.0,
-) -> Tuple[Dict[str, float], str, int]:
+    n: int = 1,
+) -> Tuple[List[Dict[str, float]], List[str], TokenUsage]:
     """
-    Call the Chat Completions API and return:
-      - token_logprobs: dict[token -> logprob] for the first output token
-      - raw_text: full generated text
-      - tokens_used: total tokens (input + output)
+    Call the Chat Completions API asking for `n` choices and return:
+      - token_logprobs per choice: dict[token -> logprob] for its first output token
+      - raw_text per choice
+      - usage: prompt, completion and cached tokens of the whole request
     """
+    extra = {"n": n} if n > 1 else {}
     response = client.chat.completions.create(
         model=model_name,
         messages=[
@@ -142,36 +185,114 @@ def call_model_with_logprobs(
         logprobs=True,
         top_logprobs=top_logprobs,
         temperature=temperature,
+        **extra,
     )
 
-    choice = response.choices[0]
+    token_logprobs_list: List[Dict[str, float]] = []
+    raw_texts: List[str] = []
+    for choice in response.choices:
+        raw_texts.append(choice.message.content)
 
-    raw_text = choice.message.content
+        lp_info = choice.logprobs
+        first_token_info = lp_info.content[0]
+        top = first_token_info.top_logprobs  # list of logprob objects
 
-    lp_info = choice.logprobs
-    first_token_info = lp_info.content[0]
-    top = first_token_info.top_logprobs  # list of logprob objects
+        token_logprobs_list.append({item.token: float(item.logprob) for item in top})
 
-    token_logprobs = {item.token: float(item.logprob) for item in top}
+    if getattr(response, "usage", None) is not None:
+        usage = TokenUsage.from_response(response.usage)
+    else:
+        # no usage reported: count the prompt and assume full-length answers
+        usage = TokenUsage(
+            prompt_tokens=count_tokens(prompt, model_name),
+            completion_tokens=max_output_tokens * len(raw_texts),
+        )
 
-    tokens_used = None
-    try:
-        if hasattr(response, "usage") and response.usage is not None:
-            if hasattr(response.usage, "total_tokens"):
-                tokens_used = int(response.usage.total_tokens)
-            elif hasattr(response.usage, "prompt_tokens") and hasattr(
-                response.usage, "completion_tokens"
-            ):
-                tokens_used = int(
-                    response.usage.prompt_tokens + response.usage.completion_tokens
-                )
-    except Exception:
-        tokens_used = None
+    return token_logprobs_list, raw_texts, usage
+
+
+def call_model_with_logprobs(
+    client: "OpenAI",
+    model_name: str,
+    prompt: str,
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+    top_logprobs: int = TOP_LOGPROBS,
+    temperature: float = 0.0,
+) -> Tuple[Dict[str, float], str, TokenUsage]:
+    """
+    Call the Chat Completions API and return:
+      - token_logprobs: dict[token -> logprob] for the first output token
+      - raw_text: full generated text
+      - usage: prompt, completion and cached tokens
+    """
+    token_logprobs_list, raw_texts, usage = request_completions(
+        client=client,
+        model_name=model_name,
+        prompt=prompt,
+        max_output_tokens=max_output_tokens,
+        top_logprobs=top_logprobs,
+        temperature=temperature,
+    )
+    return token_logprobs_list[0], raw_texts[0], usage
 
-    if tokens_used is None:
-        tokens_used = count_tokens(prompt, model_name) + max_output_tokens
 
-    return token_logprobs, raw_text, tokens_used
+def rejects_n(error) -> bool:
+    """True if a BadRequestError is about the `n` parameter rather than the request itself."""
+    if getattr(error, "param", None) == "n":
+        return True
+    message = str(getattr(error, "message", None) or error)
+    return "'n'" in message or "`n`" in message
+
+
+def sample_model_with_logprobs(
+    client: "OpenAI",
+    model_name: str,
+    prompt: str,
+    num_samples: int,
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+    top_logprobs: int = TOP_LOGPROBS,
+    temperature: float = 1.0,
+) -> Tuple[List[Dict[str, float]], List[str], TokenUsage]:
+    """
+    Draw `num_samples` completions for one prompt. Uses the API's `n`
+    parameter so the prompt's input tokens are billed once; models that
+    reject `n` fall back to one request per sample. Any other bad request
+    (context length, invalid parameters) would fail the same way K more
+    times and is raised.
+    """
+    from openai import BadRequestError
+
+    try:
+        return request_completions(
+            client=client,
+            model_name=model_name,
+            prompt=prompt,
+            max_output_tokens=max_output_tokens,
+            top_logprobs=top_logprobs,
+            temperature=temperature,
+            n=num_samples,
+        )
+    except BadRequestError as e:
+        if not rejects_n(e):
+            raise
+        logger.warning(f"[RUN] {model_name} rejected n={num_samples}, sampling one request at a time: {e}")
+
+    token_logprobs_list: List[Dict[str, float]] = []
+    raw_texts: List[str] = []
+    usage = TokenUsage()
+    for _ in range(num_samples):
+        token_logprobs, raw_text, used = call_model_with_logprobs(
+            client=client,
+            model_name=model_name,
+            prompt=prompt,
+            max_output_tokens=max_output_tokens,
+            top_logprobs=top_logprobs,
+            temperature=temperature,
+        )
+        token_logprobs_list.append(token_logprobs)
+        raw_texts.append(raw_text)
+        usage += used
+    return token_logprobs_list, raw_texts, usage
 
 
 
@@ -198,13 +319,42 @@ def argmax_key(d: Dict[str, float]) -> str:
     return max(d.items(), key=lambda kv: kv[1])[0]
 
 
+def aggregate_samples(
+    token_logprobs_list: List[Dict[str, float]],
+    raw_texts: List[str],
+    token_sets: Dict[str, List[str]],
+) -> Tuple[Dict[str, float], Dict[str, float], List[Dict]]:
+    """
+    Combine K sampled choices for one persona into:
+      - token_logprobs: log of the mean first-token probability across samples
+      - candidate_probs: mean of the per-sample candidate distributions
+      - samples: per-sample records (text, candidate_probs, predicted_choice)
+    """
+    k = len(token_logprobs_list)
+    samples: List[Dict] = []
+    candidate_probs: Dict[str, float] = {}
+    mean_token_probs: Dict[str, float] = {}
+    for token_logprobs, raw_text in zip(token_logprobs_list, raw_texts):
+        sample_probs = candidate_probs_from_logprobs(token_logprobs, token_sets)
+        samples.append({
+            "text": raw_text,
+            "candidate_probs": sample_probs,
+            "predicted_choice": argmax_key(sample_probs),
+        })
+        for cand, p in sample_probs.items():
+            candidate_probs[cand] = candidate_probs.get(cand, 0.0) + p / k
+        for tok, lp in token_logprobs.items():
+            mean_token_probs[tok] = mean_token_probs.get(tok, 0.0) + math.exp(lp) / k
+
+    token_logprobs = {tok: math.log(p) for tok, p in mean_token_probs.items() if p > 0}
+    return token_logprobs, candidate_probs, samples
+
+
 
 
 def estimate_total_cost_for_prompts(
     prompts: Sequence[str],
     model_name: str,
-    input_price_per_1k: float,
-    output_price_per_1k: float,
     max_output_tokens: int,
 ) -> float:
     """
@@ -215,16 +365,153 @@ def estimate_total_cost_for_prompts(
         total_cost += estimate_prompt_cost_usd(
             prompt=p,
             model_name=model_name,
-            input_price_per_1k=input_price_per_1k,
             max_output_tokens=max_output_tokens,
-            output_price_per_1k=output_price_per_1k,
         )
     return float(total_cost)
 
 
 
 
-@transaction.atomic
+def get_run_status(question_id: int) -> str:
+    """
+    Read the current run_status of a question straight from the database,
+    so that cancel / pause requests made by the API are seen by a running job.
+    """
+    return (
+        Question.objects.filter(id=question_id)
+        .values_list("run_status", flat=True)
+        .first()
+    )
+
+
+def acknowledge_pause(question_id: int) -> bool:
+    """Confirm a requested pause once the runner has stopped; only then may the run be resumed."""
+    return Question.objects.filter(id=question_id, run_status="pausing").update(run_status="paused") > 0
+
+
+def count_prompt_tokens(prompts: Sequence[str], model_names: Sequence[str]) -> Dict[str, List[int]]:
+    """
+    Token counts of every prompt for every model. Prompts are tokenized once
+    per distinct encoding, so comparing models that share a tokenizer
+    (e.g. gpt-4o-mini and gpt-4.1-nano) costs a single pass.
+    """
+    if not prompts:
+        return {model: [] for model in model_names}
+    counts_by_encoding: Dict[str, List[int]] = {}
+    counts: Dict[str, List[int]] = {}
+    for model in model_names:
+        enc = get_encoding_for_model(model)
+        if enc.name not in counts_by_encoding:
+            counts_by_encoding[enc.name] = [len(ids) for ids in enc.encode_batch(list(prompts))]
+        counts[model] = counts_by_encoding[enc.name]
+    return counts
+
+
+def prompt_cost_from_tokens(model_name: str, n_in: int, max_output_tokens: int = MAX_OUTPUT_TOKENS) -> float:
+    """
+    Same formula as common.estimate_prompt_cost_usd, for an already counted prompt.
+    """
+    return token_cost(model_name, n_in, max_output_tokens)
+
+
+def estimate_cost_from_sample(
+    project_id: int,
+    question: Question,
+    token_sets: Dict[str, List[str]],
+    model_names: Sequence[str],
+    num_samples: int = 1,
+    sample_size: int = COST_PREVIEW_SAMPLE_SIZE,
+) -> Dict:
+    """
+    Quick cost estimate from a uniform random sample of `sample_size`
+    persons instead of tokenizing the whole population.
+
+    Returns {"cost", "margin", "sample_size", "persons_total", "exact"};
+    margin is the 95% confidence half-width of the total (with finite
+    population correction), and exact is True when every person was counted.
+    """
+    person_ids = list(SiliconePerson.objects.filter(project_id=project_id).values_list("id", flat=True))
+    persons_total = len(person_ids)
+    if persons_total > sample_size:
+        person_ids = random.Random(question.id).sample(person_ids, sample_size)
+    persons = SiliconePerson.objects.filter(id__in=person_ids)
+
+    options = list(token_sets.keys())
+    prompts = [build_prompt(build_backstory(person), question.body, options) for person in persons]
+    token_counts = count_prompt_tokens(prompts, model_names)
+    costs = [
+        sum(prompt_cost_from_tokens(m, token_counts[m][i], MAX_OUTPUT_TOKENS * num_samples) for m in model_names)
+        for i in range(len(prompts))
+    ]
+
+    n = len(costs)
+    if n == 0:
+        return {"cost": 0.0, "margin": 0.0, "sample_size": 0, "persons_total": 0, "exact": True}
+    mean = sum(costs) / n
+    margin = 0.0
+    if 1 < n < persons_total:
+        variance = sum((c - mean) ** 2 for c in costs) / (n - 1)
+        margin = 1.96 * math.sqrt(variance / n * (1 - n / persons_total)) * persons_total
+    return {
+        "cost": float(mean * persons_total),
+        "margin": float(margin),
+        "sample_size": n,
+        "persons_total": persons_total,
+        "exact": n == persons_total,
+    }
+
+
+class ModelDispatcher:
+    """
+    Sends prompts to several models concurrently. Each model has its own
+    concurrency budget (MODEL_MAX_CONCURRENCY, default DEFAULT_MODEL_CONCURRENCY)
+    so a slow or rate-limited model does not starve the others.
+    Only API calls run in worker threads; all DB writes stay in the caller.
+    """
+
+    def __init__(self, client: "OpenAI", model_names: Sequence[str]):
+        self.client = client
+        self.budgets = {
+            m: threading.Semaphore(MODEL_MAX_CONCURRENCY.get(m, DEFAULT_MODEL_CONCURRENCY))
+            for m in model_names
+        }
+        max_workers = sum(MODEL_MAX_CONCURRENCY.get(m, DEFAULT_MODEL_CONCURRENCY) for m in model_names)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _call(self, model_name: str, prompt: str, temperature: float, num_samples: int):
+        with self.budgets[model_name]:
+            if num_samples > 1:
+                return sample_model_with_logprobs(
+                    client=self.client,
+                    model_name=model_name,
+                    prompt=prompt,
+                    num_samples=num_samples,
+                    max_output_tokens=MAX_OUTPUT_TOKENS,
+                    top_logprobs=TOP_LOGPROBS,
+                    temperature=temperature,
+                )
+            return call_model_with_logprobs(
+                client=self.client,
+                model_name=model_name,
+                prompt=prompt,
+                max_output_tokens=MAX_OUTPUT_TOKENS,
+                top_logprobs=TOP_LOGPROBS,
+                temperature=temperature,
+            )
+
+    def map(self, jobs: Sequence[Tuple[str, str]], temperature: float, num_samples: int = 1) -> List[Tuple]:
+        """
+        jobs: list of (model_name, prompt). Results come back in job order,
+        as returned by call_model_with_logprobs (or sample_model_with_logprobs
+        when num_samples > 1).
+        """
+        futures = [self.executor.submit(self._call, m, p, temperature, num_samples) for m, p in jobs]
+        return [f.result() for f in futures]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
 def run_human_sampling_for_project(
     project: Union[int, Project, QuerySet],
     question: Union[int, Question, QuerySet],
@@ -232,6 +519,10 @@ def run_human_sampling_for_project(
     model_name: str = MODEL_NAME,
     temperature: float = 0.0,
     just_cost: bool = False,
+    chunk_size: int = RUN_CHUNK_SIZE,
+    model_names: Sequence[str] = None,
+    num_samples: int = 1,
+    target_precision: float = None,
 ) -> float:
     """
     Main entry:
@@ -240,6 +531,22 @@ def run_human_sampling_for_project(
     - question: Question instance, question id, or QuerySet[Question]
     - token_sets: dict[candidate_name -> list of lexical tokens]
                   (e.g., DEFAULT_TOKEN_SETS_2016)
+    - model_names: optional list of models to compare; every prompt is built
+                   once and sent to all of them. Defaults to [model_name].
+    - num_samples: K > 1 draws K completions per persona at `temperature`
+                   (one request with `n=K`) and stores their averaged
+                   candidate_probs plus the per-sample records.
+    - target_precision: adaptive mode. Persons are visited in a random order
+                   stratified by ADAPTIVE_STRATIFY_FIELD and the run stops once
+                   the 95% CI half-width of every option's vote share (for the
+                   first model) is at most this value. The stopping point and
+                   the achieved precision are saved on the Cost row.
+
+    Persons are processed in chunks of `chunk_size`, each chunk committed in
+    its own transaction. Between chunks the question's run_status is checked:
+    if it was paused or cancelled the run stops, keeping what was already
+    saved, and a requested pause is confirmed when the run ends. Persons that already have a Response for this question and model
+    are skipped, so a resumed run only calls the model for the rest.
     """
 
     if isinstance(project, QuerySet):
@@ -254,6 +561,7 @@ def run_human_sampling_for_project(
 
     project_obj: Project = project
     question_obj: Question = question
+    models = list(dict.fromkeys(model_names or [model_name]))
 
     persons: List[SiliconePerson] = list(
         SiliconePerson.objects.filter(project=project_obj)
@@ -262,85 +570,229 @@ def run_human_sampling_for_project(
     question_text = question_obj.body
     options = list(token_sets.keys())
 
-    prompts: List[str] = []
+    done: set = set()
+    if not just_cost:
+        done = set(
+            Response.objects.filter(question=question_obj, gpt_model__in=models)
+            .values_list("silicone_person_id", "gpt_model")
+        )
+
+    estimate = None
+    if target_precision:
+        persons = stratified_order(
+            persons, key=lambda p: getattr(p, ADAPTIVE_STRATIFY_FIELD), seed=question_obj.id
+        )
+        estimate = RunningVoteShare(population=len(persons))
+        if done:
+            answered = Response.objects.filter(question=question_obj, gpt_model=models[0])
+            for struct in answered.values_list("structured_data", flat=True):
+                estimate.add((struct or {}).get("candidate_probs") or {})
+
+    # (person, prompt, models still to ask) for every person with work left
+    pending: List[Tuple[SiliconePerson, str, List[str]]] = []
     for person in persons:
+        todo = [m for m in models if (person.id, m) not in done]
+        if not todo:
+            continue
         backstory = build_backstory(person)
         prompt_text = build_prompt(backstory, question_text, options)
-        prompts.append(prompt_text)
-    total_cost = estimate_total_cost_for_prompts(
-        prompts=prompts,
-        model_name=model_name,
-        input_price_per_1k=INPUT_PRICE_PER_1K,
-        output_price_per_1k=OUTPUT_PRICE_PER_1K,
-        max_output_tokens=MAX_OUTPUT_TOKENS,
-    )
-    if just_cost:
-        return total_cost
-    Cost.objects.create(
+        pending.append((person, prompt_text, todo))
+
+    token_counts = count_prompt_tokens([p for _, p, _ in pending], models)
+    person_costs = [
+        sum(prompt_cost_from_tokens(m, token_counts[m][i], MAX_OUTPUT_TOKENS * num_samples) for m in todo)
+        for i, (_, _, todo) in enumerate(pending)
+    ]
+    total_cost = sum(person_costs)
+    if just_cost or not pending:
+        return float(total_cost)
+    cost_row = Cost.objects.create(
         project=project_obj,
         question=question_obj,
         total_cost=total_cost,
+        persons_total=len(persons),
     )
+    run_summaries.start_run(question_obj, len(persons))
 
-    client = create_client()
-
-    for person, prompt_text in zip(persons, prompts):
-        Prompt.objects.create(
-            project=project_obj,
-            body=prompt_text,
-            question=question_obj,
-            silicone_person=person,
-        )
-
-        token_logprobs, raw_text, tokens_used = call_model_with_logprobs(
-            client=client,
-            model_name=model_name,
-            prompt=prompt_text,
-            max_output_tokens=MAX_OUTPUT_TOKENS,
-            top_logprobs=TOP_LOGPROBS,
-            temperature=temperature,
-        )
-
-        candidate_probs = candidate_probs_from_logprobs(token_logprobs, token_sets)
-        predicted_choice = argmax_key(candidate_probs)
-        confidence = candidate_probs.get(predicted_choice, None) if predicted_choice else None
-
-        Response.objects.create(
-            question=question_obj,
-            silicone_person=person,
-            raw_response=raw_text,
-            structured_data={
-                "token_logprobs": token_logprobs,
-                "candidate_probs": candidate_probs,
-                "predicted_choice": predicted_choice,
-                "options": options,
-            },
-            confidence_score=confidence,
-            gpt_model=model_name,
-        )
-
-        ModelLog.objects.create(
-            project=project_obj,
-            silicone_person=person,
-            prompt_text=prompt_text,
-            response_text=raw_text,
-            model_name=model_name,
-            tokens_used=tokens_used,
-            temperature=temperature,
-        )
-
-    return total_cost
-
-
+    started_person_ids = {person_id for person_id, _ in done}
+    dispatcher = ModelDispatcher(create_client(), models)
+    queried = 0
+    actual_cost = 0.0
+    reservation = None
+    try:
+        for start in range(0, len(pending), chunk_size):
+            run_status = get_run_status(question_obj.id)
+            if run_status in ("pausing", "paused", "cancelled"):
+                logger.info(f"[RUN] Question {question_obj.id} {run_status}, stopping after {start} persons")
+                break
+            if estimate is not None and estimate.n >= ADAPTIVE_MIN_PERSONS:
+                half_width = estimate.half_width()
+                if half_width is not None and half_width <= target_precision:
+                    logger.info(
+                        f"[RUN] Question {question_obj.id} reached precision {half_width:.4f} "
+                        f"after {estimate.n} of {len(persons)} persons, stopping early"
+                    )
+                    break
+
+            chunk = pending[start:start + chunk_size]
+            # reserve the chunk's estimated cost before paying for it; at the
+            # limit the run pauses and can be resumed once the budget is raised
+            try:
+                reservation = budgets.reserve(project_obj.id, float(sum(person_costs[start:start + len(chunk)])))
+            except budgets.BudgetExceeded as e:
+                logger.info(f"[RUN] Question {question_obj.id} paused after {start} persons: {e}")
+                Question.objects.filter(
+                    id=question_obj.id, run_status__in=["pending", "running", "pausing"]
+                ).update(run_status="paused")
+                break
+
+            jobs = [(person, prompt_text, m) for person, prompt_text, todo in chunk for m in todo]
+            results = dispatcher.map([(m, prompt_text) for _, prompt_text, m in jobs], temperature, num_samples)
+
+            with transaction.atomic():
+                # each prompt text is written once and referenced by Prompt and ModelLog
+                blob_hashes = PromptBlob.store_many(prompt_text for _, prompt_text, _ in chunk)
+                for person, prompt_text, _ in chunk:
+                    if person.id in started_person_ids:
+                        continue
+                    Prompt.objects.create(
+                        project=project_obj,
+                        blob_id=blob_hashes[prompt_text],
+                        question=question_obj,
+                        silicone_person=person,
+                    )
+
+                answers = []
+                for (person, prompt_text, m), (token_logprobs, raw_text, usage) in zip(jobs, results):
+                    samples = None
+                    if num_samples > 1:
+                        raw_texts = raw_text
+                        token_logprobs, candidate_probs, samples = aggregate_samples(token_logprobs, raw_texts, token_sets)
+                        raw_text = Counter(raw_texts).most_common(1)[0][0]
+                    else:
+                        candidate_probs = candidate_probs_from_logprobs(token_logprobs, token_sets)
+                    answers.append((person, prompt_text, m, token_logprobs, candidate_probs, samples, raw_text, usage))
+
+                # one vocabulary lookup for every token of the chunk
+                token_ids = intern_tokens(t for answer in answers for t in answer[3])
+
+                chunk_usage = TokenUsage()
+                chunk_cost = 0.0
+                responses = []
+                logs = []
+                for person, prompt_text, m, token_logprobs, candidate_probs, samples, raw_text, usage in answers:
+                    predicted_choice = argmax_key(candidate_probs)
+                    confidence = candidate_probs.get(predicted_choice, None) if predicted_choice else None
+
+                    structured_data = {
+                        "candidate_probs": candidate_probs,
+                        "predicted_choice": predicted_choice,
+                        "options": options,
+                    }
+                    if samples is not None:
+                        structured_data["num_samples"] = num_samples
+                        structured_data["samples"] = samples
+                    if estimate is not None and m == models[0]:
+                        estimate.add(candidate_probs)
+
+                    call_cost = usage_cost(m, usage)
+                    chunk_usage += usage
+                    chunk_cost += call_cost
+
+                    responses.append(Response(
+                        question=question_obj,
+                        silicone_person=person,
+                        raw_response=raw_text,
+                        structured_data=structured_data,
+                        logprobs_packed=pack_logprobs(token_logprobs, token_ids),
+                        confidence_score=confidence,
+                        gpt_model=m,
+                    ))
+                    logs.append(ModelLog(
+                        project=project_obj,
+                        silicone_person=person,
+                        prompt_blob_id=blob_hashes[prompt_text],
+                        response_text=raw_text,
+                        model_name=m,
+                        tokens_used=usage.total,
+                        prompt_tokens=usage.prompt_tokens,
+                        completion_tokens=usage.completion_tokens,
+                        cached_tokens=usage.cached_tokens,
+                        cost=call_cost,
+                        temperature=temperature,
+                    ))
+
+                # another worker resuming the same question may have stored some
+                # of these answers already; every call was paid, so all are logged
+                stored = set(
+                    Response.objects.filter(
+                        question=question_obj, silicone_person__in=[person for person, _, _ in chunk]
+                    ).values_list("silicone_person_id", "gpt_model")
+                )
+                responses = [r for r in responses if (r.silicone_person_id, r.gpt_model) not in stored]
+                Response.objects.bulk_create(responses, ignore_conflicts=True)
+                ModelLog.objects.bulk_create(logs)
+
+                # question and project totals move in the same transaction as the rows
+                run_summaries.record_chunk(
+                    question_obj.id,
+                    project_obj.id,
+                    responses=len(responses),
+                    usage=chunk_usage,
+                    cost=chunk_cost,
+                    estimated_cost=float(sum(person_costs[start:start + len(chunk)])),
+                )
+                caching.bump_project_version(project_obj.id, project_obj.user_id)
+            queried += len(chunk)
+            actual_cost += chunk_cost
+            budgets.settle(reservation, chunk_cost)
+            reservation = None
+    finally:
+        dispatcher.close()
+        # also covers a pause that arrived after the last chunk
+        acknowledge_pause(question_obj.id)
+        if reservation is not None:
+            # the chunk failed before it was committed
+            budgets.release(reservation)
+        spent = float(sum(person_costs[:queried]))
+        persons_queried = len(persons) - len(pending) + queried
+        achieved_precision = estimate.half_width() if estimate is not None else None
+        with transaction.atomic():
+            Cost.objects.filter(id=cost_row.id).update(
+                total_cost=spent,
+                actual_cost=actual_cost,
+                persons_queried=persons_queried,
+                achieved_precision=achieved_precision,
+            )
+            run_summaries.finish_run(question_obj.id, persons_queried, achieved_precision)
+
+    return spent
+
+
+
+
+def get_question_models(question: Question) -> List[str]:
+    """
+    Models a question should be run on: its model_name (or the GPT_MODEL
+    default) followed by any compare_models, without duplicates.
+    """
+    models = [question.model_name or MODEL_NAME] + list(question.compare_models or [])
+    return list(dict.fromkeys(m for m in models if m))
 
 
 def run(project, question, year):
+    """
+    Run a question on its own models (get_question_models): GPT_MODEL is
+    only the fallback for a question without a model_name.
+    """
     token_sets = get_default_token_sets(year)
     cost = run_human_sampling_for_project(
         project=project.id,
         question=question.id,
         token_sets=token_sets,
-        model_name=MODEL_NAME,
-        temperature=0.0,
+        model_names=get_question_models(question),
+        temperature=question.temperature,
+        num_samples=question.num_samples,
+        target_precision=question.target_precision,
     )
     return cost
@@ -0,0 +1,104 @@
+"""
+Per-question run summaries.
+
+QuestionRunSummary holds what question lists show (responses, token
+usage, estimated and actual cost, run timestamps, headline metrics) so
+they read one row per question. The writers update it inside their own
+transactions:
+
+    runner       start_run() when a run begins, record_chunk() in each
+                 chunk's transaction (also rolling usage and cost up to
+                 the project), finish_run() when it stops
+    ask_gpt      mark_finished() when the question completes
+    analysis     record_metrics() with the AnalysisResult it saves
+
+Counters are bumped with F() expressions, so concurrent workers add up
+instead of overwriting each other.
+"""
+
+from typing import Any, Dict, Optional
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Project, Question, QuestionRunSummary
+from .pricing import TokenUsage
+
+
+def _summary(question_id: int):
+    return QuestionRunSummary.objects.filter(question_id=question_id)
+
+
+def start_run(question: Question, persons_total: int) -> None:
+    summary, created = QuestionRunSummary.objects.get_or_create(
+        question=question,
+        defaults={"project_id": question.project_id, "persons_total": persons_total, "started_at": timezone.now()},
+    )
+    if not created:
+        # a resumed run keeps its first start time
+        _summary(question.id).update(
+            persons_total=persons_total,
+            started_at=summary.started_at or timezone.now(),
+            finished_at=None,
+            updated_at=timezone.now(),
+        )
+
+
+def record_chunk(
+    question_id: int,
+    project_id: int,
+    responses: int,
+    usage: TokenUsage,
+    cost: float,
+    estimated_cost: float,
+) -> None:
+    """Add a chunk's responses, token usage and cost to the question and project totals."""
+    _summary(question_id).update(
+        response_count=F("response_count") + responses,
+        tokens_used=F("tokens_used") + usage.total,
+        prompt_tokens=F("prompt_tokens") + usage.prompt_tokens,
+        completion_tokens=F("completion_tokens") + usage.completion_tokens,
+        cached_tokens=F("cached_tokens") + usage.cached_tokens,
+        cost=F("cost") + cost,
+        estimated_cost=F("estimated_cost") + estimated_cost,
+        updated_at=timezone.now(),
+    )
+    Project.objects.filter(id=project_id).update(
+        prompt_tokens=F("prompt_tokens") + usage.prompt_tokens,
+        completion_tokens=F("completion_tokens") + usage.completion_tokens,
+        cached_tokens=F("cached_tokens") + usage.cached_tokens,
+        actual_cost=F("actual_cost") + cost,
+        estimated_cost=F("estimated_cost") + estimated_cost,
+    )
+
+
+def finish_run(question_id: int, persons_queried: int, achieved_precision: Optional[float]) -> None:
+    _summary(question_id).update(
+        persons_queried=persons_queried,
+        achieved_precision=achieved_precision,
+        updated_at=timezone.now(),
+    )
+
+
+def mark_finished(question_id: int) -> None:
+    _summary(question_id).update(finished_at=timezone.now(), updated_at=timezone.now())
+
+
+def record_metrics(question_id: int, project_id: int, result_data: Dict[str, Any]) -> None:
+    metrics = headline_metrics(result_data)
+    QuestionRunSummary.objects.update_or_create(
+        question_id=question_id,
+        defaults={
+            "project_id": project_id,
+            "accuracy": metrics.get("accuracy"),
+            "cohens_kappa": metrics.get("cohens_kappa"),
+            "metrics": metrics,
+            "analysed_at": timezone.now(),
+        },
+    )
+
+
+def headline_metrics(result_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """An AnalysisResult's result_data without the per-person probabilities."""
+    data = result_data or {}
+    return {k: v for k, v in data.items() if k != "collapsed_probs_by_person"}
@@ -1,11 +1,25 @@
 from rest_framework import serializers
-from .models import Project, SiliconePerson, Question
+from .models import Project, SiliconePerson, Question, ImportJob, QuestionRunSummary
 from .utils import MODEL_PRICING
 import json
 
 class CreateProjectSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=255)
     description = serializers.CharField(allow_blank=True, required=False)
+    budget_limit = serializers.FloatField(
+        required=False, allow_null=True, min_value=0,
+        help_text="Spending limit in USD; runs pause when it is reached."
+    )
+
+
+class UpdateProjectSerializer(serializers.Serializer):
+    project_id = serializers.IntegerField()
+    title = serializers.CharField(max_length=255, required=False)
+    description = serializers.CharField(allow_blank=True, required=False)
+    budget_limit = serializers.FloatField(
+        required=False, allow_null=True, min_value=0,
+        help_text="Spending limit in USD, null for none; runs paused at the old limit can be resumed."
+    )
 
 
 class ProjectListSerializer(serializers.ModelSerializer):
@@ -45,6 +59,30 @@ class CreateQuestionSerializer(serializers.Serializer):
     body = serializers.CharField(allow_blank=True)
     real_answer = serializers.CharField(allow_blank=True, required=False)
     model_name = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    compare_models = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=True)
+    num_samples = serializers.IntegerField(required=False, min_value=1, max_value=128, default=1)
+    temperature = serializers.FloatField(required=False, min_value=0.0, max_value=2.0, default=0.0)
+    target_precision = serializers.FloatField(
+        required=False, allow_null=True, min_value=0.001, max_value=0.5,
+        help_text="Adaptive run: stop once the 95% CI half-width of the vote share is at most this value."
+    )
+
+    def validate(self, attrs):
+        if attrs.get('num_samples', 1) > 1 and attrs.get('temperature', 0.0) <= 0:
+            raise serializers.ValidationError("Repeated sampling (num_samples > 1) needs a temperature above 0.")
+        return attrs
+
+    def validate_compare_models(self, value):
+        unknown = [m for m in value if m not in MODEL_PRICING]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Invalid model(s): {', '.join(unknown)}. Supported models: {', '.join(MODEL_PRICING.keys())}"
+            )
+        return list(dict.fromkeys(value))
+
+class QuestionRunControlSerializer(serializers.Serializer):
+    question_id = serializers.IntegerField()
+    action = serializers.ChoiceField(choices=['cancel', 'pause', 'resume'])
 
 class QuestionListSerializer(serializers.ModelSerializer):
     class Meta:
@@ -52,16 +90,63 @@ class QuestionListSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class QuestionRunSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QuestionRunSummary
+        exclude = ['question', 'project']
+
+
+class QuestionSummaryListSerializer(serializers.ModelSerializer):
+    run_summary = QuestionRunSummarySerializer(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Question
+        fields = [
+            'id', 'body', 'model_name', 'compare_models', 'run_status', 'gpt_answer', 'is_analysed',
+            'estimated_cost', 'created_at', 'run_summary',
+        ]
+
+
 
 class SiliconPersonCSVUploadSerializer(serializers.Serializer):
     project_id = serializers.IntegerField()
     silicon_persons = serializers.FileField()
 
+class SiliconPersonArrowUploadSerializer(serializers.Serializer):
+    project_id = serializers.IntegerField()
+    silicon_persons = serializers.FileField(help_text="Parquet (.parquet) or Arrow IPC (.arrow, .feather) file.")
+
 class QuestionsCSVUploadSerializer(serializers.Serializer):
     project_id = serializers.IntegerField()
     questions = serializers.FileField()
 
 
+class ImportJobUploadSerializer(serializers.Serializer):
+    project_id = serializers.IntegerField()
+    kind = serializers.ChoiceField(choices=ImportJob.KIND_CHOICES)
+    file = serializers.FileField(help_text="Supported formats: .csv, .xlsx, and for persons .parquet, .arrow, .feather.")
+    model_name = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate(self, attrs):
+        allowed = ('.csv', '.xlsx')
+        if attrs['kind'] == 'silicone_persons':
+            allowed += ('.parquet', '.arrow', '.feather')
+        if not attrs['file'].name.endswith(allowed):
+            raise serializers.ValidationError({'file': f"Unsupported file format. Please upload {', '.join(allowed)}."})
+        return attrs
+
+    def validate_model_name(self, value):
+        if value and value not in MODEL_PRICING:
+            raise serializers.ValidationError(f"Invalid model_name. Supported models: {', '.join(MODEL_PRICING.keys())}")
+        return value
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        exclude = ['file', 'lease_token']
+
+
 class TokenCostSerializer(serializers.Serializer):
     """
     Validates input for token cost estimation based on:
@@ -74,6 +159,11 @@ class TokenCostSerializer(serializers.Serializer):
         min_value=1, 
         help_text="The total number of silicon people to simulate."
     )
+    project_id = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        help_text="Optional project whose silicon people's backstories are used for the token count."
+    )
     
     # Question Sources (Mutually Exclusive)
     questions_list = serializers.ListField(
@@ -0,0 +1,19 @@
+from django.db.models.query import QuerySet
+from django.dispatch import Signal
+
+# Sent by SiliconePerson.objects.bulk_create, which skips post_save.
+# Arguments: project_ids (set of ids), persons (list of the created instances)
+persons_bulk_created = Signal()
+
+
+def deleted_by_cascade(sender, origin) -> bool:
+    """
+    True when a post_delete of `sender` comes from deleting rows of another
+    model, e.g. the personas of a deleted project. The receivers of that
+    model cover everything the delete takes along, so per-row work can be
+    skipped.
+    """
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return not issubclass(model, sender)
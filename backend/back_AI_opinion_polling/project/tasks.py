@@ -1,64 +1,142 @@
+from datetime import timedelta
+from uuid import uuid4
 from celery import shared_task
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
 from loguru import logger
-from .models import Project, Question
-from .replication.postprocessor import compute_metrics_for_project, save_metrics_to_db
-from .replication.runner import run
+from .importers import (
+    ARROW_EXTENSIONS,
+    MAX_REPORTED_ERRORS,
+    import_persons_from_arrow,
+    import_rows,
+    iter_file_rows,
+    person_from_row,
+    question_deduplicator,
+    question_from_row,
+)
+from .caching import bump_project_version
+from .models import ImportJob, PersonaTokenProfile, Project, Question
+from .partitions import ensure_upcoming_partitions
+from .run_summaries import mark_finished
+from .replication.common import get_default_token_sets
+from .replication.runner import run, get_run_status, get_question_models
+from .token_profiles import build_token_profile, estimate_cost_from_profiles, verify_token_profiles
+
+
+def set_project_status(project_id, new_status, only_from=None):
+    """
+    Move a project to `new_status` with one conditional UPDATE instead of a
+    read-modify-save, so concurrent workers cannot overwrite each other.
+    Returns True if the row was changed.
+    """
+    projects = Project.objects.filter(id=project_id).exclude(status=new_status)
+    if only_from is not None:
+        projects = projects.filter(status__in=only_from)
+    changed = projects.update(status=new_status, updated_at=timezone.now()) > 0
+    if changed:
+        bump_project_version(project_id)
+    return changed
+
+
+def complete_project_if_done(project_id):
+    """
+    Mark a running project completed when none of its questions is still
+    unanswered (cancelled questions do not count), in a single
+    UPDATE ... WHERE NOT EXISTS query.
+    """
+    unanswered = Question.objects.filter(
+        project_id=OuterRef("pk"), gpt_answer=False
+    ).exclude(run_status="cancelled")
+    completed = Project.objects.filter(id=project_id, status="running").exclude(
+        Exists(unanswered)
+    ).update(status="completed", updated_at=timezone.now()) > 0
+    if completed:
+        bump_project_version(project_id)
+    return completed
+
+
+def fail_project_if_stuck(project_id):
+    """
+    Mark a project failed once it has a failed question and none that
+    could still run or be resumed.
+    """
+    questions = Question.objects.filter(project_id=project_id, gpt_answer=False)
+    if questions.filter(run_status__in=["pending", "running", "pausing", "paused"]).exists():
+        return False
+    if not questions.filter(run_status="failed").exists():
+        return False
+    return set_project_status(project_id, "failed", only_from=["running"])
 
 @shared_task
 def ask_gpt(question_id=None):
     """
     Replacement ask_gpt that uses the replication runner (Completion API + logprobs).
+    A question whose run raises is marked failed and the others still run.
     """
-    try:
-        if question_id:
-            questions = Question.objects.filter(id=question_id)
-        else:
-            projects = Project.objects.filter(status="draft")
-            questions = Question.objects.filter(project__in=projects,  gpt_answer=False)
+    if question_id:
+        questions = Question.objects.filter(id=question_id)
+    else:
+        projects = Project.objects.filter(status="draft")
+        questions = Question.objects.filter(project__in=projects,  gpt_answer=False, run_status="pending")
 
-        for question in questions:
-            if question.gpt_answer:
-                continue
+    for question in questions:
+        if question.gpt_answer:
+            continue
 
-            project = question.project
-            project.status = "running"
-            project.save()
-
-            logger.info(f"[RUN] Starting replication for project {project.id}")
-
-            year = ""
-            if project.id == 1:
-                year = 2016
-            elif project.id == 3:
-                year = 2012
-            elif project.id == 4:
-                year = 2020
-            cost = run(project, question, year)
-            logger.info(f"[RUN] Completed replication for question {question.id} and cost is {cost}")
-            question.gpt_answer = True
-            question.save()
-
-            qs = project.questions.all()
-            completed_check = True
-            for q in qs:
-                if not q.gpt_answer:
-                    completed_check = False
-                    break
-            if completed_check:
-                project.status = "completed"
-                project.save()
-            logger.info(f"[DONE] Replication completed for project {project.id}")
+        # Only a pending question may start; paused / cancelled ones are left alone
+        started = Question.objects.filter(id=question.id, run_status="pending").update(run_status="running")
+        if not started:
+            logger.info(f"[RUN] Question {question.id} is {question.run_status}, skipping")
+            continue
 
-    except Exception as e:
-        logger.error(f"[ask_gpt ERROR] {e}")
-        project = question.project
-        project.status = "failed"
-        project.save()
+        try:
+            run_question(question)
+        except Exception as e:
+            logger.error(f"[ask_gpt ERROR] Question {question.id}: {e}")
+            Question.objects.filter(id=question.id).update(run_status="failed")
+            fail_project_if_stuck(question.project_id)
 
     return {"status": "ok"}
 
+
+def run_question(question):
+    project = question.project
+    set_project_status(project.id, "running")
+
+    logger.info(f"[RUN] Starting replication for project {project.id}")
+
+    year = ""
+    if project.id == 1:
+        year = 2016
+    elif project.id == 3:
+        year = 2012
+    elif project.id == 4:
+        year = 2020
+    cost = run(project, question, year)
+    run_status = get_run_status(question.id)
+    if run_status != "running":
+        logger.info(f"[RUN] Replication for question {question.id} stopped ({run_status}), cost is {cost}")
+        # a cancelled question no longer keeps the project running
+        if not complete_project_if_done(project.id):
+            fail_project_if_stuck(project.id)
+        return
+    logger.info(f"[RUN] Completed replication for question {question.id} and cost is {cost}")
+    with transaction.atomic():
+        Question.objects.filter(id=question.id).update(
+            gpt_answer=True, run_status="completed", updated_at=timezone.now()
+        )
+        mark_finished(question.id)
+
+    if not complete_project_if_done(project.id):
+        fail_project_if_stuck(project.id)
+    logger.info(f"[DONE] Replication completed for project {project.id}")
+
 @shared_task
 def analysis_results():
+    # pandas, scipy and scikit-learn are only needed here; importing them at
+    # module level would load them in every web worker that imports tasks
+    from .replication.postprocessor import compute_metrics_for_project, save_metrics_to_db
 
     summary = {
         "projects_analyzed": 0,
@@ -87,4 +165,169 @@ def analysis_results():
     except Exception as e:
         logger.error(f"[analysis_results ERROR] {e}")
 
-    return summary
\ No newline at end of file
+    return summary
+
+
+# A running import that has not committed progress for this long is
+# assumed to have lost its worker: its lease has expired and another worker
+# may take the job over. A pending job this old lost its queued task.
+IMPORT_JOB_STALL_TIMEOUT = timedelta(minutes=10)
+
+
+class ImportLeaseLost(Exception):
+    """Another worker took the job over; the current batch is rolled back."""
+
+
+def claim_import_job(job_id):
+    """
+    Take a pending job, or a running one whose lease has expired, in one
+    conditional UPDATE, so two workers cannot both run it. Returns the
+    lease token to renew with every batch, or None if the job is taken
+    or finished.
+    """
+    token = uuid4().hex
+    now = timezone.now()
+    claimed = ImportJob.objects.filter(id=job_id).filter(
+        Q(status="pending") | Q(status="running", updated_at__lt=now - IMPORT_JOB_STALL_TIMEOUT)
+    ).update(status="running", lease_token=token, updated_at=now)
+    return token if claimed else None
+
+
+@shared_task
+def run_import_job(job_id):
+    """
+    Ingest an uploaded persona or question file in batches. Each batch is
+    committed together with the job's progress, so a restarted job
+    continues after the last committed row. The progress update also
+    renews the worker's lease; a worker whose lease was taken over stops
+    and rolls its batch back.
+    """
+    token = claim_import_job(job_id)
+    job = ImportJob.objects.select_related("project").get(id=job_id)
+    if token is None:
+        logger.info(f"[IMPORT] Job {job.id} is {job.status} and held by another worker or finished, skipping")
+        return {"status": job.status}
+    leased = ImportJob.objects.filter(id=job.id, lease_token=token)
+    project = job.project
+
+    if job.kind == "questions":
+        build_object = lambda row: question_from_row(row, project, job.model_name)
+        drop_duplicates = question_deduplicator(project)
+    else:
+        build_object = lambda row: person_from_row(row, project)
+        drop_duplicates = None
+
+    reported_errors = list(job.errors or [])
+
+    def on_batch(rows_processed, created, duplicates, new_errors):
+        reported_errors.extend(new_errors[:max(MAX_REPORTED_ERRORS - len(reported_errors), 0)])
+        renewed = leased.update(
+            rows_processed=rows_processed,
+            created_count=F("created_count") + created,
+            duplicate_count=F("duplicate_count") + duplicates,
+            error_count=F("error_count") + len(new_errors),
+            errors=reported_errors,
+            updated_at=timezone.now(),
+        )
+        if not renewed:
+            raise ImportLeaseLost(f"Job {job.id} was taken over by another worker")
+
+    try:
+        logger.info(f"[IMPORT] Job {job.id}: {job.kind} for project {project.id}, from row {job.rows_processed + 1}")
+        path = job.file.path
+        if job.kind == "silicone_persons" and path.endswith(ARROW_EXTENSIONS):
+            import_persons_from_arrow(path, path, project, skip_rows=job.rows_processed, on_batch=on_batch)
+        else:
+            import_rows(
+                iter_file_rows(path),
+                build_object,
+                skip_rows=job.rows_processed,
+                on_batch=on_batch,
+                drop_duplicates=drop_duplicates,
+            )
+    except ImportLeaseLost as e:
+        logger.warning(f"[IMPORT] {e}, stopping")
+        return {"status": "running"}
+    except Exception as e:
+        logger.error(f"[IMPORT ERROR] Job {job.id}: {e}")
+        leased.update(
+            status="failed", error_message=str(e), finished_at=timezone.now(), updated_at=timezone.now()
+        )
+        return {"status": "failed"}
+
+    if not leased.update(status="completed", finished_at=timezone.now(), updated_at=timezone.now()):
+        logger.warning(f"[IMPORT] Job {job.id} was taken over by another worker before it completed")
+        return {"status": "running"}
+    if job.kind == "questions":
+        set_project_status(project.id, "draft")
+    logger.info(f"[IMPORT] Job {job.id} completed")
+    return {"status": "completed"}
+
+
+@shared_task
+def resume_stalled_import_jobs():
+    """
+    Re-queue import jobs whose worker died mid-file, and pending jobs whose
+    queued task was lost; they resume from their last committed row. The
+    re-queued task claims the job itself, so a worker that renewed its
+    lease in the meantime keeps it.
+    """
+    stalled = list(ImportJob.objects.filter(
+        status__in=["pending", "running"], updated_at__lt=timezone.now() - IMPORT_JOB_STALL_TIMEOUT
+    ).values_list("id", flat=True))
+    for job_id in stalled:
+        logger.info(f"[IMPORT] Resuming stalled job {job_id}")
+        run_import_job.delay(job_id)
+    return {"resumed": len(stalled)}
+
+
+@shared_task
+def estimate_question_cost(question_id, year=0):
+    """
+    Cost of a question over every persona, stored on the question. Builds
+    the project's token profiles if they are missing, which makes later
+    estimates for the project immediate.
+    """
+    question = Question.objects.filter(id=question_id).first()
+    if question is None:
+        return None
+    estimate = estimate_cost_from_profiles(
+        question.project_id,
+        question,
+        get_default_token_sets(year),
+        model_names=get_question_models(question),
+        num_samples=question.num_samples,
+        build=True,
+    )
+    Question.objects.filter(id=question_id).update(estimated_cost=estimate["cost"])
+    logger.info(f"[COST] Question {question_id} estimated at {estimate['cost']}")
+    return estimate["cost"]
+
+
+@shared_task
+def build_token_profile_task(project_id, model_name):
+    """Build the project's token profile for the model's encoding."""
+    profile = build_token_profile(project_id, model_name)
+    logger.info(f"[COST] Token profile {profile.encoding} of project {project_id} built")
+    return profile.id
+
+
+@shared_task
+def verify_all_token_profiles():
+    """Rebuild token profiles that drifted from their personas."""
+    rebuilt = 0
+    project_ids = PersonaTokenProfile.objects.values_list("project_id", flat=True).distinct()
+    for project_id in project_ids:
+        rebuilt += verify_token_profiles(project_id)
+    if rebuilt:
+        logger.warning(f"[COST] Rebuilt {rebuilt} token profiles that no longer matched their personas")
+    return rebuilt
+
+
+@shared_task
+def ensure_model_log_partitions():
+    """Create the ModelLog partitions of the coming months (PostgreSQL only)."""
+    created = ensure_upcoming_partitions()
+    if created:
+        logger.info(f"[PARTITIONS] Created ModelLog partitions for {', '.join(m.strftime('%Y-%m') for m in created)}")
+    return len(created)
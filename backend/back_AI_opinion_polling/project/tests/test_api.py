@@ -1,7 +1,7 @@
 import pytest
 from rest_framework.test import APIClient
 from django.urls import reverse
-from project.models import Project, SiliconePerson, Question, Response as ResponseModel
+from project.models import Project, SiliconePerson, Question, QuestionRunSummary, Response as ResponseModel
 from user.models import User
 
 
@@ -76,6 +76,94 @@ class TestProjectView:
         response = api_client.get(url)
         assert response.status_code == 401
 
+    def test_update_budget_limits(self, auth_client, project, user, monkeypatch):
+        forgotten = []
+        monkeypatch.setattr("project.budgets.forget_spend", lambda **scope: forgotten.append(scope))
+        url = reverse("project")
+        response = auth_client.patch(url, {"project_id": project.id, "budget_limit": 5.0}, format="json")
+        assert response.status_code == 200
+        assert response.data["data"]["budget_limit"] == 5.0
+        project.refresh_from_db()
+        assert (project.title, project.budget_limit) == ("Test Project", 5.0)
+        response = auth_client.patch(url, {"project_id": project.id, "budget_limit": None}, format="json")
+        project.refresh_from_db()
+        assert project.budget_limit is None
+        assert auth_client.patch(url, {"project_id": project.id, "budget_limit": -1}, format="json").status_code == 400
+
+        url = reverse("user_profile")
+        response = auth_client.patch(url, {"budget_limit": 20.0, "email": "other@example.com"}, format="json")
+        assert response.status_code == 200
+        user.refresh_from_db()
+        assert (user.email, user.budget_limit) == ("test@example.com", 20.0)
+        assert auth_client.get(url).data["budget_limit"] == 20.0
+        # counters of scopes that just got a limit are re-seeded from the database
+        assert forgotten == [{"project_id": project.id}, {"user_id": user.id}]
+
+
+
+@pytest.mark.django_db
+class TestCachedReads:
+    def test_repeated_loads_cost_no_queries(self, auth_client, project, django_assert_num_queries):
+        SiliconePerson.objects.create(project=project, name="Alice")
+        requests = [
+            (reverse("project"), {}),
+            (reverse("silicon_person"), {"project_id": project.id}),
+            (reverse("ai_models"), {}),
+        ]
+        etags = []
+        for url, params in requests:
+            response = auth_client.get(url, params)
+            assert response.status_code == 200
+            etags.append(response["ETag"])
+
+        with django_assert_num_queries(0):
+            for (url, params), etag in zip(requests, etags):
+                assert auth_client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code == 304
+                response = auth_client.get(url, params)
+                assert response.status_code == 200
+                assert response["ETag"] == etag
+
+    def test_project_delete_bumps_once(self, project, question, monkeypatch):
+        from project import caching
+        SiliconePerson.objects.bulk_create([SiliconePerson(project=project, name=str(i)) for i in range(20)])
+        bumped = []
+        monkeypatch.setattr(caching, "bump_project_version", lambda *args: bumped.append(args))
+        project_id = project.id
+        project.delete()
+        # not once per persona and question deleted along with it
+        assert bumped == [(project_id, project.user_id)]
+
+        # deleting personas on their own still bumps
+        other = Project.objects.create(user=question.project.user, title="Other")
+        SiliconePerson.objects.create(project=other, name="Alice")
+        bumped.clear()
+        SiliconePerson.objects.filter(project=other).delete()
+        assert bumped == [(other.id,)]
+
+    def test_writes_change_the_etag(self, auth_client, project, question):
+        from project.models import AnalysisResult
+        from project.tasks import set_project_status
+
+        SiliconePerson.objects.create(project=project, name="Alice")
+        persons_url = reverse("silicon_person")
+        etag = auth_client.get(persons_url, {"project_id": project.id})["ETag"]
+        SiliconePerson.objects.bulk_create([SiliconePerson(project=project, name="Bob")])
+        response = auth_client.get(persons_url, {"project_id": project.id}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert len(response.data["data"]) == 2
+
+        projects_etag = auth_client.get(reverse("project"))["ETag"]
+        set_project_status(project.id, "running")
+        response = auth_client.get(reverse("project"), HTTP_IF_NONE_MATCH=projects_etag)
+        assert response.status_code == 200
+        assert response.data["data"][0]["status"] == "running"
+
+        analysis_url = reverse("analyse_results")
+        assert auth_client.get(analysis_url, {"question_id": question.id}).status_code == 404
+        AnalysisResult.objects.create(question=question, result_data={"accuracy": 0.5})
+        response = auth_client.get(analysis_url, {"question_id": question.id})
+        assert response.status_code == 200
+        assert response.data["data"] == {"accuracy": 0.5}
 
 
 @pytest.mark.django_db
@@ -146,3 +234,343 @@ class TestModelResponseView:
         response = auth_client.get(url, {"project_id": project.id, "question_id": question.id})
         assert response.status_code == 200
         assert response.data["message"] == "mission did not complete!"
+
+    def test_cursor_pagination_and_fields(self, auth_client, project, question):
+        for i in range(3):
+            person = SiliconePerson.objects.create(project=project, id_str=f"p{i}")
+            ResponseModel.objects.create(
+                question=question, silicone_person=person, raw_response="trump", gpt_model="gpt-5",
+                structured_data={"candidate_probs": {"trump": 0.6, "clinton": 0.4}},
+            )
+        question.gpt_answer = True
+        question.save()
+
+        url = reverse("model_response")
+        params = {"project_id": project.id, "question_id": question.id, "limit": 2,
+                  "fields": "silicon_person_id,candidate_probs"}
+        response = auth_client.get(url, params)
+        assert response.status_code == 200
+        assert len(response.data["data"]) == 2
+        assert response.data["data"][0]["candidate_probs"] == {"trump": 0.6, "clinton": 0.4}
+        assert set(response.data["data"][0]) == {"silicon_person_id", "candidate_probs"}
+
+        response = auth_client.get(url, {**params, "cursor": response.data["next_cursor"]})
+        assert len(response.data["data"]) == 1
+        assert response.data["next_cursor"] is None
+
+@pytest.mark.django_db
+class TestResponseExportView:
+    def make_responses(self, project, question):
+        for i, party in enumerate(["Democrat", "Republican", None]):
+            person = SiliconePerson.objects.create(project=project, id_str=f"p{i}", party=party, age=30 + i)
+            ResponseModel.objects.create(
+                question=question,
+                silicone_person=person,
+                raw_response="trump",
+                gpt_model="gpt-4o-mini",
+                structured_data={"candidate_probs": {"trump": 0.7, "clinton": 0.3}, "predicted_choice": "trump",
+                                 "options": ["trump", "clinton"]},
+            )
+
+    def test_export_csv_and_jsonl(self, auth_client, project, question):
+        import csv
+        import json
+        self.make_responses(project, question)
+        url = reverse("model_response_export")
+        response = auth_client.get(url, {"project_id": project.id, "question_id": question.id})
+        assert response.status_code == 200
+        rows = list(csv.DictReader(b"".join(response.streaming_content).decode().splitlines()))
+        assert len(rows) == 3
+        assert rows[0]["party"] == "Democrat" and rows[0]["prob_trump"] == "0.7"
+
+        response = auth_client.get(url, {"project_id": project.id, "question_id": question.id, "export_format": "jsonl"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        assert json.loads(lines[2])["id_str"] == "p2"
+
+    def test_export_parquet(self, auth_client, project, question, monkeypatch):
+        import io
+        import pyarrow.parquet as pq
+        monkeypatch.setattr("project.exporters.PARQUET_ROW_GROUP_SIZE", 2)
+        self.make_responses(project, question)
+        url = reverse("model_response_export")
+        response = auth_client.get(url, {"project_id": project.id, "question_id": question.id, "export_format": "parquet"})
+        assert response.status_code == 200
+        parquet_file = pq.ParquetFile(io.BytesIO(b"".join(response.streaming_content)))
+        assert parquet_file.num_row_groups == 2
+        table = parquet_file.read()
+        assert table.num_rows == 3
+        assert table.column("prob_clinton").to_pylist() == [0.3, 0.3, 0.3]
+
+
+@pytest.mark.django_db
+class TestQuestionRunControlView:
+    def test_pause_and_resume(self, auth_client, question, monkeypatch):
+        queued = []
+        monkeypatch.setattr("project.views.ask_gpt.delay", lambda qid: queued.append(qid))
+        url = reverse("question_run_control")
+
+        response = auth_client.post(url, {"question_id": question.id, "action": "pause"}, format="json")
+        assert response.status_code == 200
+        question.refresh_from_db()
+        assert question.run_status == "paused"
+
+        response = auth_client.post(url, {"question_id": question.id, "action": "resume"}, format="json")
+        assert response.status_code == 200
+        question.refresh_from_db()
+        assert question.run_status == "pending"
+        assert queued == [question.id]
+
+    def test_resume_not_paused_conflict(self, auth_client, question):
+        url = reverse("question_run_control")
+        response = auth_client.post(url, {"question_id": question.id, "action": "resume"}, format="json")
+        assert response.status_code == 409
+
+    def test_cancelling_the_last_open_question_completes_the_project(self, auth_client, project, question):
+        Question.objects.create(project=project, body="Answered", gpt_answer=True, run_status="completed")
+        Project.objects.filter(id=project.id).update(status="running")
+        url = reverse("question_run_control")
+        response = auth_client.post(url, {"question_id": question.id, "action": "cancel"}, format="json")
+        assert response.status_code == 200
+        project.refresh_from_db()
+        assert project.status == "completed"
+
+
+@pytest.mark.django_db
+class TestQuestionSummaryView:
+    def test_lists_questions_with_summaries(self, auth_client, project, question, django_assert_max_num_queries):
+        pending = Question.objects.create(project=project, body="Not run yet")
+        QuestionRunSummary.objects.create(
+            question=question, project=project, response_count=3, tokens_used=300, cost=0.01, accuracy=0.5,
+        )
+        url = reverse("question_summaries")
+        with django_assert_max_num_queries(4):
+            response = auth_client.get(url, {"project_id": project.id})
+        assert response.status_code == 200
+        data = {item["id"]: item for item in response.data["data"]}
+        assert data[question.id]["run_summary"]["response_count"] == 3
+        assert data[question.id]["run_summary"]["accuracy"] == 0.5
+        assert data[pending.id]["run_summary"] is None
+
+
+
+@pytest.mark.django_db
+class TestTokenCostEstimationView:
+    def test_xlsx_questions_are_streamed(self, auth_client, monkeypatch):
+        import io
+        from openpyxl import Workbook
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        class FakeEncoding:
+            def encode_batch(self, texts):
+                return [t.split() for t in texts]
+
+        monkeypatch.setattr("project.utils.get_encoding_for_model", lambda model_name: FakeEncoding())
+        workbook = Workbook()
+        sheet = workbook.active
+        for row in [["Who will win?", "ignored"], [None, "x"], ["Who lost?"], [2024]]:
+            sheet.append(row)
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        upload = SimpleUploadedFile("questions.xlsx", buffer.getvalue())
+
+        url = reverse("token_cost_estimation")
+        payload = {"model_name": "gpt-4o-mini", "num_silicon_people": 10, "questions_file": upload}
+        response = auth_client.post(url, payload, format="multipart")
+        assert response.status_code == 200
+        details = response.data["data"]["simulation_details"]
+        assert details["num_questions"] == 3
+        assert details["total_requests"] == 30
+
+    def test_project_estimate_does_not_build_the_profile(self, auth_client, project, monkeypatch):
+        from project import token_profiles
+
+        class FakeEncoding:
+            name = "fake"
+
+            def encode(self, text):
+                return text.split()
+
+            def encode_batch(self, texts):
+                return [t.split() for t in texts]
+
+        monkeypatch.setattr("project.utils.get_encoding_for_model", lambda model_name: FakeEncoding())
+        monkeypatch.setattr(token_profiles, "get_encoding_for_model", lambda model_name: FakeEncoding())
+        queued = []
+        monkeypatch.setattr("project.views.build_token_profile_task.delay", lambda *args: queued.append(args))
+        for age in (25, 70):
+            SiliconePerson.objects.create(project=project, age=age)
+
+        url = reverse("token_cost_estimation")
+        payload = {"model_name": "gpt-4o-mini", "num_silicon_people": 2, "questions_list": ["Who will win?"],
+                   "project_id": project.id}
+        response = auth_client.post(url, payload, format="json")
+        assert response.status_code == 200
+        assert response.data["data"]["exact"] is False
+        assert queued == [(project.id, "gpt-4o-mini")]
+        assert not token_profiles.PersonaTokenProfile.objects.filter(project=project).exists()
+
+        token_profiles.build_token_profile(project.id, "gpt-4o-mini")
+        response = auth_client.post(url, payload, format="json")
+        assert response.data["data"]["exact"] is True
+        assert len(queued) == 1
+
+
+@pytest.mark.django_db
+class TestUserStatistics:
+    def test_age_bands_and_invalidation(self, auth_client, project):
+        from django.core.cache import cache
+        cache.clear()
+        for age, gender in [(19, "male"), (30, "female"), (70, ""), (None, "female")]:
+            SiliconePerson.objects.create(project=project, age=age, gender=gender)
+        url = reverse("silicon_users_statistics")
+        response = auth_client.get(url, {"project_id": project.id})
+        assert response.status_code == 200
+        data = response.data["data"]
+        assert data["age"] == {"18-24": 1, "25-34": 1, "65+": 1, "unknown": 1}
+        assert data["gender"] == {"male": 1, "female": 2, "unknown": 1}
+
+        SiliconePerson.objects.create(project=project, age=40, gender="male")
+        data = auth_client.get(url, {"project_id": project.id}).data["data"]
+        assert data["age"]["35-44"] == 1
+
+
+@pytest.mark.django_db
+class TestSiliconPersonByCSV:
+    def test_upload_reports_bad_rows(self, auth_client, project):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        content = (
+            "id,name,age,party,more_info\n"
+            "a1,Ann,34,Democrat,\"{\"\"income\"\": \"\"high\"\"}\"\n"
+            "a2,Ben,old,Republican,\n"
+            "a3,Cy,51.0,,\n"
+        ).encode("utf-8")
+        upload = SimpleUploadedFile("persons.csv", content, content_type="text/csv")
+        url = reverse("upload_silicon_persons")
+        response = auth_client.post(url, {"project_id": project.id, "silicon_persons": upload}, format="multipart")
+        assert response.status_code == 201
+        assert response.data["created_count"] == 2
+        assert response.data["error_count"] == 1
+        assert response.data["errors"][0]["row"] == 2
+        ann = SiliconePerson.objects.get(id_str="a1")
+        assert ann.age == 34 and ann.more_info == {"income": "high"}
+        assert SiliconePerson.objects.get(id_str="a3").age == 51
+
+    def test_upload_parquet_packs_extra_columns(self, auth_client, project):
+        import io
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        table = pa.table({"id": [1, 2], "age": [34, None], "party": ["Democrat", "Republican"], "income": [50.5, 70.0]})
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        upload = SimpleUploadedFile("persons.parquet", buffer.getvalue(), content_type="application/octet-stream")
+        url = reverse("upload_silicon_persons_parquet")
+        response = auth_client.post(url, {"project_id": project.id, "silicon_persons": upload}, format="multipart")
+        assert response.status_code == 201
+        assert response.data["created_count"] == 2
+        person = SiliconePerson.objects.get(id_str="1")
+        assert person.age == 34 and person.party == "Democrat"
+        assert person.more_info == {"income": 50.5}
+
+
+@pytest.mark.django_db
+class TestImportJobView:
+    def test_question_import_job(self, auth_client, project, settings, tmp_path, monkeypatch):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from project.tasks import run_import_job
+        settings.MEDIA_ROOT = str(tmp_path)
+        queued = []
+        monkeypatch.setattr("project.views.run_import_job.delay", lambda job_id: queued.append(job_id))
+
+        Question.objects.create(project=project, body="Q0")
+        content = b"body,real_answer\nQ1,obama\n,romney\nQ3,\nQ1,again\n Q0 ,\n"
+        upload = SimpleUploadedFile("questions.csv", content, content_type="text/csv")
+        url = reverse("import_jobs")
+        response = auth_client.post(url, {"project_id": project.id, "kind": "questions", "file": upload}, format="multipart")
+        assert response.status_code == 202
+        job_id = response.data["data"]["id"]
+        assert queued == [job_id]
+
+        run_import_job(job_id)
+        response = auth_client.get(url, {"job_id": job_id})
+        data = response.data["data"]
+        assert data["status"] == "completed"
+        assert data["rows_processed"] == 5
+        assert data["created_count"] == 2
+        assert data["duplicate_count"] == 2
+        assert data["error_count"] == 1
+        assert data["errors"][0]["row"] == 2
+        assert Question.objects.filter(project=project).count() == 3
+
+    def test_import_job_lease(self, auth_client, project, settings, tmp_path, monkeypatch):
+        from datetime import timedelta
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.utils import timezone
+        from project import tasks
+        from project.models import ImportJob
+        settings.MEDIA_ROOT = str(tmp_path)
+        monkeypatch.setattr("project.views.run_import_job.delay", lambda job_id: None)
+        upload = SimpleUploadedFile("questions.csv", b"body,real_answer\nQ1,obama\n", content_type="text/csv")
+        response = auth_client.post(
+            reverse("import_jobs"), {"project_id": project.id, "kind": "questions", "file": upload}, format="multipart"
+        )
+        job_id = response.data["data"]["id"]
+        expired = timezone.now() - tasks.IMPORT_JOB_STALL_TIMEOUT - timedelta(seconds=1)
+
+        # a held lease keeps the job from a second worker
+        old_token = tasks.claim_import_job(job_id)
+        assert old_token is not None
+        assert tasks.claim_import_job(job_id) is None
+        assert tasks.run_import_job(job_id) == {"status": "running"}
+
+        # once it expires the job is taken over, and the old worker's batch is rolled back
+        ImportJob.objects.filter(id=job_id).update(updated_at=expired)
+        assert tasks.claim_import_job(job_id) not in (None, old_token)
+        monkeypatch.setattr(tasks, "claim_import_job", lambda job_id: old_token)
+        assert tasks.run_import_job(job_id) == {"status": "running"}
+        assert not Question.objects.filter(project=project).exists()
+        assert ImportJob.objects.get(id=job_id).rows_processed == 0
+
+        # stale pending jobs are re-queued as well as stale running ones
+        queued = []
+        monkeypatch.setattr(tasks.run_import_job, "delay", lambda job_id: queued.append(job_id))
+        ImportJob.objects.filter(id=job_id).update(status="pending", updated_at=expired)
+        tasks.resume_stalled_import_jobs()
+        assert queued == [job_id]
+
+
+@pytest.mark.django_db
+class TestQuestionImportByCSV:
+    def test_import_skips_duplicates(self, auth_client, project, question):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        content = b"body,real_answer\nWhat is AI?,x\nWhat is ML?,y\nWhat is ML?,z\n"
+        upload = SimpleUploadedFile("questions.csv", content, content_type="text/csv")
+        url = reverse("upload_questions")
+        response = auth_client.post(url, {"project_id": project.id, "questions": upload}, format="multipart")
+        assert response.status_code == 201
+        assert response.data["created_count"] == 1
+        assert response.data["duplicate_count"] == 2
+        assert Question.objects.filter(project=project).count() == 2
+
+    def test_invalid_row_imports_nothing(self, auth_client, project):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        content = b"body,real_answer\nQ1,x\n,y\n"
+        upload = SimpleUploadedFile("questions.csv", content, content_type="text/csv")
+        url = reverse("upload_questions")
+        response = auth_client.post(url, {"project_id": project.id, "questions": upload}, format="multipart")
+        assert response.status_code == 400
+        assert response.data["row"] == 2
+        assert not Question.objects.filter(project=project).exists()
+
+
+@pytest.mark.django_db
+class TestDatabaseMetricsView:
+    def test_staff_only(self, auth_client, user):
+        url = reverse("db_metrics")
+        assert auth_client.get(url).status_code == 403
+
+        user.is_staff = True
+        user.save()
+        response = auth_client.get(url)
+        assert response.status_code == 200
+        assert set(response.data["data"]) == {"pool", "connections", "max_connections"}
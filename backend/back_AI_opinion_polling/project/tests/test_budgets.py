@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+from project import budgets
+from project.models import Project
+from user.models import User
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """The budget scripts run on fakeredis with Lua; skipped without it."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(budgets, "_client", client)
+    monkeypatch.setattr(budgets, "_reserve", client.register_script(budgets._RESERVE_SCRIPT))
+    monkeypatch.setattr(budgets, "_settle", client.register_script(budgets._SETTLE_SCRIPT))
+    return client
+
+
+@pytest.fixture
+def project(db):
+    user = User.objects.create_user(username="budget", email="budget@example.com", password="strongpassword123")
+    # spent before the counters existed
+    Project.objects.create(user=user, title="Earlier", actual_cost=1.0)
+    return Project.objects.create(user=user, title="Budget", actual_cost=2.0, budget_limit=5.0)
+
+
+def spent(client, key):
+    return float(client.get(key))
+
+
+def test_concurrent_reserves_stop_at_the_limit(redis_client, project):
+    project_key = budgets.project_spend_key(project.id)
+    # seeded from the committed spend
+    first = budgets.reserve(project.id, 1.0)
+    assert spent(redis_client, project_key) == 3.0
+    assert 0 < redis_client.ttl(project_key) <= budgets.COUNTER_TTL
+
+    # eight workers race for the last two dollars through the reserve script
+    results = []
+    barrier = threading.Barrier(8)
+
+    def reserve():
+        barrier.wait()
+        results.append(budgets._reserve(keys=[project_key], args=[1.0, 5.0, budgets.COUNTER_TTL]))
+
+    threads = [threading.Thread(target=reserve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 0 = reserved, 1 = refused by the first (only) limit
+    assert sorted(results) == [0, 0, 1, 1, 1, 1, 1, 1]
+    assert spent(redis_client, project_key) == 5.0
+
+    with pytest.raises(budgets.BudgetExceeded) as exceeded:
+        budgets.reserve(project.id, 0.5)
+    assert exceeded.value.scope == "project"
+    assert spent(redis_client, project_key) == 5.0
+
+    budgets.settle(first, 0.25)
+    assert spent(redis_client, project_key) == 4.25
+    budgets.release(budgets.Reservation(amount=1.0, keys=[project_key]))
+    assert spent(redis_client, project_key) == 3.25
+
+
+def test_user_limit_covers_every_project(redis_client, project):
+    User.objects.filter(id=project.user_id).update(budget_limit=3.5)
+    user_key = budgets.user_spend_key(project.user_id)
+
+    reservation = budgets.reserve(project.id, 0.5)
+    assert reservation.keys == [budgets.project_spend_key(project.id), user_key]
+    assert spent(redis_client, user_key) == 3.5
+    with pytest.raises(budgets.BudgetExceeded) as exceeded:
+        budgets.reserve(project.id, 0.1)
+    # nothing was reserved on either counter
+    assert exceeded.value.scope == "user"
+    assert spent(redis_client, budgets.project_spend_key(project.id)) == 2.5
+
+
+def test_expired_counters_are_seeded_again(redis_client, project):
+    project_key = budgets.project_spend_key(project.id)
+    reservation = budgets.reserve(project.id, 1.0)
+
+    # the counter expires before the chunk settles: settling must not
+    # recreate it holding only the difference
+    redis_client.delete(project_key)
+    budgets.settle(reservation, 0.5)
+    assert not redis_client.exists(project_key)
+
+    Project.objects.filter(id=project.id).update(actual_cost=2.5)
+    budgets.reserve(project.id, 1.0)
+    assert spent(redis_client, project_key) == 3.5
+
+    budgets.forget_spend(project_id=project.id)
+    assert not redis_client.exists(project_key)
@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+
+# Loaded only by the code paths that use them (analysis task, model calls,
+# .xls uploads), never by a web worker booting
+HEAVY_MODULES = ["pandas", "scipy", "sklearn", "openai"]
+
+BOOT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+import simulate_human_samples.urls
+elapsed = time.perf_counter() - start
+print(json.dumps({"loaded": [m for m in %r if m in sys.modules], "seconds": elapsed}))
+""" % (HEAVY_MODULES,)
+
+
+def test_web_boot_does_not_load_heavy_modules():
+    # a fresh interpreter, since this one has imported everything already
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run(
+        [sys.executable, "-c", BOOT_SCRIPT], env=env, capture_output=True, text=True, check=True
+    )
+    boot = json.loads(result.stdout.strip().splitlines()[-1])
+    assert boot["loaded"] == [], f"boot took {boot['seconds']:.2f}s and loaded {boot['loaded']}"
@@ -0,0 +1,48 @@
+import pytest
+from django.db import connection
+from project.models import Project, SiliconePerson, Question, Response as ResponseModel
+from user.models import User
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "postgresql", reason="query plans are checked on PostgreSQL only"),
+]
+
+
+@pytest.fixture
+def question():
+    user = User.objects.create_user(username="plans", email="plans@example.com", password="strongpassword123")
+    project = Project.objects.create(user=user, title="Plans")
+    question = Question.objects.create(project=project, body="Who?")
+    person = SiliconePerson.objects.create(project=project)
+    ResponseModel.objects.create(question=question, silicone_person=person, raw_response="x", gpt_model="gpt-5")
+    return question
+
+
+def plan(queryset):
+    # the test tables are tiny, so make the planner show what it would do at scale
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+def test_response_page_uses_question_id_index(question):
+    queryset = ResponseModel.objects.filter(question=question, id__gt=0).order_by("id")[:100]
+    assert "response_question_id_idx" in plan(queryset)
+
+
+def test_answered_lookup_uses_unique_constraint(question):
+    queryset = ResponseModel.objects.filter(question=question, gpt_model__in=["gpt-5"]).values_list(
+        "silicone_person_id", "gpt_model"
+    )
+    assert "unique_response_per_person_model" in plan(queryset)
+
+
+def test_pending_questions_use_partial_index(question):
+    queryset = Question.objects.filter(project=question.project, gpt_answer=False, run_status="pending")
+    assert "question_unanswered_idx" in plan(queryset)
+
+
+def test_unanalysed_questions_use_partial_index(question):
+    queryset = Question.objects.filter(is_analysed=False, gpt_answer=True)
+    assert "question_unanalysed_idx" in plan(queryset)
@@ -0,0 +1,61 @@
+import io
+from datetime import datetime, timezone
+
+import pytest
+from django.core.management import call_command
+from project.models import Project, SiliconePerson, ModelLog, PromptBlob
+from project.partitions import archive_path, archived_months, parse_month
+from user.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def old_logs():
+    user = User.objects.create_user(username="archive", email="archive@example.com", password="strongpassword123")
+    project = Project.objects.create(user=user, title="Archive")
+    person = SiliconePerson.objects.create(project=project)
+    logs = []
+    for i, created_at in enumerate([datetime(2024, 1, 5, tzinfo=timezone.utc), datetime(2024, 1, 20, tzinfo=timezone.utc)]):
+        log = ModelLog.objects.create(
+            project=project, silicone_person=person, prompt_text=f"prompt {i}",
+            response_text="trump", model_name="gpt-4o-mini", tokens_used=10,
+        )
+        ModelLog.objects.filter(id=log.id).update(created_at=created_at)
+        logs.append(log)
+    # a recent log stays in place
+    ModelLog.objects.create(project=project, prompt_text="recent", response_text="x", model_name="gpt-4o-mini")
+    return logs
+
+
+def test_archive_and_restore_month(old_logs, tmp_path):
+    out = io.StringIO()
+    call_command("archive_model_logs", "--older-than-months", "1", "--dir", str(tmp_path), stdout=out)
+    month = parse_month("2024-01")
+    assert archived_months(str(tmp_path)) == [month]
+    assert ModelLog.objects.count() == 1
+
+    # blobs only the archive refers to may be removed; the file carries the text
+    call_command("compress_prompt_blobs", "--delete-orphans", stdout=io.StringIO())
+    assert not PromptBlob.objects.filter(text="prompt 0").exists()
+
+    call_command("restore_model_logs", "2024-01", "--dir", str(tmp_path), stdout=out)
+    restored = ModelLog.objects.get(id=old_logs[0].id)
+    assert restored.prompt_text == "prompt 0"
+    assert restored.created_at == datetime(2024, 1, 5, tzinfo=timezone.utc)
+    assert restored.silicone_person_id == old_logs[0].silicone_person_id
+    assert ModelLog.objects.count() == 3
+    assert archive_path(month, str(tmp_path)).endswith("model_logs_2024-01.parquet")
+
+
+def test_archive_never_overwrites_a_file(old_logs, tmp_path):
+    path = archive_path(parse_month("2024-01"), str(tmp_path))
+    with open(path, "wb") as f:
+        f.write(b"earlier archive")
+    err = io.StringIO()
+    call_command("archive_model_logs", "--older-than-months", "1", "--dir", str(tmp_path),
+                 stdout=io.StringIO(), stderr=err)
+    assert "already exists" in err.getvalue()
+    with open(path, "rb") as f:
+        assert f.read() == b"earlier archive"
+    assert ModelLog.objects.count() == 3
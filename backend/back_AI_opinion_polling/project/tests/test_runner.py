@@ -0,0 +1,464 @@
+import io
+import math
+from types import SimpleNamespace
+
+import pytest
+from django.core.management import call_command
+from project.logprobs import decode_structured_data
+from project.pricing import TokenUsage, token_cost
+from project.models import (
+    PersonaTokenProfile, Project, SiliconePerson, Question, Prompt, PromptBlob, ModelLog, QuestionRunSummary,
+    Response as ResponseModel,
+)
+from project.replication import runner
+from project.replication.common import get_default_token_sets
+from user.models import User
+
+
+class FakeEncoding:
+    name = "fake"
+
+    def encode(self, text):
+        return text.split()
+
+    def encode_batch(self, texts):
+        return [t.split() for t in texts]
+
+
+def fake_completion(texts):
+    choices = []
+    for text in texts:
+        top = [
+            SimpleNamespace(token=" " + text, logprob=-0.1),
+            SimpleNamespace(token=" other", logprob=-3.0),
+        ]
+        choices.append(SimpleNamespace(
+            message=SimpleNamespace(content=text),
+            logprobs=SimpleNamespace(content=[SimpleNamespace(top_logprobs=top)]),
+        ))
+    usage = SimpleNamespace(total_tokens=100, prompt_tokens=90, completion_tokens=10)
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+@pytest.fixture
+def project(db):
+    user = User.objects.create_user(username="runner", email="runner@example.com", password="strongpassword123")
+    project = Project.objects.create(user=user, title="Runner Project")
+    for age in (30, 40, 50):
+        SiliconePerson.objects.create(project=project, age=age, real_vote="Donald Trump")
+    return project
+
+
+@pytest.fixture(autouse=True)
+def offline_tokenizer(monkeypatch):
+    monkeypatch.setattr(runner, "get_encoding_for_model", lambda model_name: FakeEncoding())
+
+
+def test_sample_model_with_logprobs_uses_n(monkeypatch):
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return fake_completion(["trump", "clinton", "trump"])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    token_logprobs_list, texts, usage = runner.sample_model_with_logprobs(
+        client, "gpt-4o-mini", "prompt", num_samples=3, temperature=1.0
+    )
+    assert len(requests) == 1 and requests[0]["n"] == 3
+    assert texts == ["trump", "clinton", "trump"]
+    assert usage == TokenUsage(prompt_tokens=90, completion_tokens=10, cached_tokens=0)
+
+    token_logprobs, candidate_probs, samples = runner.aggregate_samples(
+        token_logprobs_list, texts, get_default_token_sets(2016)
+    )
+    assert len(samples) == 3
+    assert math.isclose(sum(candidate_probs.values()), 1.0)
+    assert candidate_probs["trump"] > candidate_probs["clinton"]
+
+
+def bad_request(message, param):
+    import httpx
+    from openai import BadRequestError
+
+    response = httpx.Response(400, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return BadRequestError(message, response=response, body={"message": message, "param": param, "code": None})
+
+
+def test_sampling_falls_back_only_when_n_is_rejected():
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        if "n" in kwargs:
+            raise bad_request("Unsupported parameter: 'n' is not supported with this model.", "n")
+        return fake_completion(["trump"])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    _, texts, _ = runner.sample_model_with_logprobs(client, "o1-mini", "prompt", num_samples=3)
+    assert texts == ["trump"] * 3
+    assert len(requests) == 4
+
+    def too_long(**kwargs):
+        requests.append(kwargs)
+        raise bad_request("This model's maximum context length is 128000 tokens.", "messages")
+
+    requests.clear()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=too_long)))
+    with pytest.raises(Exception, match="maximum context length"):
+        runner.sample_model_with_logprobs(client, "gpt-4o-mini", "prompt", num_samples=3)
+    assert len(requests) == 1
+
+
+def test_dispatcher_keeps_job_order_and_per_model_budgets(monkeypatch):
+    import threading
+    import time
+
+    lock = threading.Lock()
+    running = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0, "all": 0}
+
+    def fake_call(client, model_name, prompt, **kwargs):
+        with lock:
+            running[model_name] += 1
+            peak[model_name] = max(peak[model_name], running[model_name])
+            peak["all"] = max(peak["all"], sum(running.values()))
+        time.sleep(0.02)
+        with lock:
+            running[model_name] -= 1
+        return {}, f"{model_name}:{prompt}", TokenUsage()
+
+    monkeypatch.setattr(runner, "call_model_with_logprobs", fake_call)
+    monkeypatch.setattr(runner, "MODEL_MAX_CONCURRENCY", {"a": 1, "b": 2})
+    dispatcher = runner.ModelDispatcher(None, ["a", "b"])
+    try:
+        jobs = [(m, str(i)) for i in range(6) for m in ("a", "b")]
+        results = dispatcher.map(jobs, temperature=0.0)
+    finally:
+        dispatcher.close()
+
+    assert [text for _, text, _ in results] == [f"{m}:{p}" for m, p in jobs]
+    # each model stays within its own budget while the models run side by side
+    assert peak["a"] == 1 and peak["b"] <= 2
+    assert peak["all"] > 1
+
+
+def test_question_models_fall_back_to_gpt_model(monkeypatch):
+    monkeypatch.setattr(runner, "MODEL_NAME", "gpt-default")
+    question = Question(model_name=None, compare_models=["gpt-4.1-nano", "gpt-default"])
+    assert runner.get_question_models(question) == ["gpt-default", "gpt-4.1-nano"]
+    question = Question(model_name="gpt-4o-mini")
+    assert runner.get_question_models(question) == ["gpt-4o-mini"]
+
+
+def test_run_compares_models_and_resumes(monkeypatch, project):
+    calls = []
+
+    def fake_call(client, model_name, prompt, **kwargs):
+        calls.append(model_name)
+        return {" trump": -0.1, " clinton": -2.0}, "trump", TokenUsage(40, 10, 20)
+
+    monkeypatch.setattr(runner, "create_client", lambda: None)
+    monkeypatch.setattr(runner, "call_model_with_logprobs", fake_call)
+    question = Question.objects.create(
+        project=project, body="Who?", model_name="gpt-4o-mini", compare_models=["gpt-4.1-nano"]
+    )
+    models = runner.get_question_models(question)
+
+    cost = runner.run_human_sampling_for_project(
+        project.id, question.id, get_default_token_sets(2016), model_names=models, chunk_size=2
+    )
+    assert cost > 0
+    assert len(calls) == 6
+    assert ResponseModel.objects.filter(gpt_model="gpt-4.1-nano").count() == 3
+    assert Prompt.objects.count() == 3
+
+    # the run summary was kept current chunk by chunk
+    summary = QuestionRunSummary.objects.get(question=question)
+    assert summary.response_count == 6 and summary.tokens_used == 300
+    assert summary.persons_total == 3 and summary.persons_queried == 3 and summary.started_at
+    assert summary.prompt_tokens == 240 and summary.cached_tokens == 120
+    assert math.isclose(summary.estimated_cost, cost)
+    # actual cost is priced per model from usage, with cached tokens at the cached rate
+    actual = 3 * token_cost("gpt-4o-mini", 40, 10, 20) + 3 * token_cost("gpt-4.1-nano", 40, 10, 20)
+    assert math.isclose(summary.cost, actual)
+    project.refresh_from_db()
+    assert math.isclose(project.actual_cost, actual) and project.completion_tokens == 60
+    log = ModelLog.objects.filter(model_name="gpt-4o-mini").first()
+    assert log.prompt_tokens == 40 and log.cached_tokens == 20 and log.tokens_used == 50
+    assert math.isclose(log.cost, token_cost("gpt-4o-mini", 40, 10, 20))
+
+    # prompt text is stored once and reads the same from Prompt and ModelLog, compressed or not
+    prompt = Prompt.objects.select_related("blob").first()
+    log = ModelLog.objects.get(silicone_person=prompt.silicone_person, model_name="gpt-4.1-nano")
+    assert PromptBlob.objects.count() == 3
+    assert log.prompt_text == prompt.body and "Who?" in prompt.body
+    call_command("compress_prompt_blobs", "--older-than-days", "0", stdout=io.StringIO())
+    assert Prompt.objects.get(id=prompt.id).body == prompt.body
+    assert not PromptBlob.objects.filter(text__isnull=False).exists()
+
+    # logprobs are stored packed and decode to the original dict
+    stored = ResponseModel.objects.first()
+    assert "token_logprobs" not in stored.structured_data
+    decoded = decode_structured_data(stored.structured_data, stored.logprobs_packed)
+    assert set(decoded["token_logprobs"]) == {" trump", " clinton"}
+    assert math.isclose(decoded["token_logprobs"][" clinton"], -2.0)
+
+    # a second run finds every (person, model) answered and calls nothing
+    cost = runner.run_human_sampling_for_project(
+        project.id, question.id, get_default_token_sets(2016), model_names=models
+    )
+    assert cost == 0
+    assert len(calls) == 6
+
+
+def test_run_skips_answers_another_worker_stored(monkeypatch, project):
+    def fake_call(client, model_name, prompt, **kwargs):
+        return {" trump": -0.1, " clinton": -2.0}, "trump", TokenUsage(40, 10, 0)
+
+    question = Question.objects.create(project=project, body="Who?", model_name="gpt-4o-mini")
+    first = SiliconePerson.objects.filter(project=project).order_by("id").first()
+    dispatcher_map = runner.ModelDispatcher.map
+
+    def racing_map(self, jobs, *args, **kwargs):
+        results = dispatcher_map(self, jobs, *args, **kwargs)
+        # a second worker resuming the question stores its answer while ours is in flight
+        ResponseModel.objects.get_or_create(
+            question=question, silicone_person=first, gpt_model="gpt-4o-mini",
+            defaults={"raw_response": "clinton", "structured_data": {}},
+        )
+        return results
+
+    monkeypatch.setattr(runner, "create_client", lambda: None)
+    monkeypatch.setattr(runner, "call_model_with_logprobs", fake_call)
+    monkeypatch.setattr(runner.ModelDispatcher, "map", racing_map)
+
+    runner.run_human_sampling_for_project(
+        project.id, question.id, get_default_token_sets(2016), model_names=["gpt-4o-mini"], chunk_size=2
+    )
+    # the other worker's answer stands, the rest of the chunk is kept
+    assert ResponseModel.objects.filter(question=question).count() == 3
+    assert ResponseModel.objects.get(silicone_person=first).raw_response == "clinton"
+    # every paid call is logged, but the summary counts stored responses
+    assert ModelLog.objects.count() == 3
+    assert QuestionRunSummary.objects.get(question=question).response_count == 2
+
+
+def test_adaptive_run_stops_at_target_precision(monkeypatch, project):
+    calls = []
+
+    def fake_call(client, model_name, prompt, **kwargs):
+        calls.append(prompt)
+        return {" trump": -0.1, " clinton": -2.0}, "trump", TokenUsage(40, 10, 20)
+
+    monkeypatch.setattr(runner, "create_client", lambda: None)
+    monkeypatch.setattr(runner, "call_model_with_logprobs", fake_call)
+    monkeypatch.setattr(runner, "ADAPTIVE_MIN_PERSONS", 4)
+    for age in range(20, 37):
+        SiliconePerson.objects.create(project=project, age=age, party="Democrat" if age % 2 else "Republican")
+    question = Question.objects.create(project=project, body="Who?", model_name="gpt-4o-mini", target_precision=0.05)
+
+    runner.run_human_sampling_for_project(
+        project.id, question.id, get_default_token_sets(2016),
+        model_names=["gpt-4o-mini"], chunk_size=4, target_precision=question.target_precision,
+    )
+    # identical answers have zero variance, so the first check after 4 persons stops the run
+    assert len(calls) == 4
+    cost = question.costs.get()
+    assert cost.persons_queried == 4
+    assert cost.persons_total == 20
+    assert cost.achieved_precision == 0.0
+
+
+def test_run_pauses_at_budget(monkeypatch, project):
+    from project import budgets
+    calls, reservations, settled = [], [], []
+
+    def fake_call(client, model_name, prompt, **kwargs):
+        calls.append(prompt)
+        return {" trump": -0.1, " clinton": -2.0}, "trump", TokenUsage(40, 10, 0)
+
+    def fake_reserve(project_id, amount):
+        # room for the first chunk only
+        if reservations:
+            raise budgets.BudgetExceeded("project", 0.01)
+        reservations.append(amount)
+        return budgets.Reservation(amount=amount, keys=["budget:project:test"])
+
+    monkeypatch.setattr(runner, "create_client", lambda: None)
+    monkeypatch.setattr(runner, "call_model_with_logprobs", fake_call)
+    monkeypatch.setattr(budgets, "reserve", fake_reserve)
+    monkeypatch.setattr(budgets, "settle", lambda reservation, actual: settled.append(actual))
+    question = Question.objects.create(project=project, body="Who?", model_name="gpt-4o-mini", run_status="running")
+
+    runner.run_human_sampling_for_project(
+        project.id, question.id, get_default_token_sets(2016), model_names=["gpt-4o-mini"], chunk_size=2
+    )
+    # nothing was sent for the chunk over budget, and the question waits to be resumed
+    assert len(calls) == 2
+    assert math.isclose(settled[0], 2 * token_cost("gpt-4o-mini", 40, 10))
+    question.refresh_from_db()
+    assert question.run_status == "paused"
+    assert question.costs.get().persons_queried == 2
+
+
+def test_cancelled_last_question_completes_the_project(monkeypatch, project):
+    from project import tasks
+    question = Question.objects.create(project=project, body="Who?")
+
+    def cancelled_run(project_obj, question_obj, year):
+        Question.objects.filter(id=question_obj.id).update(run_status="cancelled")
+        return 0.0
+
+    monkeypatch.setattr(tasks, "run", cancelled_run)
+    tasks.ask_gpt(question.id)
+    project.refresh_from_db()
+    assert project.status == "completed"
+
+
+def test_failing_question_does_not_stop_the_others(monkeypatch, project):
+    from project import tasks
+    failing = Question.objects.create(project=project, body="Fails")
+    other = Question.objects.create(project=project, body="Runs")
+    ran = []
+
+    def flaky_run(project_obj, question_obj, year):
+        ran.append(question_obj.id)
+        if question_obj.id == failing.id:
+            raise RuntimeError("API down")
+        return 0.0
+
+    monkeypatch.setattr(tasks, "run", flaky_run)
+    tasks.ask_gpt()
+    assert sorted(ran) == [failing.id, other.id]
+    failing.refresh_from_db()
+    other.refresh_from_db()
+    assert (failing.run_status, other.run_status) == ("failed", "completed")
+    # nothing is left to run, but one question is unanswered
+    project.refresh_from_db()
+    assert project.status == "failed"
+
+
+def test_resume_waits_for_the_running_job_to_stop(monkeypatch, project):
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    api = APIClient()
+    api.force_authenticate(user=project.user)
+    url = reverse("question_run_control")
+    queued, answers = [], []
+    monkeypatch.setattr("project.views.ask_gpt.delay", lambda qid: queued.append(qid))
+    question = Question.objects.create(project=project, body="Who?", model_name="gpt-4o-mini", run_status="running")
+
+    record_chunk = runner.run_summaries.record_chunk
+
+    def record_chunk_then_pause(*args, **kwargs):
+        record_chunk(*args, **kwargs)
+        if not answers:
+            # pause and try to resume while the first chunk is still in flight
+            response = api.post(url, {"question_id": question.id, "action": "pause"}, format="json")
+            answers.append(response.data["data"]["run_status"])
+            answers.append(api.post(url, {"question_id": question.id, "action": "resume"}, format="json").status_code)
+
+    monkeypatch.setattr(runner, "create_client", lambda: None)
+    monkeypatch.setattr(
+        runner, "call_model_with_logprobs",
+        lambda client, model_name, prompt, **kwargs: ({" trump": -0.1, " clinton": -2.0}, "trump", TokenUsage(40, 10, 0)),
+    )
+    monkeypatch.setattr(runner.run_summaries, "record_chunk", record_chunk_then_pause)
+    runner.run_human_sampling_for_project(
+        project.id, question.id, get_default_token_sets(2016), model_names=["gpt-4o-mini"], chunk_size=2
+    )
+    assert answers == ["pausing", 409]
+    assert queued == []
+    # the runner finished its chunk, stopped and confirmed the pause
+    assert ResponseModel.objects.filter(question=question).count() == 2
+    question.refresh_from_db()
+    assert question.run_status == "paused"
+
+    response = api.post(url, {"question_id": question.id, "action": "resume"}, format="json")
+    assert response.status_code == 200
+    assert queued == [question.id]
+
+
+def test_cost_preview_from_sample(project):
+    for age in range(20, 60):
+        SiliconePerson.objects.create(project=project, age=age, party="Democrat" if age % 2 else "Republican")
+    question = Question.objects.create(project=project, body="Who would you vote for?")
+    token_sets = get_default_token_sets(2016)
+
+    exact = runner.run_human_sampling_for_project(
+        project.id, question.id, token_sets, model_names=["gpt-4o-mini"], just_cost=True
+    )
+    preview = runner.estimate_cost_from_sample(project.id, question, token_sets, ["gpt-4o-mini"], sample_size=10)
+    assert preview["sample_size"] == 10 and preview["persons_total"] == 43
+    assert not preview["exact"]
+    assert abs(preview["cost"] - exact) / exact < 0.05
+
+    full = runner.estimate_cost_from_sample(project.id, question, token_sets, ["gpt-4o-mini"], sample_size=100)
+    assert full["exact"] and math.isclose(full["cost"], exact)
+
+
+def test_token_profile_tracks_persona_changes(monkeypatch, project):
+    from project import token_profiles
+    monkeypatch.setattr(token_profiles, "get_encoding_for_model", lambda model_name: FakeEncoding())
+    monkeypatch.setattr(token_profiles, "get_encoding", lambda name: FakeEncoding())
+    question = Question.objects.create(project=project, body="Who would you vote for?")
+    token_sets = get_default_token_sets(2016)
+    assert token_profiles.estimate_cost_from_profiles(project.id, question, token_sets, ["gpt-4o-mini"]) is None
+
+    profile = token_profiles.get_token_profile(project.id, "gpt-4o-mini")
+    assert profile.person_count == 3
+
+    # bulk creates and deletes keep the profile equal to a fresh rebuild
+    SiliconePerson.objects.bulk_create([
+        SiliconePerson(project=project, age=25, party="Democrat", more_info={"income": "high"}),
+        SiliconePerson(project=project, gender="female"),
+    ])
+    SiliconePerson.objects.filter(project=project, age=30).delete()
+    profile.refresh_from_db()
+    fresh = token_profiles.build_token_profile(project.id, "gpt-4o-mini")
+    assert (profile.total_tokens, profile.person_count, profile.histogram, profile.content_hash) == (
+        fresh.total_tokens, fresh.person_count, fresh.histogram, fresh.content_hash
+    )
+
+    estimate = token_profiles.estimate_cost_from_profiles(project.id, question, token_sets, ["gpt-4o-mini"])
+    exact = runner.run_human_sampling_for_project(
+        project.id, question.id, token_sets, model_names=["gpt-4o-mini"], just_cost=True
+    )
+    assert math.isclose(estimate["cost"], exact)
+
+
+def test_token_profile_updated_in_place_on_persona_edit(monkeypatch, project):
+    from project import token_profiles
+    monkeypatch.setattr(token_profiles, "get_encoding_for_model", lambda model_name: FakeEncoding())
+    monkeypatch.setattr(token_profiles, "get_encoding", lambda name: FakeEncoding())
+    profile = token_profiles.get_token_profile(project.id, "gpt-4o-mini")
+
+    person = SiliconePerson.objects.filter(project=project).first()
+    person.more_info = {"income": "a great deal higher than average"}
+    person.save()
+
+    # the same row, with the old backstory swapped for the new one
+    edited = PersonaTokenProfile.objects.get(id=profile.id)
+    assert edited.person_count == 3
+    assert edited.total_tokens > profile.total_tokens
+    counted = (edited.total_tokens, edited.histogram, edited.content_hash)
+    fresh = token_profiles.build_token_profile(project.id, "gpt-4o-mini")
+    assert counted == (fresh.total_tokens, fresh.histogram, fresh.content_hash)
+
+
+def test_token_profile_rebuilt_after_unsignalled_update(monkeypatch, project):
+    from project import token_profiles
+    monkeypatch.setattr(token_profiles, "get_encoding_for_model", lambda model_name: FakeEncoding())
+    monkeypatch.setattr(token_profiles, "get_encoding", lambda name: FakeEncoding())
+    profile = token_profiles.get_token_profile(project.id, "gpt-4o-mini")
+    assert token_profiles.verify_token_profiles(project.id) == 0
+
+    # no post_save, so only the content hash notices
+    SiliconePerson.objects.filter(project=project).update(more_info={"income": "a great deal higher than average"})
+    assert token_profiles.verify_token_profiles(project.id) == 1
+    profile = token_profiles.get_token_profile(project.id, "gpt-4o-mini")
+    fresh = token_profiles.build_token_profile(project.id, "gpt-4o-mini")
+    assert (profile.total_tokens, profile.content_hash) == (fresh.total_tokens, fresh.content_hash)
+    assert token_profiles.verify_token_profiles(project.id) == 0
@@ -0,0 +1,262 @@
+"""
+Per-project, per-encoding profiles of persona backstory token counts.
+
+A prompt is the persona's backstory followed by a question block that is
+the same for every persona, so the input tokens of a whole run are
+
+    sum(backstory tokens) + persons * (question block tokens + boundary)
+
+where "boundary" is the token merge (if any) where the two parts meet,
+measured once per estimate on a single persona. With the sum kept in a
+PersonaTokenProfile, a cost estimate only tokenizes the question.
+
+Profiles are built on first use and then kept current incrementally:
+bulk creates arrive through persons_bulk_created, single saves and deletes
+through post_save / post_delete. For an edited persona, pre_save reads the
+old backstory and post_save swaps it for the new one.
+
+QuerySet.update() and bulk_update() send no signals, so every profile also
+keeps an order-independent hash of the backstories it counts, and
+verify_token_profiles() (run nightly) rebuilds profiles whose hash no
+longer matches the personas.
+"""
+
+import hashlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import PersonaTokenProfile, Question, SiliconePerson
+from .replication.common import get_encoding, get_encoding_for_model
+from .replication.runner import (
+    MAX_OUTPUT_TOKENS,
+    build_backstory,
+    build_prompt,
+    prompt_cost_from_tokens,
+)
+from .signals import deleted_by_cascade, persons_bulk_created
+
+PROFILE_BATCH_SIZE = 2000
+
+
+def backstory_hash(backstory: str) -> int:
+    return int.from_bytes(hashlib.sha256(backstory.encode("utf-8")).digest(), "big")
+
+
+def _measure(backstories: List[str], encoding) -> Dict:
+    """Histogram, total, count and XOR hash of a batch of backstories."""
+    lengths = [len(ids) for ids in encoding.encode_batch(backstories)] if backstories else []
+    content_hash = 0
+    for backstory in backstories:
+        content_hash ^= backstory_hash(backstory)
+    return {
+        "histogram": Counter(lengths),
+        "total": sum(lengths),
+        "count": len(lengths),
+        "hash": content_hash,
+    }
+
+
+def build_token_profile(project_id: int, model_name: str) -> PersonaTokenProfile:
+    """
+    Tokenize every backstory of the project once and store the profile for
+    the model's encoding, replacing any existing one.
+    """
+    return _build_profile(project_id, get_encoding_for_model(model_name))
+
+
+def _build_profile(project_id: int, encoding) -> PersonaTokenProfile:
+    histogram: Counter = Counter()
+    total = count = content_hash = 0
+    persons = SiliconePerson.objects.filter(project_id=project_id).iterator(chunk_size=PROFILE_BATCH_SIZE)
+    batch: List[str] = []
+
+    def consume():
+        nonlocal total, count, content_hash
+        measured = _measure(batch, encoding)
+        histogram.update(measured["histogram"])
+        total += measured["total"]
+        count += measured["count"]
+        content_hash ^= measured["hash"]
+        batch.clear()
+
+    for person in persons:
+        batch.append(build_backstory(person))
+        if len(batch) >= PROFILE_BATCH_SIZE:
+            consume()
+    consume()
+
+    profile, _ = PersonaTokenProfile.objects.update_or_create(
+        project_id=project_id,
+        encoding=encoding.name,
+        defaults={
+            "histogram": {str(k): v for k, v in histogram.items()},
+            "total_tokens": total,
+            "person_count": count,
+            "content_hash": f"{content_hash:064x}",
+        },
+    )
+    return profile
+
+
+def get_token_profile(project_id: int, model_name: str, build: bool = True) -> Optional[PersonaTokenProfile]:
+    """
+    The project's profile for the model's encoding; built if missing and
+    `build` is True, otherwise None.
+    """
+    encoding = get_encoding_for_model(model_name)
+    profile = PersonaTokenProfile.objects.filter(project_id=project_id, encoding=encoding.name).first()
+    if profile is None and build:
+        profile = build_token_profile(project_id, model_name)
+    return profile
+
+
+def population_hash(project_id: int) -> str:
+    """The content_hash a profile of the project's current personas has."""
+    content_hash = 0
+    for person in SiliconePerson.objects.filter(project_id=project_id).iterator(chunk_size=PROFILE_BATCH_SIZE):
+        content_hash ^= backstory_hash(build_backstory(person))
+    return f"{content_hash:064x}"
+
+
+def verify_token_profiles(project_id: int) -> int:
+    """
+    Rebuild the project's profiles that no longer match its personas, e.g.
+    after a QuerySet.update(). Returns how many were rebuilt.
+    """
+    profiles = list(PersonaTokenProfile.objects.filter(project_id=project_id))
+    if not profiles:
+        return 0
+    expected = population_hash(project_id)
+    stale = [profile for profile in profiles if profile.content_hash != expected]
+    for profile in stale:
+        _build_profile(project_id, get_encoding(profile.encoding))
+    return len(stale)
+
+
+def _update_profiles(project_id: int, removed: List[str], added: List[str]) -> None:
+    """Remove and add backstories in every profile of the project, atomically."""
+    if not (removed or added):
+        return
+    if not PersonaTokenProfile.objects.filter(project_id=project_id).exists():
+        return
+    with transaction.atomic():
+        for profile in PersonaTokenProfile.objects.select_for_update().filter(project_id=project_id):
+            encoding = get_encoding(profile.encoding)
+            histogram = Counter({int(k): v for k, v in profile.histogram.items()})
+            content_hash = int(profile.content_hash or "0", 16)
+            for backstories, sign in ((removed, -1), (added, 1)):
+                if not backstories:
+                    continue
+                measured = _measure(backstories, encoding)
+                for length, n in measured["histogram"].items():
+                    histogram[length] += sign * n
+                profile.total_tokens += sign * measured["total"]
+                profile.person_count += sign * measured["count"]
+                content_hash ^= measured["hash"]
+            profile.histogram = {str(k): v for k, v in sorted(histogram.items()) if v > 0}
+            profile.content_hash = f"{content_hash:064x}"
+            profile.save(update_fields=["histogram", "total_tokens", "person_count", "content_hash", "updated_at"])
+
+
+def add_persons_to_profiles(project_id: int, persons: Iterable[SiliconePerson]) -> None:
+    _update_profiles(project_id, [], [build_backstory(person) for person in persons])
+
+
+def remove_persons_from_profiles(project_id: int, persons: Iterable[SiliconePerson]) -> None:
+    _update_profiles(project_id, [build_backstory(person) for person in persons], [])
+
+
+def question_block_tokens(project_id: int, model_name: str, question_text: str, options: List[str]) -> int:
+    """
+    Tokens each prompt adds on top of its backstory: the question block plus
+    the boundary merge, measured on one persona of the project.
+    """
+    encoding = get_encoding_for_model(model_name)
+    suffix = build_prompt("", question_text, options)
+    suffix_tokens = len(encoding.encode(suffix))
+    person = SiliconePerson.objects.filter(project_id=project_id).first()
+    if person is None:
+        return suffix_tokens
+    backstory = build_backstory(person)
+    return len(encoding.encode(backstory + suffix)) - len(encoding.encode(backstory))
+
+
+def estimate_cost_from_profiles(
+    project_id: int,
+    question: Question,
+    token_sets: Dict[str, List[str]],
+    model_names: Sequence[str],
+    num_samples: int = 1,
+    build: bool = False,
+) -> Optional[Dict]:
+    """
+    Cost of running the question on every persona, from the token profiles.
+    Only the question block (and one persona, for the boundary) is tokenized.
+
+    Returns None when a model's profile is missing and `build` is False;
+    otherwise the same shape as runner.estimate_cost_from_sample.
+    """
+    options = list(token_sets.keys())
+    cost = 0.0
+    persons_total = 0
+    for model in dict.fromkeys(model_names):
+        profile = get_token_profile(project_id, model, build=build)
+        if profile is None:
+            return None
+        per_person = question_block_tokens(project_id, model, question.body, options)
+        n_in = profile.total_tokens + profile.person_count * per_person
+        cost += prompt_cost_from_tokens(model, n_in, profile.person_count * MAX_OUTPUT_TOKENS * num_samples)
+        persons_total = profile.person_count
+
+    return {
+        "cost": float(cost),
+        "margin": 0.0,
+        "sample_size": persons_total,
+        "persons_total": persons_total,
+        "exact": True,
+    }
+
+
+@receiver(persons_bulk_created, sender=SiliconePerson)
+def _persons_bulk_created(sender, project_ids, persons, **kwargs):
+    for project_id in project_ids:
+        add_persons_to_profiles(project_id, [p for p in persons if p.project_id == project_id])
+
+
+@receiver(pre_save, sender=SiliconePerson)
+def _person_saving(sender, instance, raw=False, **kwargs):
+    instance._profiled_before = None
+    if raw or instance.pk is None:
+        return
+    old = SiliconePerson.objects.filter(pk=instance.pk).first()
+    if old is not None and PersonaTokenProfile.objects.filter(project_id=old.project_id).exists():
+        instance._profiled_before = (old.project_id, build_backstory(old))
+
+
+@receiver(post_save, sender=SiliconePerson)
+def _person_saved(sender, instance, created, **kwargs):
+    before = getattr(instance, "_profiled_before", None)
+    instance._profiled_before = None
+    if before is None:
+        if created:
+            add_persons_to_profiles(instance.project_id, [instance])
+        return
+    project_id, old_backstory = before
+    backstory = build_backstory(instance)
+    if project_id != instance.project_id:
+        _update_profiles(project_id, [old_backstory], [])
+        _update_profiles(instance.project_id, [], [backstory])
+    elif backstory != old_backstory:
+        _update_profiles(project_id, [old_backstory], [backstory])
+
+
+@receiver(post_delete, sender=SiliconePerson)
+def _person_deleted(sender, instance, origin=None, **kwargs):
+    # the profile goes away with the project
+    if deleted_by_cascade(sender, origin):
+        return
+    remove_persons_from_profiles(instance.project_id, [instance])
@@ -1,21 +1,23 @@
 from .models import *
-import openai
 from dotenv import load_dotenv
 import os
 from loguru import logger
-import pandas as pd
 
 import json
 import csv
 import io
 from django.shortcuts import get_object_or_404
-from .replication.common import count_tokens, estimate_prompt_cost_usd
+from .replication.common import count_tokens, estimate_prompt_cost_usd, get_encoding_for_model
 from .replication.runner import build_backstory, build_prompt
 from .models import SiliconePerson
+from .token_profiles import get_token_profile
+from .pricing import MODEL_PRICING, token_cost
 
 load_dotenv()
 
 def ask_from_gpt():
+    import openai
+
     api_key = os.getenv("OPENAI_API_KEY")
     openai.api_key = api_key
     client = openai.OpenAI(api_key=api_key)
@@ -97,7 +99,7 @@ def ask_from_gpt():
         )
         logger.info(f"process of person {person.id}\nprompt: {prompt}")
     total_tokens = total_prompt_tokens + total_completion_tokens
-    total_cost_usd = (total_prompt_tokens / 1000) * 0.0015 + (total_completion_tokens / 1000) * 0.002
+    total_cost_usd = token_cost(os.getenv("GPT_MODEL"), total_prompt_tokens, total_completion_tokens)
     logger.info(f"Total prompt tokens used: {total_prompt_tokens}")
     logger.info(f"Total completion tokens used: {total_completion_tokens}")
     logger.info(f"Total tokens used: {total_tokens}")
@@ -105,44 +107,72 @@ def ask_from_gpt():
     logger.info('all process finished!')
 
 
-# Pricing dictionary for popular models (Prices per 1K tokens in USD)
-MODEL_PRICING = {
-    "gpt-5.1": {"input": 1.25, "output": 10.00},
-    "gpt-5": {"input": 1.25, "output": 10.00},
-    "gpt-5-mini": {"input": 0.25, "output": 2.00},
-    "gpt-5-nano": {"input": 0.05, "output": 0.40},
-    "gpt-5-pro": {"input": 15.00, "output": 120.00},
-    "gpt-4.1": {"input": 2.00, "output": 8.00},
-    "gpt-4.1-mini": {"input": 0.40, "output": 1.60},
-    "gpt-4.1-nano": {"input": 0.10, "output": 0.40},
-    "gpt-4o": {"input": 2.50, "output": 10.00},
-    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
-    "gpt-3.5-turbo": {"input": 0.50, "output": 1.50},
-    # Legacy/Other models can be added here
-}
+# Questions tokenized per encode_batch call when estimating cost
+QUESTION_TOKEN_BATCH_SIZE = 500
 
 
-def parse_questions_file(uploaded_file):
+def _iter_first_column(uploaded_file):
+    name = uploaded_file.name
+    if name.endswith('.csv'):
+        text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+        try:
+            for row in csv.reader(text):
+                if row and row[0].strip():
+                    yield row[0]
+        finally:
+            text.detach()
+    elif name.endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+        try:
+            for (value,) in workbook.worksheets[0].iter_rows(min_col=1, max_col=1, values_only=True):
+                if value is not None and str(value).strip():
+                    yield str(value)
+        finally:
+            workbook.close()
+    elif name.endswith('.xls'):
+        # legacy workbooks are not supported by openpyxl
+        import pandas as pd
+
+        df = pd.read_excel(uploaded_file, header=None, usecols=[0])
+        yield from df.iloc[:, 0].dropna().astype(str)
+    else:
+        raise ValueError("Unsupported file format. Please upload .csv, .xls, or .xlsx.")
+
+
+def iter_questions_file(uploaded_file):
     """
-    Parses TXT, CSV, or Excel file into a list of question strings.
-    Assumes questions are in the first column for structured files.
+    Lazily yields the questions of a CSV or Excel file, one per row of the
+    first column. CSV is decoded incrementally and .xlsx is read in
+    openpyxl read-only mode, touching column A only, so memory stays
+    bounded however large the file is. Blank cells are skipped.
     """
-    try:          
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file, header=None)
-        elif uploaded_file.name.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(uploaded_file, header=None)
-        else:
-            raise ValueError("Unsupported file format. Please upload .txt, .csv, .xls, or .xlsx.")
-        
-        # Take the first column as questions
-        if not df.empty:
-            return df.iloc[:, 0].astype(str).tolist()
-        return []
-        
+    try:
+        yield from _iter_first_column(uploaded_file)
     except Exception as e:
         raise ValueError(f"Error parsing file: {str(e)}")
 
+
+def parse_questions_file(uploaded_file):
+    """
+    Parses a CSV or Excel file into a list of question strings.
+    Assumes questions are in the first column.
+    """
+    return list(iter_questions_file(uploaded_file))
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 def get_standard_backstory_text():
     """
     Generates a standard backstory text.
@@ -173,38 +203,67 @@ def get_standard_backstory_text():
         
     return build_backstory(person)
 
-def calculate_simulation_cost(model_name, questions, num_people):
+def calculate_simulation_cost(model_name, questions, num_people, project_id=None):
     """
     Calculates cost by: 
     (Backstory + Question + Template Tokens) * Num_People * Price
+
+    `questions` may be any iterable, e.g. iter_questions_file(); prompts are
+    built and tokenized QUESTION_TOKEN_BATCH_SIZE at a time.
+
+    With a project_id the backstory tokens are the average of the project's
+    real personas, read from its token profile, and the result is "exact".
+    The profile is never built here: until estimate_question_cost or
+    build_token_profile_task has built it, one of the project's personas
+    (or a standard backstory without any) stands in for every person.
     """
     pricing = MODEL_PRICING.get(model_name)
     if not pricing:
         raise ValueError(f"Model {model_name} not supported.")
 
-    # 1. Get the base backstory (Constant part)
-    backstory_text = get_standard_backstory_text()
-    
+    encoding = get_encoding_for_model(model_name)
+
+    # 1. Get the base backstory (Constant part). With a project profile, one
+    # real backstory is used and shifted to the population's average length.
+    backstory_text = None
+    backstory_offset = 0.0
+    exact = False
+    if project_id is not None:
+        profile = get_token_profile(project_id, model_name, build=False)
+        person = SiliconePerson.objects.filter(project_id=project_id).first()
+        if person is not None:
+            backstory_text = build_backstory(person)
+        if profile is not None and profile.person_count and person is not None:
+            average = profile.total_tokens / profile.person_count
+            backstory_offset = average - len(encoding.encode(backstory_text))
+            exact = True
+    if backstory_text is None:
+        backstory_text = get_standard_backstory_text()
+
     # Dummy options are required for build_prompt to generate the full template instructions
     dummy_options = ["Option A", "Option B"]
 
     total_in_tokens = 0
-    total_out_tokens = 0
-    
+    num_questions = 0
+
     # 2. Iterate over questions
-    for question_text in questions:
-        # Build full prompt using the exact logic from runner.py
+    for batch in _batched(questions, QUESTION_TOKEN_BATCH_SIZE):
+        # Build full prompts using the exact logic from runner.py
         # This includes the "IMPORTANT: ..." instructions which add tokens
-        full_text = build_prompt(backstory_text, question_text, dummy_options)
-        
-        # Count tokens for ONE person answering THIS question
-        tokens_per_person = count_tokens(full_text, model_name)
-        
-        # Multiply by number of silicon people requested
-        total_in_tokens += (tokens_per_person * num_people)
-        
-        # Estimate output tokens (e.g. "Option A" or candidate name) per person
-        total_out_tokens += (3 * num_people)
+        prompts = [build_prompt(backstory_text, question_text, dummy_options) for question_text in batch]
+
+        # Count tokens for ONE person answering each question,
+        # multiplied by the number of silicon people requested
+        for ids in encoding.encode_batch(prompts):
+            total_in_tokens += round((len(ids) + backstory_offset) * num_people)
+        num_questions += len(batch)
+
+    return _simulation_cost_result(model_name, pricing, num_questions, num_people, total_in_tokens, exact)
+
+
+def _simulation_cost_result(model_name, pricing, num_questions, num_people, total_in_tokens, exact=False):
+    # Estimate output tokens (e.g. "Option A" or candidate name) per person
+    total_out_tokens = 3 * num_people * num_questions
 
     # 3. Calculate Final Price
     input_cost = (total_in_tokens / 1000000) * pricing['input'] * 1.20
@@ -215,10 +274,12 @@ def calculate_simulation_cost(model_name, questions, num_people):
         "model": model_name,
         "simulation_details": {
             "num_silicon_people": num_people,
-            "num_questions": len(questions),
-            "total_requests": num_people * len(questions)
+            "num_questions": num_questions,
+            "total_requests": num_people * num_questions
         },
         "tokens": {"input": total_in_tokens, "output": total_out_tokens},
+        # backstory tokens measured on the project's whole population
+        "exact": exact,
         "cost_usd": {
             "input": round(input_cost, 6),
             "output": round(output_cost, 6),
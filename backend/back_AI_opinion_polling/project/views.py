@@ -1,6 +1,6 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from drf_spectacular.utils import (
@@ -12,14 +12,20 @@ from drf_spectacular.utils import (
 from drf_spectacular.types import OpenApiTypes
 from .searializer import (
     CreateProjectSerializer,
+    UpdateProjectSerializer,
     ProjectListSerializer,
     CreateSiliconPersonsSerializer,
     SiliconPersonListSerializer,
     CreateQuestionSerializer,
     QuestionListSerializer,
+    QuestionSummaryListSerializer,
     SiliconPersonCSVUploadSerializer,
+    SiliconPersonArrowUploadSerializer,
     TokenCostSerializer,
     QuestionsCSVUploadSerializer,
+    QuestionRunControlSerializer,
+    ImportJobUploadSerializer,
+    ImportJobSerializer,
 )
 from .models import(
     Project,
@@ -27,19 +33,52 @@ from .models import(
     Question,
     Response as ResponseModel,
     AnalysisResult,
+    ImportJob,
 )
 from loguru import logger
-from django.db import IntegrityError
-from .tasks import ask_gpt
+from django.db import IntegrityError, transaction
+from .tasks import (
+    ask_gpt,
+    build_token_profile_task,
+    complete_project_if_done,
+    estimate_question_cost,
+    fail_project_if_stuck,
+    run_import_job,
+    set_project_status,
+)
 import csv
-import io
 import os
-from .replication.runner import run_human_sampling_for_project
+from .replication.runner import get_question_models, estimate_cost_from_sample
 from .replication.common import get_default_token_sets
-from .utils import calculate_simulation_cost, parse_questions_file, MODEL_PRICING
+from .importers import (
+    ARROW_EXTENSIONS,
+    IMPORT_BATCH_SIZE,
+    import_persons,
+    import_persons_from_arrow,
+    iter_csv_rows,
+    question_deduplicator,
+    question_from_row,
+)
+from . import budgets
+from .caching import (
+    bump_project_version,
+    cached_response,
+    project_owner_id,
+    project_version,
+    question_project_id,
+    user_version,
+)
+from .db_metrics import connection_counts, max_connections, pool_stats
+from .demographics import get_person_statistics
+from .token_profiles import estimate_cost_from_profiles, get_token_profile
+from .exporters import EXPORT_FORMATS, stream_export
+from .logprobs import unpack_logprobs
+from .utils import calculate_simulation_cost, iter_questions_file, MODEL_PRICING
 from django.shortcuts import get_object_or_404
-from django.db.models import Case, When, Value, CharField, Count, F, ExpressionWrapper, IntegerField
-from django.db.models.functions import Cast, Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import F, ExpressionWrapper, IntegerField
+from django.db.models.functions import Coalesce
 
 
 
@@ -57,10 +96,14 @@ class ProjectView(APIView):
     def get(self, request):
         try:
             user = request.user
-            projects = Project.objects.filter(user=user)
-            serializer = ProjectListSerializer(projects, many=True)
-            response = {"data": serializer.data, "status": status.HTTP_200_OK}
-            return Response(response, status=status.HTTP_200_OK)
+
+            def build():
+                projects = Project.objects.filter(user=user)
+                serializer = ProjectListSerializer(projects, many=True)
+                response = {"data": serializer.data, "status": status.HTTP_200_OK}
+                return Response(response, status=status.HTTP_200_OK)
+
+            return cached_response(request, f"projects:user:{user.id}:v{user_version(user.id)}", build)
         except Exception as e:
             logger.error(str(e))
             return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -84,6 +127,7 @@ class ProjectView(APIView):
                 pr = Project.objects.create(user=user,
                                        title=serializer.validated_data['title'],
                                        description=serializer.validated_data['description'],
+                                       budget_limit=serializer.validated_data.get('budget_limit'),
                                        )
                 data = serializer.validated_data
                 data['project_id'] = pr.id
@@ -101,6 +145,45 @@ class ProjectView(APIView):
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        tags=["Project"],
+        summary="Update a project",
+        description="Change the title, description or budget limit of a project. Only the fields sent are changed.",
+        request=UpdateProjectSerializer,
+        responses={
+            200: ProjectListSerializer,
+            400: OpenApiResponse(description="Duplicate project title"),
+            403: OpenApiResponse(description="Project belongs to another user"),
+            404: OpenApiResponse(description="Project not found"),
+        }
+    )
+    def patch(self, request):
+        serializer = UpdateProjectSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        project = Project.objects.filter(id=data['project_id']).first()
+        if project is None:
+            return Response({'error': 'Project not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if project.user_id != request.user.id:
+            return Response({'error': 'You cannot access projects of other users.'}, status=status.HTTP_403_FORBIDDEN)
+
+        fields = [field for field in ('title', 'description', 'budget_limit') if field in data]
+        limit_added = project.budget_limit is None and data.get('budget_limit') is not None
+        for field in fields:
+            setattr(project, field, data[field])
+        try:
+            with transaction.atomic():
+                project.save(update_fields=fields + ['updated_at'])
+        except IntegrityError:
+            return Response(
+                {'error': f"A project with the title '{data['title']}' already exists for this user."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit_added:
+            budgets.forget_spend(project_id=project.id)
+        response = {"data": ProjectListSerializer(project).data, "status": status.HTTP_200_OK}
+        return Response(response, status=status.HTTP_200_OK)
+
 class SiliconPersonView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -124,13 +207,19 @@ class SiliconPersonView(APIView):
         if not project_id:
             return Response(status=status.HTTP_400_BAD_REQUEST, data={'erroe': 'Missing required parameter: project_id'})
         try:
-            project = Project.objects.get(id=project_id)
-            if project.user != request.user:
+            owner_id = project_owner_id(project_id)
+            if owner_id is None:
+                raise Project.DoesNotExist(f"Project {project_id} does not exist")
+            if owner_id != request.user.id:
                 return Response(status=status.HTTP_403_FORBIDDEN, data={'error': 'Unauthorized access'})
-            silicon_persons = SiliconePerson.objects.filter(project=project)
-            serializer = SiliconPersonListSerializer(silicon_persons, many=True)
-            response = {"data": serializer.data, "status": status.HTTP_200_OK}
-            return Response(response, status=status.HTTP_200_OK)
+
+            def build():
+                silicon_persons = SiliconePerson.objects.filter(project_id=project_id)
+                serializer = SiliconPersonListSerializer(silicon_persons, many=True)
+                response = {"data": serializer.data, "status": status.HTTP_200_OK}
+                return Response(response, status=status.HTTP_200_OK)
+
+            return cached_response(request, f"silicon_persons:{project_id}:v{project_version(project_id)}", build)
         except Exception as e:
             logger.error(str(e))
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -219,7 +308,11 @@ class SamplingViews(APIView):
     @extend_schema(
         tags=["Sampling"],
         summary="Create a sampling question",
-        description="Create a new question under a project. This endpoint calculates the estimated cost of human sampling for the question.",
+        description="Create a new question under a project. The response carries a quick cost estimate (`cost`, with its "
+                    "sampling margin in `cost_estimate`) taken from a random sample of personas; the exact cost is "
+                    "computed in the background and stored on the question as `estimated_cost`. "
+                    "Pass `compare_models` to run the same prompts on several models side by side, and "
+                    "`num_samples` with a `temperature` above 0 to draw several answers per persona in one request.",
         request=CreateQuestionSerializer,
         responses=CreateQuestionSerializer
     )
@@ -259,12 +352,15 @@ class SamplingViews(APIView):
                     project=project,
                     body=serializer.validated_data['body'],
                     real_answer=real_answer,
-                    model_name=model_name
+                    model_name=model_name,
+                    compare_models=serializer.validated_data.get('compare_models') or None,
+                    num_samples=serializer.validated_data.get('num_samples', 1),
+                    temperature=serializer.validated_data.get('temperature', 0.0),
+                    target_precision=serializer.validated_data.get('target_precision'),
                 )
 
                 response_serializer = CreateQuestionSerializer(question)
-                project.status = 'draft'
-                project.save()
+                set_project_status(project.id, 'draft')
                 year = 0
                 if project.id == 1:
                     year = 2016
@@ -273,10 +369,22 @@ class SamplingViews(APIView):
                 elif project.id == 4:
                     year = 2020
                 token_sets = get_default_token_sets(year)
-                cost = run_human_sampling_for_project(project=project.id, question=question.id, token_sets=token_sets,
-                                                      just_cost=True)
+                # From the token profile when there is one, otherwise a sampled preview
+                # while the task builds it; the exact figure lands on question.estimated_cost
+                models = get_question_models(question)
+                preview = estimate_cost_from_profiles(project.id, question, token_sets,
+                                                      model_names=models, num_samples=question.num_samples)
+                if preview is None:
+                    preview = estimate_cost_from_sample(project.id, question, token_sets,
+                                                        model_names=models, num_samples=question.num_samples)
+                if preview['exact']:
+                    Question.objects.filter(id=question.id).update(estimated_cost=preview['cost'])
+                else:
+                    estimate_question_cost.delay(question.id, year)
                 response_data = response_serializer.data.copy()
-                response_data['cost'] = cost
+                response_data['id'] = question.id
+                response_data['cost'] = preview['cost']
+                response_data['cost_estimate'] = preview
                 response = {"data": response_data, "status": status.HTTP_201_CREATED}
                 return Response(response, status=status.HTTP_201_CREATED)
 
@@ -294,16 +402,133 @@ class SamplingViews(APIView):
                 )
 
 
+class QuestionRunControlView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    # action -> {run status it may be applied to: run status it moves the question to}.
+    # Pausing a running question only requests the pause; the runner confirms
+    # it (pausing -> paused) when it stops, and only a confirmed pause can be
+    # resumed, so two runs of one question never overlap.
+    TRANSITIONS = {
+        'cancel': {'pending': 'cancelled', 'running': 'cancelled', 'pausing': 'cancelled', 'paused': 'cancelled'},
+        'pause': {'pending': 'paused', 'running': 'pausing'},
+        'resume': {'paused': 'pending'},
+    }
+
+    @extend_schema(
+        tags=["Sampling"],
+        summary="Cancel, pause or resume a question run",
+        description="Control a running replication job. The runner checks the question's run status between chunks of persons, "
+                    "so a pause or cancel takes effect after the current chunk: a running question is `pausing` until "
+                    "the runner stops and marks it `paused`. Only a `paused` question can be resumed; resuming re-queues "
+                    "it and only persons without a response are sent to the model.",
+        request=QuestionRunControlSerializer,
+        responses={
+            200: OpenApiResponse(description="Run status updated"),
+            404: OpenApiResponse(description="Question not found"),
+            409: OpenApiResponse(description="Action not allowed in the current run status"),
+        }
+    )
+    def post(self, request):
+        serializer = QuestionRunControlSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        question_id = serializer.validated_data['question_id']
+        action = serializer.validated_data['action']
+        try:
+            question = Question.objects.select_related('project').get(id=question_id)
+        except Question.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND, data={'error': 'Question not found.'})
+        if question.project.user != request.user:
+            return Response(status=status.HTTP_403_FORBIDDEN, data={'error': 'You cannot access projects of other users.'})
+
+        new_status = None
+        for from_status, to_status in self.TRANSITIONS[action].items():
+            if Question.objects.filter(id=question.id, run_status=from_status).update(run_status=to_status):
+                new_status = to_status
+                break
+        if new_status is None:
+            question.refresh_from_db(fields=['run_status'])
+            return Response(
+                {'error': f"Cannot {action} a question whose run is {question.run_status}."},
+                status=status.HTTP_409_CONFLICT
+            )
+        if action == 'resume':
+            ask_gpt.delay(question.id)
+        elif new_status == 'cancelled' and not complete_project_if_done(question.project_id):
+            fail_project_if_stuck(question.project_id)
+
+        response = {"data": {"question_id": question.id, "run_status": new_status}, "status": status.HTTP_200_OK}
+        return Response(response, status=status.HTTP_200_OK)
+
+
+class QuestionSummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=["Sampling"],
+        summary="List a project's questions with their run summaries",
+        description="Every question of the project with its run summary: responses, tokens used, actual cost, "
+                    "run timestamps and headline metrics. Summaries are kept up to date by the runner and the "
+                    "analysis task; `run_summary` is null for a question that has not run yet.",
+        parameters=[
+            OpenApiParameter("project_id", int, required=True, location="query")
+        ],
+        responses=QuestionSummaryListSerializer(many=True),
+    )
+    def get(self, request):
+        project_id = request.query_params.get('project_id', None)
+        if not project_id:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': 'Missing required parameter: project_id'})
+        try:
+            project = Project.objects.get(id=project_id)
+        except (Project.DoesNotExist, ValueError):
+            return Response(status=status.HTTP_404_NOT_FOUND, data={'error': 'Project not found.'})
+        if project.user != request.user:
+            return Response(status=status.HTTP_403_FORBIDDEN, data={'error': 'You cannot access projects of other users.'})
+
+        # one row per question: the summary is joined, nothing is aggregated
+        questions = Question.objects.filter(project=project).select_related('run_summary').order_by('id')
+        serializer = QuestionSummaryListSerializer(questions, many=True)
+        response = {"data": serializer.data, "status": status.HTTP_200_OK}
+        return Response(response, status=status.HTTP_200_OK)
+
+
 class ModelResponseView(APIView):
     permission_classes = [IsAuthenticated]
 
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+    DEFAULT_FIELDS = ["question", "silicon_person_id", "response_of_model"]
+    # output field -> values() lookup; "question" is filled in from the question itself
+    FIELD_LOOKUPS = {
+        "id": "id",
+        "question": None,
+        "silicon_person_id": "silicone_person_id",
+        "response_of_model": "raw_response",
+        "gpt_model": "gpt_model",
+        "confidence_score": "confidence_score",
+        "predicted_choice": "structured_data__predicted_choice",
+        "candidate_probs": "structured_data__candidate_probs",
+        "token_logprobs": "logprobs_packed",
+        "created_at": "created_at",
+    }
+
     @extend_schema(
         tags=["Model"],
         summary="Get model response for a question",
-        description="Fetch model-generated responses for a given question and project. Accessible only if the project belongs to the user and the question has been completed.",
+        description="Fetch model-generated responses for a given question and project, ordered by id and paginated "
+                    "with a cursor: pass the returned `next_cursor` as `cursor` to get the next page. "
+                    "Accessible only if the project belongs to the user and the question has been completed.",
         parameters=[
             OpenApiParameter("project_id", int, required=True, location="query"),
             OpenApiParameter("question_id", int, required=True, location="query"),
+            OpenApiParameter("cursor", int, required=False, location="query",
+                             description="`next_cursor` of the previous page."),
+            OpenApiParameter("limit", int, required=False, location="query",
+                             description="Page size, 100 by default and at most 1000."),
+            OpenApiParameter("fields", str, required=False, location="query",
+                             description="Comma separated fields to return: " + ", ".join(FIELD_LOOKUPS)
+                                         + ". Defaults to question, silicon_person_id, response_of_model."),
         ],
         responses=OpenApiResponse(
             response={
@@ -320,6 +545,7 @@ class ModelResponseView(APIView):
                             }
                         }
                     },
+                    "next_cursor": {"type": "integer", "nullable": True},
                     "status": {"type": "integer"}
                 }
             }
@@ -331,6 +557,17 @@ class ModelResponseView(APIView):
         question_id = request.query_params.get('question_id', None)
         if not question_id and not project_id:
             return Response(status=status.HTTP_400_BAD_REQUEST, data={'erroe': 'Missing required parameter'})
+        try:
+            cursor = int(request.query_params.get('cursor', 0))
+            limit = int(request.query_params.get('limit', self.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': 'cursor and limit must be integers.'})
+        limit = max(1, min(limit, self.MAX_PAGE_SIZE))
+        fields = request.query_params.get('fields', None)
+        fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else self.DEFAULT_FIELDS
+        unknown = [f for f in fields if f not in self.FIELD_LOOKUPS]
+        if unknown:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': f"Unknown fields: {', '.join(unknown)}."})
         try:
             project = Project.objects.get(id=project_id)
             question = Question.objects.get(id=question_id)
@@ -342,18 +579,81 @@ class ModelResponseView(APIView):
             return Response(status=status.HTTP_403_FORBIDDEN, data={'error': 'You cannot access projects of other users.'})
         if project.status != 'completed' and not question.gpt_answer:
             return Response(status=status.HTTP_200_OK, data={'message': 'mission did not complete!'})
-        silicon_persons = SiliconePerson.objects.filter(project=project)
-        responses = ResponseModel.objects.filter(silicone_person__in=silicon_persons, question=question)
-        output = {"data": [], "status": 200}
-        for response in responses:
-            output["data"].append({
-                "question": question.body,
-                "silicon_person_id": response.silicone_person.id,
-                "response_of_model": response.raw_response,
-            })
+        if question.project_id != project.id:
+            return Response(status=status.HTTP_404_NOT_FOUND, data={'error': 'Question not found.'})
+
+        # Keyset pagination on the primary key: each page is an index range scan
+        # no matter how deep the client pages, and nothing is joined.
+        lookups = {f: self.FIELD_LOOKUPS[f] for f in fields if self.FIELD_LOOKUPS[f]}
+        rows = list(
+            ResponseModel.objects.filter(question=question, id__gt=cursor)
+            .order_by('id')
+            .values('id', *lookups.values())[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        output = {"data": [], "next_cursor": rows[-1]['id'] if has_more else None, "status": 200}
+        for row in rows:
+            item = {}
+            for field in fields:
+                lookup = self.FIELD_LOOKUPS[field]
+                if lookup is None:
+                    item[field] = question.body
+                elif field == 'token_logprobs':
+                    item[field] = unpack_logprobs(row[lookup])
+                else:
+                    item[field] = row[lookup]
+            output["data"].append(item)
         return Response(output, status=status.HTTP_200_OK)
 
 
+class ResponseExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=["Model"],
+        summary="Export model responses",
+        description="Stream every model response of a question together with the silicon person's attributes "
+                    "and the per-candidate probabilities, as CSV, JSON lines or Parquet. "
+                    "The file is produced while it is downloaded, so large exports start immediately.",
+        parameters=[
+            OpenApiParameter("project_id", int, required=True, location="query"),
+            OpenApiParameter("question_id", int, required=True, location="query"),
+            OpenApiParameter("export_format", str, required=False, location="query",
+                             enum=list(EXPORT_FORMATS), description="Defaults to csv."),
+        ],
+        responses={
+            200: OpenApiResponse(response=OpenApiTypes.BINARY, description="Exported file"),
+            400: OpenApiResponse(description="Missing parameter or unsupported format"),
+            403: OpenApiResponse(description="Project belongs to another user"),
+            404: OpenApiResponse(description="Project or question not found"),
+        }
+    )
+    def get(self, request):
+        project_id = request.query_params.get('project_id', None)
+        question_id = request.query_params.get('question_id', None)
+        export_format = request.query_params.get('export_format', 'csv')
+        if not project_id or not question_id:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': 'Missing required parameter'})
+        if export_format not in EXPORT_FORMATS:
+            return Response(status=status.HTTP_400_BAD_REQUEST,
+                            data={'error': f"export_format must be one of {', '.join(EXPORT_FORMATS)}."})
+        try:
+            project = Project.objects.get(id=project_id)
+            question = Question.objects.get(id=question_id, project=project)
+        except Project.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND, data={'error': 'Project not found.'})
+        except Question.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND, data={'error': 'Question not found.'})
+        if project.user != request.user:
+            return Response(status=status.HTTP_403_FORBIDDEN, data={'error': 'You cannot access projects of other users.'})
+
+        content_type, extension = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(stream_export(question, export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="question_{question.id}_responses.{extension}"'
+        return response
+
 
 class QuickAnswerView(APIView):
     permission_classes = [IsAuthenticated]
@@ -392,8 +692,7 @@ class QuickAnswerView(APIView):
                 )
 
                 response_serializer = CreateQuestionSerializer(question)
-                project.status = 'draft'
-                project.save()
+                set_project_status(project.id, 'draft')
                 ask_gpt.delay(question.id)
                 response = {"data": response_serializer.data, "status": status.HTTP_201_CREATED}
                 return Response(response, status=status.HTTP_201_CREATED)
@@ -429,7 +728,18 @@ class SiliconPersonByCSV(APIView):
                     "properties": {
                         "message": {"type": "string"},
                         "created_count": {"type": "integer"},
-                        "ids": {"type": "array", "items": {"type": "integer"}}
+                        "error_count": {"type": "integer"},
+                        "errors": {
+                            "type": "array",
+                            "description": "First invalid rows (1-based, header excluded); these rows are skipped",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "row": {"type": "integer"},
+                                    "error": {"type": "string"},
+                                }
+                            }
+                        }
                     }
                 }
             ),
@@ -453,47 +763,139 @@ class SiliconPersonByCSV(APIView):
             return Response({"error": "Project not found"}, status=404)
 
         try:
-            decoded_file = file.read().decode('utf-8')
-        except:
+            with transaction.atomic():
+                summary = import_persons(iter_csv_rows(file), project)
+        except (UnicodeDecodeError, csv.Error):
             return Response({"error": "Unable to decode CSV file"}, status=400)
 
-        io_string = io.StringIO(decoded_file)
-        reader = csv.DictReader(io_string)
-
-        created_objects = []
-
-        for row in reader:
-            fields = {
-                "project": project,
-                "id_str": row.get("id", None),
-                "name": row.get("name", None),
-                "race": row.get("race", None),
-                "discuss_politics": row.get("discuss_politics", None),
-                "ideology": row.get("ideology", None),
-                "party": row.get("party", None),
-                "church_goer": row.get("church_goer", None),
-                "gender": row.get("gender", None),
-                "age": row.get("age", None),
-                "political_interest": row.get("political_interest", None),
-                "state": row.get("state", None),
-                "religion": row.get("religion", None),
-                "education": row.get("education", None),
-                "financially": row.get("financially", None),
-                "patriotism": row.get("patriotism", None),
-                "real_vote": row.get("real_vote", None),
-                "more_info": row.get("more_info", None),
-            }
-            obj = SiliconePerson.objects.create(**fields)
-            created_objects.append(obj.id)
+        return Response({
+            "message": "Silicone persons imported successfully.",
+            **summary,
+        }, status=status.HTTP_201_CREATED)
+
+
+
+
+
+class SiliconPersonByArrow(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    @extend_schema(
+        tags=["Silicon Person"],
+        summary="Upload silicon persons via Parquet or Arrow",
+        description="Bulk-load silicon persons from a Parquet (.parquet) or Arrow IPC (.arrow, .feather) file. "
+                    "Columns named like SiliconePerson fields (`id` maps to `id_str`) are mapped directly; "
+                    "any other column is stored in `more_info`.",
+        request=SiliconPersonArrowUploadSerializer,
+        responses={
+            201: OpenApiResponse(
+                description="File imported successfully",
+                response={
+                    "type": "object",
+                    "properties": {
+                        "message": {"type": "string"},
+                        "created_count": {"type": "integer"},
+                        "error_count": {"type": "integer"},
+                        "errors": {"type": "array", "items": {"type": "object"}}
+                    }
+                }
+            ),
+            400: OpenApiResponse(description="Bad request"),
+            403: OpenApiResponse(description="Project belongs to another user"),
+            404: OpenApiResponse(description="Project not found"),
+        }
+    )
+    def post(self, request):
+        serializer = SiliconPersonArrowUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file = serializer.validated_data['silicon_persons']
+        if not file.name.endswith(ARROW_EXTENSIONS):
+            return Response({"error": "Please upload a .parquet, .arrow or .feather file."}, status=400)
+        try:
+            project = Project.objects.get(id=serializer.validated_data['project_id'])
+        except Project.DoesNotExist:
+            return Response({"error": "Project not found"}, status=404)
+        if project.user != request.user:
+            return Response({'error': 'You cannot access projects of other users.'}, status=status.HTTP_403_FORBIDDEN)
+
+        # Large uploads are spooled to disk by Django; memory-map those directly
+        source = file.temporary_file_path() if hasattr(file, 'temporary_file_path') else file
+        try:
+            with transaction.atomic():
+                summary = import_persons_from_arrow(source, file.name, project)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Unable to read columnar file: {e}")
+            return Response({"error": "Unable to read the uploaded file"}, status=400)
 
         return Response({
             "message": "Silicone persons imported successfully.",
-            "created_count": len(created_objects),
-            "ids": created_objects
+            **summary,
         }, status=status.HTTP_201_CREATED)
 
 
+class ImportJobView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    @extend_schema(
+        tags=["Import"],
+        summary="Start an import job",
+        description="Store a large persona or question file (.csv or .xlsx) and ingest it in the background. "
+                    "Returns the job id immediately; poll it with GET to follow progress. Questions whose "
+                    "body already exists in the project (or earlier in the file) are skipped and counted "
+                    "in duplicate_count.",
+        request=ImportJobUploadSerializer,
+        responses={
+            202: ImportJobSerializer,
+            403: OpenApiResponse(description="Project belongs to another user"),
+            404: OpenApiResponse(description="Project not found"),
+        }
+    )
+    def post(self, request):
+        serializer = ImportJobUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            project = Project.objects.get(id=data['project_id'])
+        except Project.DoesNotExist:
+            return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
+        if project.user != request.user:
+            return Response({'error': 'You cannot access projects of other users.'}, status=status.HTTP_403_FORBIDDEN)
+
+        job = ImportJob.objects.create(
+            project=project,
+            kind=data['kind'],
+            file=data['file'],
+            model_name=data.get('model_name') or os.getenv("GPT_MODEL"),
+        )
+        run_import_job.delay(job.id)
+        response = {"data": ImportJobSerializer(job).data, "status": status.HTTP_202_ACCEPTED}
+        return Response(response, status=status.HTTP_202_ACCEPTED)
 
+    @extend_schema(
+        tags=["Import"],
+        summary="Get import job status",
+        description="Progress of an import job: rows processed, rows created, and the first row-level errors.",
+        parameters=[
+            OpenApiParameter("job_id", int, required=True, location="query")
+        ],
+        responses=ImportJobSerializer
+    )
+    def get(self, request):
+        job_id = request.query_params.get('job_id', None)
+        if not job_id:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': 'Missing required parameter: job_id'})
+        try:
+            job = ImportJob.objects.select_related('project').get(id=job_id)
+        except (ImportJob.DoesNotExist, ValueError):
+            return Response(status=status.HTTP_404_NOT_FOUND, data={'error': 'Import job not found.'})
+        if job.project.user != request.user:
+            return Response(status=status.HTTP_403_FORBIDDEN, data={'error': 'You cannot access projects of other users.'})
+        response = {"data": ImportJobSerializer(job).data, "status": status.HTTP_200_OK}
+        return Response(response, status=status.HTTP_200_OK)
 
 
 class AnalyseResultsView(APIView):
@@ -561,10 +963,17 @@ class AnalyseResultsView(APIView):
         except ValueError:
             return Response({"error": "Invalid project ID"}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            result = AnalysisResult.objects.get(question__id=question_id)
-            response = {"data" : {}, "status":status.HTTP_200_OK}
-            response['data'] = result.result_data
-            return Response(response, status=status.HTTP_200_OK)
+            project_id = question_project_id(question_id)
+            if project_id is None:
+                raise AnalysisResult.DoesNotExist
+
+            def build():
+                result = AnalysisResult.objects.get(question__id=question_id)
+                response = {"data" : {}, "status":status.HTTP_200_OK}
+                response['data'] = result.result_data
+                return Response(response, status=status.HTTP_200_OK)
+
+            return cached_response(request, f"analysis:{question_id}:v{project_version(project_id)}", build)
         except AnalysisResult.DoesNotExist:
             return Response({"error": "not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -579,7 +988,8 @@ class QuestionImportByCSV(APIView):
         tags=["Question"],
         summary="Upload questions via CSV",
         description="Upload a CSV file to create multiple questions for a given project. "
-                    "CSV must include at least a 'body' column.",
+                    "CSV must include at least a 'body' column. All rows are validated before anything is saved; "
+                    "questions whose body already exists in the project (or earlier in the file) are skipped.",
         request=QuestionsCSVUploadSerializer,
         responses={
             201: OpenApiResponse(
@@ -589,6 +999,7 @@ class QuestionImportByCSV(APIView):
                     "properties": {
                         "message": {"type": "string"},
                         "created_count": {"type": "integer"},
+                        "duplicate_count": {"type": "integer"},
                         "ids": {"type": "array", "items": {"type": "integer"}}
                     }
                 }
@@ -627,42 +1038,40 @@ class QuestionImportByCSV(APIView):
         except Project.DoesNotExist:
             return Response({"error": "Project not found"}, status=404)
 
+        # Validate every row before writing anything
+        rows = []
         try:
-            decoded_file = file.read().decode('utf-8')
-        except:
+            for row_number, row in enumerate(iter_csv_rows(file), start=1):
+                try:
+                    rows.append(question_from_row(row, project, final_model_name))
+                except ValueError as e:
+                    return Response({"error": str(e), "row": row_number}, status=400)
+        except (UnicodeDecodeError, csv.Error):
             return Response({"error": "Unable to decode CSV file"}, status=400)
 
-        io_string = io.StringIO(decoded_file)
-        reader = csv.DictReader(io_string)
-
-        created_ids = []
-
+        # Skipped the same way as by an import job, which counts them in duplicate_count
+        drop_duplicates = question_deduplicator(project)
+        questions = []
+        for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+            questions.extend(drop_duplicates(rows[start:start + IMPORT_BATCH_SIZE]))
+        duplicate_count = len(rows) - len(questions)
 
-        for row in reader:
-            question_data = {
-                "project": project,
-                "body": row.get("body"),
-                "real_answer": row.get("real_answer") or None,
-                "gpt_answer": False,
-                "is_analysed": False,
-                "model_name": final_model_name
-            }
-
-            # "body" is mandatory
-            if not question_data["body"]:
-                return Response({
-                    "error": "Each row must include a 'body' field."
-                }, status=400)
-
-            obj = Question.objects.create(**question_data)
-            created_ids.append(obj.id)
-            project.status='draft'
-            project.save()
+        try:
+            with transaction.atomic():
+                created = Question.objects.bulk_create(questions)
+                if created:
+                    set_project_status(project.id, 'draft')
+                    # bulk_create sends no signals
+                    bump_project_version(project.id, project.user_id)
+        except IntegrityError:
+            # another upload added one of the bodies since they were checked
+            return Response({"error": "A question with this body already exists for the project."}, status=400)
 
         return Response({
             "message": "Questions imported successfully.",
-            "created_count": len(created_ids),
-            "ids": created_ids
+            "created_count": len(created),
+            "duplicate_count": duplicate_count,
+            "ids": [q.id for q in created]
         }, status=status.HTTP_201_CREATED)
 
 
@@ -707,6 +1116,7 @@ class TokenCostEstimationView(APIView):
                                         "output": {"type": "integer"}
                                         }
                                 },
+                                "exact": {"type": "boolean"},
                                 "cost_usd": {
                                     "type": "object",
                                     "properties": {
@@ -742,13 +1152,30 @@ class TokenCostEstimationView(APIView):
         data = serializer.validated_data
         
         try:
-            # 1. Extract Questions Strategy
+            project_id = data.get('project_id')
+            if project_id is not None and not Project.objects.filter(id=project_id, user=request.user).exists():
+                return standard_response(
+                    success=False,
+                    message="Project not found.",
+                    code="project_not_found",
+                    status_code=status.HTTP_404_NOT_FOUND
+                )
+
+            # 1. Extract Questions Strategy (files are read lazily while tokenizing)
             if data.get('questions_file'):
-                questions = parse_questions_file(data['questions_file'])
+                questions = iter_questions_file(data['questions_file'])
             else:
                 questions = data['questions_list']
 
-            if not questions:
+            # 2. Calculate Logic
+            result = calculate_simulation_cost(
+                model_name=data['model_name'],
+                questions=questions,
+                num_people=data['num_silicon_people'],
+                project_id=project_id
+            )
+
+            if not result['simulation_details']['num_questions']:
                 # Standard Error Response for Logic Failure (Empty Questions)
                 return standard_response(
                     success=False,
@@ -757,12 +1184,9 @@ class TokenCostEstimationView(APIView):
                     status_code=status.HTTP_400_BAD_REQUEST
                 )
 
-            # 2. Calculate Logic
-            result = calculate_simulation_cost(
-                model_name=data['model_name'],
-                questions=questions,
-                num_people=data['num_silicon_people']
-            )
+            if project_id is not None and get_token_profile(project_id, data['model_name'], build=False) is None:
+                # estimated from one persona; the next estimate uses the whole population
+                build_token_profile_task.delay(project_id, data['model_name'])
             
             # Standard Success Response with Calculation Data
             return standard_response(
@@ -1180,106 +1604,14 @@ class UserStatistics(APIView):
                 status_code=status.HTTP_401_UNAUTHORIZED
             )
 
-        silicon_people = SiliconePerson.objects.filter(project=project)
-        data = {}
-
-        def get_counts(field_name):
-            if field_name == 'age':
-                # Special handling for age field with multiple conditions
-                return silicon_people.annotate(
-                    display_value=Case(
-                        # First handle null values
-                        When(age__isnull=True, then=Value("unknown")),
-                        # Handle if age field might be CharField with empty string
-                        When(age__exact="", then=Value("unknown")),
-                        # Handle if age is 0 or negative
-                        When(age__lte=0, then=Value("unknown")),
-                        # Convert valid numeric age to string
-                        default=Cast('age', CharField()),
-                        output_field=CharField()
-                    )
-                ).values('display_value').annotate(
-                    count=Count('id')
-                )
-            else:
-                # Standard handling for text fields
-                return silicon_people.annotate(
-                    display_value=Case(
-                        When(**{f"{field_name}__exact": ""}, then=Value("unknown")),
-                        When(**{f"{field_name}__isnull": True}, then=Value("unknown")),
-                        default=field_name,
-                        output_field=CharField()
-                    )
-                ).values('display_value').annotate(
-                    count=Count('id')
-                )
-
-        fields = ['gender', 'race', 'ideology', 'party', 'state', 'political_interest',
-                  'discuss_politics', 'church_goer', 'age', 'patriotism', 'real_vote']
-
-        for field in fields:
-            try:
-                counts = get_counts(field)
-                data[field] = {
-                    item['display_value']: item['count']
-                    for item in counts
-                }
-            except Exception as e:
-                # Log the error for debugging
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Error retrieving {field} statistics: {str(e)}")
-
-                # Try alternative method
-                data[field] = self._get_counts_alternative(silicon_people, field)
-
         return standard_response(
             success=True,
             message="Statistics retrieved successfully",
-            data=data,
+            data=get_person_statistics(project.id),
             status_code=status.HTTP_200_OK,
             code="STATISTICS_RETRIEVED"
         )
 
-    def _get_counts_alternative(self, queryset, field_name):
-        """Alternative method to get counts if the main method fails"""
-        try:
-            if field_name == 'age':
-                # Manual aggregation for age
-                age_data = {}
-                unknown_count = 0
-
-                for person in queryset.only('age'):
-                    age = getattr(person, 'age')
-
-                    # Check if age is valid
-                    if age is None or age == "":
-                        unknown_count += 1
-                    elif isinstance(age, (int, float)) and age > 0:
-                        age_str = str(int(age))
-                        age_data[age_str] = age_data.get(age_str, 0) + 1
-                    else:
-                        unknown_count += 1
-
-                if unknown_count > 0:
-                    age_data['unknown'] = unknown_count
-
-                return age_data
-
-            else:
-                # For other fields, use Python aggregation
-                field_data = {}
-                for person in queryset.only(field_name):
-                    value = getattr(person, field_name)
-                    if value is None or value == "":
-                        value = "unknown"
-                    field_data[value] = field_data.get(value, 0) + 1
-
-                return field_data
-
-        except Exception as e:
-            return {"error": f"Could not retrieve {field_name} statistics"}
-
 
 @extend_schema(
     tags=["AI Models"],
@@ -1393,14 +1725,34 @@ class AImodels(APIView):
         description="Returns a list of all supported AI models for simulations."
     )
     def get(self, request):
-        return standard_response(
+        models = [
+            'gpt-5.1', 'gpt-5', 'gpt-5-mini', 'gpt-5-nano', 'gpt-5-pro',
+            'gpt-4.1', 'gpt-4.1-mini', 'gpt-4.1-nano', 'gpt-4o',
+            'gpt-4o-mini', 'gpt-3.5-turbo'
+        ]
+        return cached_response(request, "ai_models:" + ",".join(models), lambda: standard_response(
             success=True,
             message="AI models retrieved successfully",
-            data=[
-                'gpt-5.1', 'gpt-5', 'gpt-5-mini', 'gpt-5-nano', 'gpt-5-pro',
-                'gpt-4.1', 'gpt-4.1-mini', 'gpt-4.1-nano', 'gpt-4o',
-                'gpt-4o-mini', 'gpt-3.5-turbo'
-            ],
+            data=models,
             status_code=status.HTTP_200_OK,
             code="AI_MODELS_RETRIEVED"
-        )
\ No newline at end of file
+        ))
+
+
+class DatabaseMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        tags=["Monitoring"],
+        summary="Database connection metrics",
+        description="Connection pool counters of the answering web process (size, idle connections, "
+                    "waiting requests, total wait time) and the database's connections grouped by "
+                    "application name and state. Staff only.",
+    )
+    def get(self, request):
+        data = {
+            "pool": pool_stats(),
+            "connections": connection_counts(),
+            "max_connections": max_connections(),
+        }
+        return Response({"data": data, "status": status.HTTP_200_OK}, status=status.HTTP_200_OK)
@@ -17,5 +17,17 @@ app.conf.beat_schedule = {
     'analysis_results': {
         'task': 'project.tasks.analysis_results',
         'schedule': crontab(minute=0, hour='*/1'),
+    },
+    'resume_stalled_import_jobs': {
+        'task': 'project.tasks.resume_stalled_import_jobs',
+        'schedule': crontab(minute='*/10'),
+    },
+    'ensure_model_log_partitions': {
+        'task': 'project.tasks.ensure_model_log_partitions',
+        'schedule': crontab(minute=30, hour=3),
+    },
+    'verify_all_token_profiles': {
+        'task': 'project.tasks.verify_all_token_profiles',
+        'schedule': crontab(minute=0, hour=4),
     }
 }
\ No newline at end of file
@@ -127,12 +127,41 @@ TEMPLATES = [
 #     }
 # }
 
+# Each process (gunicorn worker, Celery prefork child) keeps its own psycopg
+# connection pool. A gunicorn worker serves GUNICORN_THREADS requests at once,
+# so that is the default pool size; Celery children run one task at a time and
+# set DB_POOL_MAX_SIZE=1. Keep the sum over all processes under PostgreSQL's
+# max_connections.
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', '4'))
+DATABASE_POOL = {
+    "min_size": int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+    "max_size": int(os.getenv('DB_POOL_MAX_SIZE', GUNICORN_THREADS)),
+    # seconds a query waits for a free connection before failing
+    "timeout": float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    # idle connections beyond min_size are closed, all are recycled
+    "max_idle": 300,
+    "max_lifetime": 1800,
+}
+# shows which kind of process holds a connection in pg_stat_activity
+DATABASE_APPLICATION_NAME = os.getenv('DB_APPLICATION_NAME', 'web')
+
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
+# spend counters checked against budget limits before each chunk of a run
+BUDGET_REDIS_URL = os.getenv('BUDGET_REDIS_URL', CELERY_BROKER_URL)
+# read-through cache of the dashboard endpoints (see project/caching.py)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv('CACHE_REDIS_URL', 'redis://redis:6379/1'),
+        "KEY_PREFIX": "polling",
+    }
+}
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_WORKER_CONCURRENCY = int(os.getenv('CELERY_WORKER_CONCURRENCY', '4'))
 
 
 
@@ -153,6 +182,7 @@ STATIC_URL = "static/"
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MODEL_LOG_ARCHIVE_DIR = os.getenv('MODEL_LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive', 'model_logs'))
 
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
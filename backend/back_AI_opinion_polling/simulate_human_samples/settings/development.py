@@ -1,3 +1,5 @@
+from psycopg_pool import ConnectionPool
+
 from .base import *
 
 DEBUG = True
@@ -10,6 +12,11 @@ DATABASES = {
         'PASSWORD': os.getenv('DEVELOPMENT_POSTGRES_PASSWORD'),
         'HOST': os.getenv('DEVELOPMENT_POSTGRES_HOST', 'db'),
         'PORT': os.getenv('DEVELOPMENT_POSTGRES_PORT', '5432'),
+        'OPTIONS': {
+            # the pool checks a connection before handing it out
+            'pool': {**DATABASE_POOL, 'check': ConnectionPool.check_connection},
+            'application_name': DATABASE_APPLICATION_NAME,
+        },
     }
 }
 
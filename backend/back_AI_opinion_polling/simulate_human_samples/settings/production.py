@@ -1,3 +1,5 @@
+from psycopg_pool import ConnectionPool
+
 from .base import *
 
 DEBUG = False
@@ -20,6 +22,11 @@ DATABASES = {
         'PASSWORD': os.getenv('PRODUCTION_POSTGRES_PASSWORD'),
         'HOST': os.getenv('PRODUCTION_POSTGRES_HOST', 'db'),
         'PORT': os.getenv('PRODUCTION_POSTGRES_PORT', '5432'),
+        'OPTIONS': {
+            # the pool checks a connection before handing it out
+            'pool': {**DATABASE_POOL, 'check': ConnectionPool.check_connection},
+            'application_name': DATABASE_APPLICATION_NAME,
+        },
     }
 }
 
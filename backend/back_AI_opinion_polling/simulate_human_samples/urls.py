@@ -19,7 +19,7 @@ from django.urls import path, include
 from allauth.account.views import confirm_email
 from rest_framework_simplejwt.views import TokenRefreshView
 from dj_rest_auth.views import LogoutView, PasswordResetView
-from user.views import CustomJWTLoginView,SignupAPIView
+from user.views import CustomJWTLoginView,SignupAPIView,UserProfileView
 from dj_rest_auth.views import PasswordResetConfirmView
 from drf_spectacular.views import (
     SpectacularAPIView,
@@ -47,6 +47,7 @@ urlpatterns = [
          name='password_reset_confirm'),
     path('auth/registration/', include('dj_rest_auth.registration.urls')),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/user/', UserProfileView.as_view(), name='user_profile'),
     path("accounts/", include("allauth.urls")),
     path('auth/google/', include('allauth.socialaccount.providers.google.urls')),
     path('project/', include('project.urls'), name='project'),
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_alter_user_email_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='budget_limit',
+            field=models.FloatField(blank=True, help_text="Runs pause once all of the user's projects have spent this much, in USD", null=True),
+        ),
+    ]
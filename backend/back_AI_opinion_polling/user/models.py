@@ -6,6 +6,7 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    budget_limit = models.FloatField(blank=True, null=True, help_text="Runs pause once all of the user's projects have spent this much, in USD")
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
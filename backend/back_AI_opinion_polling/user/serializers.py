@@ -1,6 +1,8 @@
 from dj_rest_auth.serializers import LoginSerializer
 from rest_framework import serializers
 
+from .models import User
+
 
 class CustomJWTLoginSerializer(LoginSerializer):
     username = None
@@ -25,6 +27,14 @@ class UserSerializer(serializers.Serializer):
     email = serializers.EmailField()
     username = serializers.CharField()
 
+class UserProfileSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ["pk", "email", "username", "budget_limit"]
+        read_only_fields = ["pk", "email", "username"]
+        extra_kwargs = {"budget_limit": {"min_value": 0}}
+
+
 class JWTLoginResponseSerializer(serializers.Serializer):
     access = serializers.CharField()
     refresh = serializers.CharField()
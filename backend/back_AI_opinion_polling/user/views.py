@@ -5,13 +5,15 @@ from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
 from allauth.account.forms import SignupForm
 from allauth.account.models import EmailAddress
 from allauth.account.utils import complete_signup
 from allauth.account import app_settings
 from django.urls import reverse
 from drf_spectacular.utils import extend_schema, OpenApiResponse
-from .serializers import JWTLoginResponseSerializer, JWTLoginRequestSerializer
+from project import budgets
+from .serializers import JWTLoginResponseSerializer, JWTLoginRequestSerializer, UserProfileSerializer
 
 
 @extend_schema(
@@ -95,4 +97,31 @@ class SignupAPIView(APIView):
                 "confirmation_url": confirmation_url,
             },
             status=status.HTTP_201_CREATED,
-        )
\ No newline at end of file
+        )
+
+
+class UserProfileView(APIView):
+    """
+    The authenticated user's profile; budget_limit caps what all of the
+    user's projects may spend on runs.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(summary="Get the user profile", responses=UserProfileSerializer)
+    def get(self, request):
+        return Response(UserProfileSerializer(request.user).data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        summary="Update the user profile",
+        description="Set the spending limit over all projects in USD, or null for none.",
+        request=UserProfileSerializer,
+        responses=UserProfileSerializer,
+    )
+    def patch(self, request):
+        serializer = UserProfileSerializer(request.user, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        limit_added = request.user.budget_limit is None and serializer.validated_data.get("budget_limit") is not None
+        serializer.save()
+        if limit_added:
+            budgets.forget_spend(user_id=request.user.id)
+        return Response(serializer.data, status=status.HTTP_200_OK)